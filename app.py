@@ -1,39 +1,524 @@
+import functools
+import os
+import tempfile
+import time
+
 import streamlit as st
-import psycopg2
-import pandas as pd
-import numpy as np 
-import seaborn as sns
-import matplotlib.pyplot as plt
 from streamlit_folium import folium_static
 import folium
 import plotly.graph_objects as go
 import plotly.express as px
 
+import charts
+import live
+import filters
+import profiles
+import queries
+import rollup
+import segments
+import similar
+import throughput
+import warmup
+from backend import get_backend
+from db import fetch_with_fallback, last_good_results
+
 
 # Set page config as the first Streamlit command, outside of any function
 st.set_page_config(layout="wide", page_title="The Belgian .NET Ecosystem Analysis")
 
-# Function to connect to the database
-def connect_to_db():
-    conn = psycopg2.connect(
-        dbname=st.secrets["DB_NAME"],
-        user=st.secrets["DB_USER"],
-        password=st.secrets["DB_PASSWORD"],
-        host=st.secrets["DB_HOST"],
-        port=st.secrets["DB_PORT"]
+
+# Step 1: profile statistics chart and metrics
+def show_profile_stats(result):
+    # Calculate values
+    total_profiles, net_profiles, distinct_companies = result
+
+    # Nested Sunburst of profiles, .NET profiles and their companies
+    st.plotly_chart(charts.profile_stats(total_profiles, net_profiles, distinct_companies), use_container_width=True)
+
+    # Display the raw numbers with some formatting
+    st.markdown("---")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Total Profiles", f"{total_profiles:,}")
+    with col2:
+        st.metric(".NET Profiles", f"{net_profiles:,}")
+    with col3:
+        st.metric("Unique Companies", f"{distinct_companies:,}")
+
+
+# Step 2: pipeline progress counters, kept up to date by the ingest triggers
+def show_progress_counters(rows):
+    counters = {stage: (value, updated_at) for stage, value, updated_at in rows}
+
+    counter_labels = {
+        "companies_found": "Companies Found",
+        "companies_enriched": "Companies Enriched",
+        "profiles_scraped": "Profiles Scraped",
+        "gmb_matched": "GMB Matched",
+        "website_embedded": "Websites Embedded",
+        "financially_enriched": "Financially Enriched",
+    }
+    columns = st.columns(len(counter_labels))
+    for column, (stage, label) in zip(columns, counter_labels.items()):
+        with column:
+            st.metric(label, f"{counters.get(stage, (0, None))[0]:,}")
+    if counters:
+        st.caption(f"Pipeline progress counters, last updated {max(updated_at for _, updated_at in counters.values()):%Y-%m-%d %H:%M}")
+
+
+# Step 3: company data enrichment progress
+def show_company_enrichment(result):
+    companies_found, companies_enriched, percentage_complete = result
+
+    # Found vs. enriched bars, with the found count as target line
+    st.plotly_chart(charts.company_enrichment(companies_found, companies_enriched, percentage_complete),
+                    use_container_width=True)
+
+    # Display additional information
+    st.info(f"""
+    - Total companies found: {companies_found}
+    - Companies enriched with LinkedIn data: {companies_enriched}
+    - Percentage complete: {percentage_complete}%
+    """)
+
+
+# Step 4: employee collection status
+def show_employee_collection(result):
+    companies_found, collected, to_collect, profiles_collected = result
+
+    # Convert profiles_collected to float
+    profiles_collected = float(profiles_collected)
+
+    # Create two columns for the graphs
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("Company Data")
+        
+        # Create a pie chart for company data
+        fig1 = charts.progress_donut("Employee Collection Status", ('Collected', 'To Collect'), (collected, to_collect),
+                                     companies_found)
+        st.plotly_chart(fig1, use_container_width=True)
+
+    with col2:
+        st.subheader("Profile Data")
+        
+        # Create a gauge chart for profile collection progress
+        st.plotly_chart(charts.profiles_gauge(profiles_collected), use_container_width=True)
+
+    # Display additional information
+    st.info(f"""
+    - Total companies found: {companies_found}
+    - Companies with employees collected: {collected}
+    - Companies remaining to collect employees: {to_collect}
+    - Total profiles collected: {profiles_collected}
+    """)
+
+
+# Step 5: Google My Business coverage
+def show_gmb_coverage(result):
+    total_companies, gmb_companies_not_found = result
+
+    # Calculate the percentage of companies found on GMB
+    gmb_companies_found = 100 - gmb_companies_not_found
+
+    # Create a pie chart
+    fig = charts.progress_donut("Google My Business (GMB) Profile Coverage", ('Found on GMB', 'Not Found on GMB'),
+                                (gmb_companies_found, gmb_companies_not_found), total_companies)
+    st.plotly_chart(fig, use_container_width=True)
+
+    # Display additional information
+    st.info(f"""
+    - Total companies: {total_companies}
+    - Companies found on GMB: {round(gmb_companies_found, 2)}%
+    - Companies not found on GMB: {gmb_companies_not_found}%
+    """)
+
+
+# Step 6: website embedding progress
+def show_website_embedding(result):
+    total_companies, websites_to_embed = result
+
+    # Calculate the percentage of websites embedded
+    websites_embedded = 100 - websites_to_embed
+
+    # Create a pie chart
+    fig = charts.progress_donut("Company Website Embedding Progress", ('Websites Embedded', 'Websites to Embed'),
+                                (websites_embedded, websites_to_embed), total_companies)
+    st.plotly_chart(fig, use_container_width=True)
+
+    # Display additional information
+    st.info(f"""
+    - Total companies: {total_companies}
+    - Websites embedded: {round(websites_embedded, 2)}%
+    - Websites to embed: {websites_to_embed}%
+""")
+
+
+# Step 7: financial data enrichment progress
+def show_financial_enrichment(result):
+    total_companies, pct_financial_data_enrichment = result
+
+    # Calculate the percentage of companies without financial data
+    pct_no_financial_data = 100 - pct_financial_data_enrichment
+
+    # Create a pie chart
+    fig = charts.progress_donut("Financial Data Enrichment Progress",
+                                ('Financial Data Available', 'No Financial Data Available'),
+                                (pct_financial_data_enrichment, pct_no_financial_data), total_companies)
+    st.plotly_chart(fig, use_container_width=True)
+
+    # Display additional information
+    st.info(f"""
+    - Total companies: {total_companies}
+    - Companies with financial data: {round(pct_financial_data_enrichment, 2)}%
+    - Companies without financial data: {round(pct_no_financial_data, 2)}%
+    """)
+
+
+# Progress queries that return all rows instead of one
+MULTI_ROW_PROGRESS = {"progress_counters"}
+
+
+# Run a named progress query within its time budget, on its own connection so
+# live fragments and the warm-up thread can call it too
+def fetch_progress(name, backend):
+    timeout_ms = queries.QUERY_TIMEOUTS_MS.get(name)
+    return fetch_with_fallback(name, queries.PROGRESS_QUERIES[name], many=name in MULTI_ROW_PROGRESS,
+                               timeout_ms=timeout_ms, backend=backend)
+
+
+# Render a query outcome, labelled with its age when the query timed out or
+# failed otherwise and the last good value is shown instead
+def show_with_fallback(render, outcome):
+    if outcome["error"] is not None:
+        failure = "Query timed out" if outcome["timed_out"] else "Query failed"
+        if outcome["result"] is None:
+            st.error(f"{failure} and no earlier value is available: {outcome['error']}")
+            return
+        age_minutes = (time.time() - outcome["fetched_at"]) / 60
+        message = f"{failure}, showing the value from {age_minutes:.0f} minute(s) ago."
+        st.warning(message if outcome["timed_out"] else f"{message} {outcome['error']}")
+    render(outcome["result"])
+
+
+# Render a progress section from its pre-warmed result. In live mode it
+# becomes a fragment that only reruns its query after one of the tables it
+# reads changed.
+def progress_section(name, render, live_settings):
+    show = lambda outcome: show_with_fallback(render, outcome)
+    if live_settings is None:
+        show(get_warmer().get(f"progress_{name}"))
+    else:
+        live.live_section(name, lambda: fetch_progress(name, get_backend()), show, queries.PROGRESS_TABLES[name],
+                          **live_settings)
+
+
+THROUGHPUT_LOOKBACKS = [24, 72, 168, 336]
+
+
+def fetch_throughput(lookback_hours, backend):
+    timeout_ms = queries.QUERY_TIMEOUTS_MS.get("throughput")
+    return fetch_with_fallback(f"throughput_{lookback_hours}", queries.THROUGHPUT, {"lookback_hours": lookback_hours},
+                               many=True, timeout_ms=timeout_ms, backend=backend)
+
+
+# Pipeline throughput chart, stage table and bottleneck
+def show_throughput(rows, lookback_hours):
+    buckets = throughput.to_frame(rows)
+    if buckets.empty:
+        return
+
+    counts = throughput.hourly_counts(buckets, lookback_hours)
+    summary = throughput.stage_summary(buckets, counts)
+    rates = throughput.rolling_rates(counts, throughput.ROLLING_WINDOWS[0])
+
+    # Rolling processing rate per stage
+    fig = go.Figure()
+    for stage, label in throughput.STAGE_LABELS.items():
+        fig.add_trace(go.Scatter(x=rates.index, y=rates[stage], mode='lines', name=label))
+
+    fig.update_layout(
+        template=charts.TEMPLATE,
+        title=f"Processing Rate ({throughput.ROLLING_WINDOWS[0]}h rolling, companies/hour)",
+        xaxis_title='',
+        yaxis_title='Companies per Hour',
+        legend=dict(orientation='h', x=0.5, y=-0.15, xanchor='center', yanchor='top')
     )
-    return conn
+    st.plotly_chart(fig, use_container_width=True)
+
+    table = summary.assign(eta=summary['eta_hours'].map(throughput.format_eta))
+    st.dataframe(table[['stage', 'done', 'backlog', 'pct_complete'] + [f"rate_{w}h" for w in throughput.ROLLING_WINDOWS] + ['eta']]
+                 .reset_index(drop=True), use_container_width=True)
+
+    slowest = throughput.bottleneck(summary)
+    if slowest is not None:
+        st.info(f"""
+        - Bottleneck: {throughput.STAGE_LABELS[slowest]} ({summary.loc[slowest, 'backlog']:,} companies left)
+        - ETA to completion: {throughput.format_eta(summary['eta_hours'].max())}
+        """)
+
+
+# Seniority x department heatmap and tenure distribution of a profile slice,
+# counted from the rollup cube instead of the profile rows
+def show_profile_mix(cube, **criteria):
+    mix = rollup.pivot(cube, "seniority", "department", **criteria)
+    if mix.empty:
+        return
+    col1, col2 = st.columns(2)
+    with col1:
+        fig = px.imshow(mix, text_auto=True, aspect="auto", color_continuous_scale="Blues",
+                        title="Profiles by Seniority and Department", template=charts.TEMPLATE)
+        fig.update_layout(xaxis_title='', yaxis_title='', coloraxis_showscale=False)
+        st.plotly_chart(fig, use_container_width=True)
+    with col2:
+        tenure = rollup.slice_counts(cube, by=["tenure_bucket"], **criteria)
+        fig = px.bar(x=tenure.index.astype(str), y=tenure.values, title="Profiles by Tenure", template=charts.TEMPLATE)
+        fig.update_layout(xaxis_title='', yaxis_title='Profiles')
+        st.plotly_chart(fig, use_container_width=True)
+
+
+PROFILE_SEARCH_PAGE_SIZE = 20
+
+
+# Ranked full-text search over the titles and summaries of the selected
+# companies' profiles, one page per query (see search.py)
+def show_profile_search(backend, company_ids):
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        query = st.text_input("Search profile titles and summaries",
+                              placeholder='e.g. blazor "azure functions" -sales')
+    with col2:
+        page = st.number_input("Page", min_value=1, value=1, step=1)
+    if not query.strip():
+        return
+
+    start = time.perf_counter()
+    try:
+        matches = backend.search_profiles(query, company_ids, limit=PROFILE_SEARCH_PAGE_SIZE,
+                                          offset=(page - 1) * PROFILE_SEARCH_PAGE_SIZE)
+    except ValueError as e:
+        st.warning(str(e))
+        return
+    if matches.empty:
+        st.warning("No profiles match this search." if page == 1 else "No more matches, go back a page.")
+        return
+    total = int(matches['total_matches'].iloc[0])
+    st.dataframe(matches[['rank'] + filters.PROFILE_COLUMNS], use_container_width=True)
+    st.caption(f"{total:,} matching profiles, page {page} of {-(-total // PROFILE_SEARCH_PAGE_SIZE)} "
+               f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+
+
+LOOKALIKE_COLUMNS = ['company_name', 'industry', 'employee_count', 'hq_city', 'cli_website', 'net_dev_count',
+                     'technologies']
+
+
+# Companies whose website is most similar to the selected one's, by website
+# embedding (see similar.py). companies are the companies in the filtered grid,
+# all_companies the ones the lookalikes are looked up in.
+def show_lookalikes(warmer, companies, all_companies):
+    st.subheader("Lookalike Companies")
+    names = companies.dropna(subset=['kar_company_id']).drop_duplicates('kar_company_id')
+    names = dict(zip(names['kar_company_id'], names['company_name'].fillna(names['kar_company_id'])))
+    col1, col2, col3 = st.columns([3, 1, 1])
+    with col1:
+        company_id = st.selectbox("Find companies similar to", list(names), index=None,
+                                  format_func=names.get,
+                                  placeholder="Select a company from the filtered list")
+    with col2:
+        k = st.number_input("Lookalikes", min_value=1, max_value=100, value=10)
+    with col3:
+        within_filters = st.checkbox("Only filtered companies", value=False)
+    if company_id is None:
+        return
+
+    with st.spinner("Building the lookalike index..."):
+        index = warmer.get("website_index")
+    if index is None:
+        st.info("No website embeddings available yet.")
+        return
+    start = time.perf_counter()
+    matches = similar.similar_companies(index, company_id, k, list(names) if within_filters else None)
+    if matches.empty:
+        st.warning(f"The website of {names[company_id]} has not been embedded yet.")
+        return
+    columns = ['kar_company_id'] + [col for col in LOOKALIKE_COLUMNS if col in all_companies.columns]
+    details = all_companies[columns].drop_duplicates('kar_company_id')
+    matches = matches.merge(details, how='left', left_on='company_id', right_on='kar_company_id')
+    st.dataframe(matches[['similarity'] + columns[1:]], use_container_width=True)
+    st.caption(f"{len(matches)} most similar websites ({(time.perf_counter() - start) * 1000:.0f} ms)")
+
+
+# Saved segment definitions and their precomputed bitmaps (see segments.py)
+SEGMENTS_FILE = st.secrets.get("SEGMENTS_FILE", "segments.json")
+SEGMENT_STORE_DIR = st.secrets.get("SEGMENT_STORE_DIR", "segment_store")
+
+# Saved-segment combinations kept warm, the ones sessions read most
+POPULAR_SEGMENTS = 20
+
+
+# Store of the latest build, None before the first one
+def load_segment_store():
+    if not os.path.exists(os.path.join(SEGMENT_STORE_DIR, "LATEST")):
+        return None
+    return segments.SegmentStore.latest(SEGMENT_STORE_DIR)
+
+
+# Member counts and top 10 profiles of a segment expression on the latest build
+def evaluate_segments(warmer, expression):
+    store = warmer.get("segment_store")
+    companies = store.evaluate(expression, "companies")
+    profiles = store.evaluate(expression, "profiles")
+    return {"version": store.version, "built_at": store.manifest["built_at"], "companies": len(companies),
+            "profiles": len(profiles), "rows": store.rows(profiles)[filters.PROFILE_COLUMNS].head(10)}
+
+
+# Combine saved segments from their bitmaps, no query or pandas filter per rerun
+def show_saved_segments(warmer):
+    st.subheader("Saved Segments")
+    store = warmer.get("segment_store")
+    if store is None:
+        st.info("No segments built yet. Run `python segments.py build` to precompute the saved segments.")
+        return
+
+    col1, col2 = st.columns(2)
+    with col1:
+        chosen = st.multiselect("Segments", store.names)
+        combine = st.radio("Combine segments", ["Any of them", "All of them"], horizontal=True)
+    with col2:
+        excluded = st.multiselect("Exclude segments", store.names)
+    if not chosen:
+        return
+
+    expression = (" | " if combine == "Any of them" else " & ").join(chosen)
+    if excluded:
+        expression = f"({expression}) - ({' | '.join(excluded)})"
+    # Each combination becomes a warm entry, the least used ones make way
+    result = warmer.get_or_register(f"segments {expression}", functools.partial(evaluate_segments, warmer, expression),
+                                    warm_interval("segments"), evict=("segments ", POPULAR_SEGMENTS - 1))
+
+    col1, col2 = st.columns(2)
+    col1.metric("Companies", f"{result['companies']:,}")
+    col2.metric("Profiles", f"{result['profiles']:,}")
+    st.dataframe(result["rows"])
+    st.caption(f"`{expression}` on dataset version {result['version']}, built {result['built_at'][:16]} UTC. "
+               "Showing top 10 profiles.")
+
+
+# Refresh interval per pre-warmed result in seconds, WARM_INTERVALS_S in
+# secrets.toml overrides single entries
+WARM_INTERVALS_S = {
+    "progress": 60,
+    "throughput": 300,
+    "companies": 300,
+    "profiles": 300,
+    # mv_profile_rollup only changes on `python migrate.py refresh`
+    "profile_rollup": 300,
+    "website_index": 3600,
+    "segments": 300,
+}
+
+
+def warm_interval(kind):
+    return {**WARM_INTERVALS_S, **st.secrets.get("WARM_INTERVALS_S", {})}[kind]
+
+
+# Memory budget of a profile selection, past it the profiles are kept on disk
+# in PROFILE_SPILL_DIR (default the system temporary directory)
+PROFILE_MEMORY_MB = st.secrets.get("PROFILE_MEMORY_MB", profiles.DEFAULT_MEMORY_BUDGET_MB)
+PROFILE_SPILL_DIR = st.secrets.get("PROFILE_SPILL_DIR")
+
+# Profile selections of filtered company sets kept for reruns
+PROFILE_SELECTIONS = 4
+
+
+def load_profiles(backend, company_ids):
+    return profiles.ProfileSelection.load(backend.stream(queries.PROFILES_FOR_COMPANIES, (company_ids,)),
+                                          int(PROFILE_MEMORY_MB * 2**20), PROFILE_SPILL_DIR)
+
+
+# Profiles of all companies in Belgium, the unfiltered map selection, with the
+# company ids they were fetched for
+def load_all_profiles(warmer, backend):
+    companies = filters.companies_in_belgium(warmer.get("companies"))
+    company_ids = companies['kar_company_id'].dropna().unique().tolist()
+    return company_ids, load_profiles(backend, company_ids)
+
+
+# Profiles of a filtered company set, shared by the sessions that filter alike
+@st.cache_resource(ttl=warm_interval("profiles"), max_entries=PROFILE_SELECTIONS, show_spinner="Loading profiles...")
+def profile_selection(company_ids):
+    return load_profiles(get_backend(), list(company_ids))
+
+
+# CSV of the profiles matching profile_filters, for the download button
+def profiles_csv(selection, profile_filters):
+    f = tempfile.TemporaryFile(mode="w+", newline="")
+    selection.to_csv(f, **profile_filters)
+    f.seek(0)
+    return f
+
+
+# Results shared by all sessions of this server process, loaded in the
+# background from the first session on and refreshed on schedule (see
+# warmup.py). Registered in page order, so the top of the page is warm first.
+@st.cache_resource
+def get_warmer():
+    backend = get_backend()
+    # Created here, in a script thread: the warm-up thread has no script context
+    last_good_results()
+
+    warmer = warmup.Warmer()
+    for name in queries.PROGRESS_QUERIES:
+        warmer.register(f"progress_{name}", functools.partial(fetch_progress, name, backend), warm_interval("progress"))
+    for hours in THROUGHPUT_LOOKBACKS:
+        warmer.register(f"throughput_{hours}", functools.partial(fetch_throughput, hours, backend),
+                        warm_interval("throughput"))
+    warmer.register("companies", functools.partial(backend.dataframe, queries.COMPANIES), warm_interval("companies"))
+    warmer.register("profiles", functools.partial(load_all_profiles, warmer, backend), warm_interval("profiles"))
+    warmer.register("profile_rollup", lambda: rollup.to_frame(backend.dataframe(queries.PROFILE_ROLLUP)),
+                    warm_interval("profile_rollup"))
+    warmer.register("website_index", backend.website_index, warm_interval("website_index"))
+    warmer.register("segment_store", load_segment_store, warm_interval("segments"))
+    return warmer.start()
+
+
+# Warm/cold state of the shared results, for checking a deploy
+def show_cache_status(warmer):
+    with st.sidebar.expander("Cache status"):
+        status = warmer.status()
+        st.caption(f"{(status['state'] == 'warm').sum()} of {len(status)} results warm, "
+                   f"{status['hits'].sum():,} reads warm, {status['misses'].sum():,} cold")
+        st.dataframe(status, hide_index=True)
+
 
 # Streamlit app
 def main():
     try:
-        conn = connect_to_db()
-        st.success("Successfully connected to the database!")
+        backend = get_backend()
+        if backend.name == "postgres":
+            # On a connection of its own, closed again
+            backend.fetch("SELECT 1")
+            st.success("Successfully connected to the database!")
+        else:
+            st.success(f"Running offline against {backend.describe()}")
     except Exception as e:
         st.error(f"Failed to connect to the database: {str(e)}")
         return  # Exit the function if connection fails
 
+    warmer = get_warmer()
+    show_cache_status(warmer)
+
     st.title("Belgian Organizations Employing .NET Developers")
+
+    # Live mode updates the progress charts in place as scraped rows land
+    live_settings = None
+    if backend.supports_live and st.sidebar.toggle("Live progress updates", value=False):
+        live_settings = {
+            "mode": st.secrets.get("LIVE_MODE", "notify"),
+            "refresh": st.sidebar.slider("Check for changes every (s)", 2, 60, 5),
+            "debounce": st.sidebar.slider("Wait for changes to settle (s)", 0, 120, 10),
+        }
     # Custom CSS to style the container
     st.markdown("""
     <style>
@@ -144,76 +629,7 @@ def main():
         
         To enable downstream analysis, it is crucial to gather information about these companies. However, not all profiles included employer details, which limited the ability to conduct a comprehensive analysis based on company information.""")
 
-    # Connect to the database
-    conn = connect_to_db()
-    cur = conn.cursor()
-
-    # Execute the correct query
-    cur.execute("""
-    SELECT 
-        COUNT(*) AS total_result,
-        COUNT(CASE WHEN net_profile = TRUE THEN 1 END) AS net_profile_true,
-        (SELECT COUNT(DISTINCT companyid) 
-         FROM kenze_profile_search 
-         WHERE net_profile = TRUE) AS distinct_companyid_count
-    FROM kenze_profile_search;
-    """)
-    
-    result = cur.fetchone()
-    
-    # Calculate values
-    total_profiles, net_profiles, distinct_companies = result
-
-    # Create data for the nested bubble chart
-    data = {
-        "ids": ["Total", "NET", "Companies"],
-        "labels": ["Total Profiles", ".NET Profiles", "Unique Companies"],
-        "parents": ["", "Total", "NET"],
-        "values": [total_profiles, net_profiles, distinct_companies],
-        "colors": ['#FFFFFF', '#66b3ff', '#ffcc99']
-    }
-
-    # Create the Sunburst chart
-    fig = go.Figure(go.Sunburst(
-        ids=data['ids'],
-        labels=data['labels'],
-        parents=data['parents'],
-        values=data['values'],
-        marker=dict(
-            colors=data['colors'],
-            line=dict(color=['#000000', '#FFFFFF', '#FFFFFF'], width=[2, 0, 0])  # Add border to Total Profiles
-        ),
-        textinfo="label+value",
-        hoverinfo="label+value+percent parent+percent root",
-        textfont=dict(size=16, color="black"),
-    ))
-
-    # Update layout
-    fig.update_layout(
-        title={
-            'text': "Profile Statistics",
-            'y':0.95,
-            'x':0.5,
-            'xanchor': 'center',
-            'yanchor': 'top',
-            'font': dict(size=24)
-        },
-        width=1000,
-        height=800,
-    )
-
-    # Display the plot
-    st.plotly_chart(fig, use_container_width=True)
-
-    # Display the raw numbers with some formatting
-    st.markdown("---")
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.metric("Total Profiles", f"{total_profiles:,}")
-    with col2:
-        st.metric(".NET Profiles", f"{net_profiles:,}")
-    with col3:
-        st.metric("Unique Companies", f"{distinct_companies:,}")
+    progress_section("profile_search_stats", show_profile_stats, live_settings)
 
     # Step 2: Company List Creation
     st.subheader("📊 Step 2: Company List Creation")
@@ -228,6 +644,8 @@ def main():
         This list serves as the foundation for downstream analysis, providing a targeted set of companies known to employ .NET developers in Belgium.
         """)
 
+    progress_section("progress_counters", show_progress_counters, live_settings)
+
     # Step 3: Company Data Collection
     st.subheader("📊 Step 3: Company Data Collection")
 
@@ -254,127 +672,7 @@ def main():
         The impact on completeness is expected to be minimal.
         """)
 
-    # Add this new section for the query visualization
-    conn = connect_to_db()
-    cur = conn.cursor()
-
-    # Execute the query
-    cur.execute("""
-    WITH kenze_profile_search AS (
-        SELECT DISTINCT
-            companyid
-        FROM
-            kenze_profile_search
-        WHERE
-            companyid IS NOT NULL
-            AND companyid != ''
-            AND net_profile = TRUE
-    ),
-    cli_search AS (
-        SELECT
-            company_id,
-            enrichment_timestamp
-        FROM
-            cli
-    )
-    SELECT
-        count(a.companyid) as companies_found,
-        count(b.company_id) as companies_enirched,
-        CASE 
-        WHEN count(a.companyid) > 0 THEN
-            ROUND((count(b.company_id)::DECIMAL / count(a.companyid)::DECIMAL) * 100, 1)
-        ELSE
-            0
-    END as percentage_complete
-    FROM
-        kenze_profile_search AS a
-        FULL JOIN cli_search AS b on a.companyid = b.company_id::VARCHAR
-    where a.companyid is not null
-    """)
-
-    result = cur.fetchone()
-    companies_found, companies_enriched, percentage_complete = result
-
-    # Create a more fancy bar chart
-    fig = go.Figure()
-
-    # Add bars
-    fig.add_trace(go.Bar(
-        x=['Companies'],
-        y=[companies_found],
-        name='Companies Found',
-        marker_color='royalblue',
-        text=[companies_found],
-        textposition='outside',
-        hoverinfo='y+name'
-    ))
-
-    fig.add_trace(go.Bar(
-        x=['Companies'],
-        y=[companies_enriched],
-        name='Companies Enriched',
-        marker_color='lightgreen',
-        text=[companies_enriched],
-        textposition='outside',
-        hoverinfo='y+name'
-    ))
-
-    # Customize the layout
-    fig.update_layout(
-        title={
-            'text': 'Company Data Enrichment Progress',
-            'y':0.95,
-            'x':0.5,
-            'xanchor': 'center',
-            'yanchor': 'top',
-            'font': dict(size=24)
-        },
-        xaxis_title='',
-        yaxis_title='Number of Companies',
-        barmode='group',
-        bargap=0.3,
-        bargroupgap=0.1,
-        legend=dict(
-            x=0.5,
-            y=-0.15,
-            xanchor='center',
-            yanchor='top',
-            orientation='h'
-        ),
-        plot_bgcolor='rgba(0,0,0,0)',
-        annotations=[
-            dict(
-                x=0.5,
-                y=max(companies_found, companies_enriched) * 1.1,
-                xref="paper",
-                yref="y",
-                text=f"Completion: {percentage_complete}%",
-                showarrow=False,
-                font=dict(size=20, color='green')
-            )
-        ]
-    )
-
-    # Update axes
-    fig.update_xaxes(showgrid=False)
-    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgray')
-
-    # Add a shape to show the target
-    fig.add_shape(
-        type="line",
-        x0=-0.5, y0=companies_found, x1=0.5, y1=companies_found,
-        line=dict(color="red", width=3, dash="dash"),
-    )
-
-    # Display the chart
-    st.plotly_chart(fig, use_container_width=True)
-
-    # Display additional information
-    st.info(f"""
-    - Total companies found: {companies_found}
-    - Companies enriched with LinkedIn data: {companies_enriched}
-    - Percentage complete: {percentage_complete}%
-    """)
+    progress_section("company_enrichment", show_company_enrichment, live_settings)
 
     # Step 4: Employee Profile Scraping and Data Processing
     st.subheader("📊 Step 4: Employee Profile Scraping, Data Processing & Labeling")
@@ -431,118 +729,7 @@ def main():
         It enables more accurate analysis of seniority levels, tenure, and departmental distribution, offering valuable insights into the structure and expertise within these organizations.
         """)
         
-    # Execute the query
-    cur.execute("""
-    WITH subquery1 AS (
-        SELECT 
-            companyid, 
-            min(vmid) as vmid, 
-            min(employee_scrape_timestamp) as min_timestamp
-        FROM
-            kenze_profile_search
-        WHERE
-            companyid IS NOT NULL 
-            AND companyid != ''
-            AND employee_scrape_timestamp IS NULL 
-            AND net_profile = TRUE
-        GROUP BY companyid
-    ),
-    subquery2 AS (
-        SELECT 
-            companyid,
-            COUNT(companyid) AS kenze_pli_employee_count
-        FROM
-            kenze_pli_profiles
-        WHERE
-            companyid IS NOT NULL
-        GROUP BY companyid
-    ),
-    cli_search AS (
-        SELECT
-            company_id AS companyid_c,
-            hq_country,
-            employee_count,
-            enrichment_timestamp
-        FROM
-            cli
-        WHERE
-            hq_country = 'BE'
-    )
-    SELECT 
-        COUNT(DISTINCT subquery1.companyid) AS companies_found, 
-        COUNT(DISTINCT CASE WHEN  subquery2.companyid IS NOT NULL THEN cli_search.companyid_c END) AS collected,
-        COUNT(DISTINCT CASE WHEN  subquery2.companyid IS NULL THEN cli_search.companyid_c END) AS to_collect,
-        SUM(subquery2.kenze_pli_employee_count) AS profiles_collected
-    FROM
-        subquery1
-        LEFT JOIN subquery2 ON subquery1.companyid = subquery2.companyid
-        FULL JOIN cli_search ON subquery1.companyid = cli_search.companyid_c::VARCHAR
-    WHERE
-        subquery1.companyid IS NOT NULL 
-        AND subquery1.companyid != ''
-    """)
-
-    result = cur.fetchone()
-    companies_found, collected, to_collect, profiles_collected = result
-
-    # Convert profiles_collected to float
-    profiles_collected = float(profiles_collected)
-
-    # Create two columns for the graphs
-    col1, col2 = st.columns(2)
-
-    with col1:
-        st.subheader("Company Data")
-        
-        # Create a pie chart for company data
-        fig1 = go.Figure(data=[go.Pie(
-            labels=['Collected', 'To Collect'],
-            values=[collected, to_collect],
-            hole=.3,
-            marker_colors=['#66b3ff', '#ff9999']
-        )])
-
-        fig1.update_layout(
-            title="Employee Collection Status",
-            annotations=[dict(text=f'Total: {companies_found}', x=0.5, y=0.5, font_size=20, showarrow=False)]
-        )
-        
-        st.plotly_chart(fig1, use_container_width=True)
-
-    with col2:
-        st.subheader("Profile Data")
-        
-        # Create a gauge chart for profile collection progress
-        fig2 = go.Figure(go.Indicator(
-            mode = "gauge+number",
-            value = profiles_collected,
-            domain = {'x': [0, 1], 'y': [0, 1]},
-            title = {'text': "Profiles Collected", 'font': {'size': 24}},
-            gauge = {
-                'axis': {'range': [None, profiles_collected * 1.5], 'tickwidth': 1, 'tickcolor': "darkblue"},
-                'bar': {'color': "darkblue"},
-                'bgcolor': "white",
-                'borderwidth': 2,
-                'bordercolor': "gray",
-                'steps': [
-                    {'range': [0, profiles_collected], 'color': 'cyan'},
-                    {'range': [profiles_collected, profiles_collected * 1.5], 'color': 'royalblue'}],
-                'threshold': {
-                    'line': {'color': "red", 'width': 4},
-                    'thickness': 0.75,
-                    'value': profiles_collected}}))
-
-        fig2.update_layout(font = {'color': "darkblue", 'family': "Arial"})
-        
-        st.plotly_chart(fig2, use_container_width=True)
-
-    # Display additional information
-    st.info(f"""
-    - Total companies found: {companies_found}
-    - Companies with employees collected: {collected}
-    - Companies remaining to collect employees: {to_collect}
-    - Total profiles collected: {profiles_collected}
-    """)
+    progress_section("employee_collection", show_employee_collection, live_settings)
 
     # Step 5: Google My Business (GMB) Profile Scraping
     st.subheader("📊 Step 5: Google My Business (GMB) Profile Scraping")
@@ -580,88 +767,7 @@ def main():
         The additional data points allow for more nuanced analysis and insights into the .NET development landscape in Belgium.
         """)
 
-    # Execute the query
-    cur.execute("""
-    WITH kenze_profile_search AS (
-        SELECT DISTINCT
-            companyid
-        FROM
-            kenze_profile_search
-        WHERE
-            companyid IS NOT NULL
-            AND companyid != ''
-            AND net_profile = TRUE
-    ),
-    cli_search AS (
-        SELECT
-            company_id,
-            enrichment_timestamp, 
-            serper_addressscrape_timestamp, 
-            website, 
-            hq_line1, 
-            hq_postalcode, 
-            company_name
-        FROM
-            cli
-    ),
-    gmb_search AS ( 
-        SELECT 
-            company_id AS gmb_company_id 
-        FROM 
-            google_my_business_locations
-    ),
-    joined_data AS (
-        SELECT
-            a.companyid,
-            b.company_id,
-            c.gmb_company_id
-        FROM
-            kenze_profile_search AS a
-            LEFT JOIN cli_search AS b ON a.companyid = b.company_id::VARCHAR
-            LEFT JOIN gmb_search AS c ON a.companyid = c.gmb_company_id::VARCHAR
-        WHERE
-            a.companyid IS NOT NULL
-            AND b.company_id IS NOT NULL
-            AND b.serper_addressscrape_timestamp IS NOT NULL
-    )
-    SELECT
-        COUNT(*) AS total_companies,
-        ROUND(
-            (COUNT(CASE WHEN gmb_company_id IS NULL THEN 1 END) * 100.0) / COUNT(*),
-            2
-        ) AS gmb_companies_not_found 
-    FROM
-        joined_data
-    """)
-
-    result = cur.fetchone()
-    total_companies, gmb_companies_not_found = result
-
-    # Calculate the percentage of companies found on GMB
-    gmb_companies_found = 100 - gmb_companies_not_found
-
-    # Create a pie chart
-    fig = go.Figure(data=[go.Pie(
-        labels=['Found on GMB', 'Not Found on GMB'],
-        values=[gmb_companies_found, gmb_companies_not_found],
-        hole=.3,
-        marker_colors=['#66b3ff', '#ff9999']
-    )])
-
-    fig.update_layout(
-        title="Google My Business (GMB) Profile Coverage",
-        annotations=[dict(text=f'Total: {total_companies}', x=0.5, y=0.5, font_size=20, showarrow=False)]
-    )
-
-    # Display the chart
-    st.plotly_chart(fig, use_container_width=True)
-
-    # Display additional information
-    st.info(f"""
-    - Total companies: {total_companies}
-    - Companies found on GMB: {round(gmb_companies_found, 2)}%
-    - Companies not found on GMB: {gmb_companies_not_found}%
-    """)
+    progress_section("gmb_coverage", show_gmb_coverage, live_settings)
 
     # Step 6: Company Website Scraping
     st.subheader("📊 Step 6: Company Website Scraping")
@@ -728,80 +834,8 @@ def main():
         This analysis can reveal additional insights into the company's technical preferences and infrastructure. 
         """)
 
-    # Execute the query for Step 6
-    cur.execute("""
-    WITH kenze_profile_search AS (
-        SELECT DISTINCT
-            companyid
-        FROM
-            kenze_profile_search
-        WHERE
-            companyid IS NOT NULL
-            AND companyid != ''
-            AND net_profile = TRUE
-    ),
-    cli_search AS (
-        SELECT
-            company_id,
-            enrichment_timestamp, 
-            serper_addressscrape_timestamp, 
-            website, 
-            hq_line1, 
-            hq_postalcode, 
-            company_name,
-            embed_website_timestamp
-        FROM
-            cli
-        where website is not null and website != ''
-    ),
-    joined_data AS (
-        SELECT
-            a.companyid,
-            b.company_id,
-            b.embed_website_timestamp,b.website
-        FROM
-            kenze_profile_search AS a
-            LEFT JOIN cli_search AS b ON a.companyid = b.company_id::VARCHAR
-            
-        WHERE
-            a.companyid IS NOT NULL
-            AND b.company_id IS NOT NULL
-    )
-    SELECT 
-        COUNT(*) AS total_companies,
-        ROUND((COUNT(CASE WHEN embed_website_timestamp IS NULL THEN 1 END) * 100.0) / COUNT(*), 2 ) AS websites_to_embed 
-    FROM
-        joined_data
-    """)
-
-    result = cur.fetchone()
-    total_companies, websites_to_embed = result
-
-    # Calculate the percentage of websites embedded
-    websites_embedded = 100 - websites_to_embed
-
-    # Create a pie chart
-    fig = go.Figure(data=[go.Pie(
-        labels=['Websites Embedded', 'Websites to Embed'],
-        values=[websites_embedded, websites_to_embed],
-        hole=.3,
-        marker_colors=['#66b3ff', '#ff9999']
-    )])
-
-    fig.update_layout(
-        title="Company Website Embedding Progress",
-        annotations=[dict(text=f'Total: {total_companies}', x=0.5, y=0.5, font_size=20, showarrow=False)]
-    )
-
-    # Display the chart
-    st.plotly_chart(fig, use_container_width=True)
+    progress_section("website_embedding", show_website_embedding, live_settings)
 
-    # Display additional information
-    st.info(f"""
-    - Total companies: {total_companies}
-    - Websites embedded: {round(websites_embedded, 2)}%
-    - Websites to embed: {websites_to_embed}%
-""")
     # Step 7: Financial Data Scraping
     st.subheader("📊 Step 7: Financial Data Scraping")
 
@@ -819,98 +853,16 @@ def main():
         This financial information provides context on the economic health and scale of companies employing .NET developers in Flanders, allowing for more comprehensive market analysis.
         """)
 
-    # Execute the query for Step 7
-    cur.execute("""
-    WITH kenze_profile_search AS (
-        SELECT DISTINCT
-            companyid
-        FROM
-            kenze_profile_search
-        WHERE
-            companyid IS NOT NULL
-            AND companyid != ''
-            AND net_profile = TRUE
-    ),
-    cli_search AS (
-        SELECT
-            company_id,
-            enrichment_timestamp, 
-            serper_addressscrape_timestamp, 
-            vat_scrape_timestamp,
-            website, 
-            hq_line1, 
-            hq_postalcode, 
-            company_name, 
-            embed_website_timestamp
-        FROM
-            cli
-    ),
-    financial_search AS ( 
-        SELECT 
-            company_id, 
-            year, 
-            ROUND(equity, 0) AS equity, 
-            employees AS fte_employees, 
-            ROUND(profit_loss, 0) AS profit_loss, 
-            ROUND(gross_margin, 0) AS gross_margin,
-            update_timestamp
-        FROM (
-            SELECT 
-                company_id, 
-                year, 
-                equity, 
-                employees, 
-                profit_loss, 
-                gross_margin,
-                update_timestamp,
-                ROW_NUMBER() OVER (PARTITION BY company_id ORDER BY year DESC) AS rn
-            FROM 
-                financial_data
-        ) AS subquery
-        WHERE rn = 1
-    )
+    progress_section("financial_enrichment", show_financial_enrichment, live_settings)
 
-    SELECT
-        count(a.companyid) AS total_companies,
-        ROUND(COUNT(CASE WHEN b.vat_scrape_timestamp IS NOT NULL THEN 1 END) * 100.0 / count(a.companyid), 2) AS pct_financial_data_enrichment
-    FROM
-        kenze_profile_search AS a
-    FULL JOIN cli_search AS b
-        ON a.companyid = b.company_id::VARCHAR
-    LEFT JOIN financial_search AS d
-        ON a.companyid = d.company_id::VARCHAR
-    WHERE
-        a.companyid IS NOT NULL;
-    """)
-
-    result = cur.fetchone()
-    total_companies, pct_financial_data_enrichment = result
+    # Pipeline throughput and ETA per stage, from the scrape timestamps
+    st.subheader("📊 Pipeline Throughput")
 
-    # Calculate the percentage of companies without financial data
-    pct_no_financial_data = 100 - pct_financial_data_enrichment
-
-    # Create a pie chart
-    fig = go.Figure(data=[go.Pie(
-        labels=['Financial Data Available', 'No Financial Data Available'],
-        values=[pct_financial_data_enrichment, pct_no_financial_data],
-        hole=.3,
-        marker_colors=['#66b3ff', '#ff9999']
-    )])
-
-    fig.update_layout(
-        title="Financial Data Enrichment Progress",
-        annotations=[dict(text=f'Total: {total_companies}', x=0.5, y=0.5, font_size=20, showarrow=False)]
-    )
-
-    # Display the chart
-    st.plotly_chart(fig, use_container_width=True)
+    lookback_hours = st.selectbox("Throughput lookback", options=THROUGHPUT_LOOKBACKS, index=2,
+                                  format_func=lambda hours: f"Last {hours // 24} day(s)")
 
-    # Display additional information
-    st.info(f"""
-    - Total companies: {total_companies}
-    - Companies with financial data: {round(pct_financial_data_enrichment, 2)}%
-    - Companies without financial data: {round(pct_no_financial_data, 2)}%
-    """)
+    outcome = warmer.get(f"throughput_{lookback_hours}")
+    show_with_fallback(lambda rows: show_throughput(rows, lookback_hours), outcome)
 
 
 
@@ -997,36 +949,13 @@ def main():
    
  
 
-    # Connect to the database and fetch data
-    conn = connect_to_db()
-    cur = conn.cursor()
-
-    # Fetch data from the table, including the new columns
-    cur.execute("SELECT * FROM public_dbt.a_final_kenze_companies")
-    data = cur.fetchall()
-
-    # Convert data to a pandas DataFrame
-    df = pd.DataFrame(data, columns=[desc[0] for desc in cur.description])
+    # Company data, including the new columns, as pre-warmed DataFrame (shared, do not modify it)
+    df = warmer.get("companies")
 
 
-    # Create a geo map
+    # Create a geo map of the companies in Belgium
     if 'latitude' in df.columns and 'longitude' in df.columns:
-        # Convert latitude and longitude to float if they're not already
-        df['latitude'] = pd.to_numeric(df['latitude'], errors='coerce')
-        df['longitude'] = pd.to_numeric(df['longitude'], errors='coerce')
-
-        # Remove rows with null values in latitude or longitude
-        df_map = df.dropna(subset=['latitude', 'longitude'])
-
-        # Filter for Belgium (approximate bounding box)
-        belgium_lat_min, belgium_lat_max = 49.5, 51.5
-        belgium_lon_min, belgium_lon_max = 2.5, 6.4
-        df_belgium = df_map[
-            (df_map['latitude'] >= belgium_lat_min) & 
-            (df_map['latitude'] <= belgium_lat_max) & 
-            (df_map['longitude'] >= belgium_lon_min) & 
-            (df_map['longitude'] <= belgium_lon_max)
-        ]
+        df_belgium = filters.companies_in_belgium(df)
 
         if not df_belgium.empty:
             st.subheader("Interactive Company Map")
@@ -1044,51 +973,48 @@ def main():
                     
                     # New text input for description exclusion filter
                     description_filter_exclude = st.text_area("Exclude Filter Description (comma-separated)", "")
-                     # Split the input into a list of keywords, removing any extra spaces
-                    exclude_keywords = [keyword.strip() for keyword in description_filter_exclude.split(',') if keyword.strip()]
+                    exclude_keywords = filters.split_keywords(description_filter_exclude)
                     
                     
                     # New text area for open positions filter
                     open_positions_filter = st.text_area("Filter Open Positions (comma-separated)", "")
-                    # Split the input into a list of keywords, removing any extra spaces
-                    open_positions_keywords = [keyword.strip() for keyword in open_positions_filter.split(',') if keyword.strip()]
+                    open_positions_keywords = filters.split_keywords(open_positions_filter)
                     
                     # New text area for excluding keywords in open positions
                     open_positions_exclude_filter = st.text_area("Exclude Filter Open Positions (comma-separated)", "")
-                    # Split the input into a list of keywords, removing any extra spaces
-                    open_positions_exclude_keywords = [keyword.strip() for keyword in open_positions_exclude_filter.split(',') if keyword.strip()]
+                    open_positions_exclude_keywords = filters.split_keywords(open_positions_exclude_filter)
                     
                     # New slider for employee count
                     employee_count_range = st.slider("Select Employee Count Range", 0, int(df_belgium['employee_count'].max()), (0, int(df_belgium['employee_count'].max())), 1)
                     
+                    min_net_devs = None
                     if 'net_dev_count' in df_belgium.columns:
                         min_net_devs = st.number_input("Minimum .NET Developers", min_value=0, value=0, key="map_min_net_devs")
                     
+                    map_technologies = st.multiselect("Website Technologies (any of)", filters.technology_options(df_belgium))
+                    
                     # New slider filters for ratios
                     net_profile_ratio_range = st.slider("Select .NET Profile vs Total Ratio Range", 0.0, 100.0, (0.0, 100.0), 0.1)
                     it_executive_ratio_range = st.slider("Select IT Executive vs IT Specialist Ratio Range", 0.0, 100.0, (0.0, 100.0), 0.1)
                     it_team_percentage_range = st.slider("Select IT Team Percentage Range",    0.0, 100.0, (0.0, 100.0), 0.1)
 
             with col2:  # Right column for the map
-                filtered_map_df = df_belgium[
-                    (~df_belgium['industry'].isin(map_industries) if map_industries else True) &
-                    (~df_belgium['category'].isin(map_categories) if map_categories else True) &
-                    (df_belgium['gmb_address'].str.lower().str.contains(gmb_address_filter_include.lower()) if gmb_address_filter_include else True) &  # Filter by GMB address
-                    (df_belgium['gmb_address'].str.lower().str.contains(gmb_address_filter_exclude.lower()) == False if gmb_address_filter_exclude else True) &  # Exclude by GMB address
-                    (~df_belgium['description'].str.lower().str.contains('|'.join(exclude_keywords)) if exclude_keywords else True) &  # Exclude by description
-                    (df_belgium['wc_open_positions'].str.lower().str.contains('|'.join(open_positions_keywords)) if open_positions_keywords else True) &  # Filter by open positions
-                    (~df_belgium['wc_open_positions'].str.lower().str.contains('|'.join(open_positions_exclude_keywords)) if open_positions_exclude_keywords else True) &  # Exclude by open positions
-                    (df_belgium['employee_count'] >= employee_count_range[0]) &
-                    (df_belgium['employee_count'] <= employee_count_range[1]) &
-                    (df_belgium['net_dev_count'] >= min_net_devs if 'net_dev_count' in df_belgium.columns else True) &
-                    (df_belgium['net_profile_vs_total_ratio'] >= net_profile_ratio_range[0]) &
-                    (df_belgium['net_profile_vs_total_ratio'] <= net_profile_ratio_range[1]) &
-                    (df_belgium['it_executive_vs_it_specialist_ratio'] >= it_executive_ratio_range[0]) &
-                    (df_belgium['it_executive_vs_it_specialist_ratio'] <= it_executive_ratio_range[1]) &
-                    (df_belgium['it_team_percentage'] >= it_team_percentage_range[0]) &  # Filter by IT Team Percentage
-                    (df_belgium['it_team_percentage'] <= it_team_percentage_range[1]) 
-    
-                ]
+                company_criteria = dict(
+                    exclude_industries=map_industries,
+                    exclude_categories=map_categories,
+                    gmb_address_include=gmb_address_filter_include,
+                    gmb_address_exclude=gmb_address_filter_exclude,
+                    description_exclude=exclude_keywords,
+                    open_positions_include=open_positions_keywords,
+                    open_positions_exclude=open_positions_exclude_keywords,
+                    employee_count_range=employee_count_range,
+                    min_net_devs=min_net_devs,
+                    technologies=map_technologies,
+                    net_profile_ratio_range=net_profile_ratio_range,
+                    it_executive_ratio_range=it_executive_ratio_range,
+                    it_team_percentage_range=it_team_percentage_range,
+                )
+                filtered_map_df = filters.filter_companies(df_belgium, **company_criteria)
 
                 if not filtered_map_df.empty:
                     m = folium.Map(location=[filtered_map_df['latitude'].mean(), filtered_map_df['longitude'].mean()], zoom_start=8)
@@ -1113,12 +1039,8 @@ def main():
             # Move the filtered data display outside the columns
             st.subheader("Filtered Company Data")
             if not filtered_map_df.empty:
-                columns_to_display = ['company_name', 'industry', 'employee_count', 'total', 'it_engineering', 'net_profile', 'net_profile_vs_total_ratio', 'it_team_percentage', 'it_executive_vs_it_specialist_ratio', 'specialist_vs_total_ratio', 'net_profile_vs_it_engineering_ratio', 'technical_executive', 'operations', 'customer_success', 'finance', 'sales', 'marketing', 'human_resources', 'specialist', 'senior', 'executive', 'advisor', 'cli_url', 'founded', 'hq_city', 'tagline', 'cli_website', 'vat_number', 'cover_image', 'description', 'followercount', 'universal_name', 'logo_resulution', 'employee_count_range', 'equity', 'fte_employees', 'profit_loss', 'gross_margin', 'cid', 'gmb_title', 'rating', 'gmb_address', 'category', 'phone_number', 'rating_count', 'wc_description', 'wc_business_type', 'wc_hiring', 'wc_about_section', 'wc_pricing_mentioned', 'wc_trial_available', 'wc_keywords', 'wc_career_urls', 'wc_social_media', 'wc_open_positions', 'wc_ideal_customer_profile', 'wc_case_studies', 'wc_contact_info', 'kar_company_id'] 
-                if 'net_dev_count' in filtered_map_df.columns:
-                    columns_to_display.append('net_dev_count')
-                
                 # Only include columns that exist in the dataframe
-                available_columns = [col for col in columns_to_display if col in filtered_map_df.columns]
+                available_columns = [col for col in filters.COMPANY_COLUMNS if col in filtered_map_df.columns]
                 
                 if available_columns:
                     total_results = len(filtered_map_df)
@@ -1140,34 +1062,17 @@ def main():
                     with col2:
                         st.info("The download CSV button will be enabled in the final delivery.")
 
+                    show_lookalikes(warmer, filtered_map_df, df)
+
                     # Extract kar_company_id values after the download section
                     kar_company_ids = filtered_map_df['kar_company_id'].dropna().unique().tolist()
 
-                    # Execute the query using the list of kar_company_ids
-                    kar_company_ids_str = "', '".join(kar_company_ids)  # Format: 'id1', 'id2', ...
-                    query = f"""
-                    SELECT * 
-                    FROM kenze_pli_profiles 
-                    WHERE companyid IN ('{kar_company_ids_str}');
-                    """
-                    
-                    # Connect to the database and fetch data
-                    conn = connect_to_db()
-                    cur = conn.cursor()
-                    cur.execute(query)
-                    result_table = cur.fetchall()
-
-                    # Convert the result to a pandas DataFrame
-                    result_df = pd.DataFrame(result_table, columns=[desc[0] for desc in cur.description])
-                    
-                     # Limit the columns to the specified ones
-                    columns_to_keep = [
-                       'name', 'title', 'summary', 'lastname', 'location', 
-                       'firstname', 'ispremium', 'seniority', 'department', 
-                       'isopenlink', 'companyname', 'titledescription', 
-                       'months_in_company', 'net_profile'
-                    ]
-                    result_df = result_df[columns_to_keep]
+                    # Fetch the profiles of these companies, limited to the specified columns and kept on
+                    # disk past the memory budget. Without company filters they are the pre-warmed
+                    # profiles of all companies.
+                    all_company_ids, selection = warmer.get("profiles")
+                    if kar_company_ids != all_company_ids:
+                        selection = profile_selection(tuple(kar_company_ids))
 
                     # Display the resulting DataFrame with filters
                     st.subheader("Filtered Profile Data")  # Updated title
@@ -1176,31 +1081,34 @@ def main():
                     col1, col2 = st.columns(2)
 
                     with col1:  # Left column for filters
+                        # Options and counts come from the selection's summary, see profiles.py
+                        profile_filters = {}
+
                         # Filter by seniority
-                        seniority_filter = st.selectbox("Select Seniority", options=["All"] + result_df['seniority'].unique().tolist())
+                        seniority_filter = st.selectbox("Select Seniority", options=["All"] + selection.values('seniority'))
                         if seniority_filter != "All":
-                            result_df = result_df[result_df['seniority'] == seniority_filter]
+                            profile_filters['seniority'] = seniority_filter
 
                         # Filter by department
-                        department_filter = st.selectbox("Select Department", options=["All"] + result_df['department'].unique().tolist())
+                        department_filter = st.selectbox("Select Department", options=["All"] + selection.values('department', **profile_filters))
                         if department_filter != "All":
-                            result_df = result_df[result_df['department'] == department_filter]
+                            profile_filters['department'] = department_filter
 
                         # Filter by months in company
-                        months_in_company_filter = st.slider("Select Months in Company", min_value=int(result_df['months_in_company'].min()), 
-                                                              max_value=int(result_df['months_in_company'].max()), 
-                                                              value=(int(result_df['months_in_company'].min()), int(result_df['months_in_company'].max())))
-                        result_df = result_df[(result_df['months_in_company'] >= months_in_company_filter[0]) & 
-                                              (result_df['months_in_company'] <= months_in_company_filter[1])]
+                        months_min, months_max = map(int, selection.bounds('months_in_company', **profile_filters))
+                        months_in_company_filter = st.slider("Select Months in Company", min_value=months_min,
+                                                              max_value=months_max,
+                                                              value=(months_min, months_max))
+                        profile_filters['months_in_company'] = months_in_company_filter
 
                         # Filter by net profile
                         net_profile_filter = st.selectbox("Select Net Profile", options=["All", True, False])
                         if net_profile_filter != "All":
-                            result_df = result_df[result_df['net_profile'] == net_profile_filter]
+                            profile_filters['net_profile'] = net_profile_filter
 
                     with col2:  # Right column for information
                         # Display the total count of profiles in an info box
-                        total_count = len(result_df)
+                        total_count = selection.count(**profile_filters)
                         st.info(""" 
                                 ## Granular Campaign Segmentation LinkedIn (and Others) Can't Offer
 
@@ -1215,25 +1123,62 @@ def main():
                                 For more details on LinkedIn Campaigns, check out [LinkedIn's guide](https://www.linkedin.com/help/lms/answer/a1489764) or get in touch [here](https://www.linkedin.com/in/victordecoster).
                                 """)
 
-                    # Display the filtered DataFrame (limit to top 10)
-                    st.dataframe(result_df.head(10))
+                    # Profile mix of the selected companies (the months slider is shown as tenure buckets)
+                    show_profile_mix(
+                        warmer.get("profile_rollup"),
+                        company_ids=kar_company_ids,
+                        seniority=None if seniority_filter == "All" else seniority_filter,
+                        department=None if department_filter == "All" else department_filter,
+                        net_profile=None if net_profile_filter == "All" else net_profile_filter,
+                    )
+
+                    # Display the filtered DataFrame (limit to top 10), only these rows are read
+                    st.dataframe(selection.head(10, **profile_filters))
 
                     # Empty information section with placeholder text
                     st.info(f"Total results: {total_count}. Showing top 10 profiles, all profiles will be enabled in final delivery.")
+                    if selection.spilled:
+                        st.caption(f"The profiles of these companies exceed the {PROFILE_MEMORY_MB} MB memory budget "
+                                   "and are read from disk.")
+
+                    show_profile_search(backend, kar_company_ids)
                     
                     # New download section with info
                     col1, col2 = st.columns(2)
                     with col1:
-                        csv = result_df.to_csv(index=False)
                         st.download_button(
                             label="Download profile data as CSV",
-                            data=csv,
+                            # Written chunk by chunk when the button is clicked
+                            data=functools.partial(profiles_csv, selection, profile_filters),
                             file_name="company_data.csv",
                             mime="text/csv",
                             disabled=True  # Set to True for now, can be enabled later
                             )
                     with col2:
                       st.info("The download CSV button will be enabled in the final delivery.")
+
+                    # Save the current company and profile filters as a named segment
+                    with st.expander("Save these filters as a segment"):
+                        profile_criteria = {
+                            "seniority": seniority_filter,
+                            "department": department_filter,
+                            "months_in_company": list(months_in_company_filter),
+                            "net_profile": net_profile_filter,
+                        }
+                        definition = {
+                            "description": st.text_input("Segment description"),
+                            # Only the filters that are set, ranges as selected
+                            "companies": {name: list(value) if isinstance(value, tuple) else value
+                                          for name, value in company_criteria.items() if value},
+                            "profiles": {name: value for name, value in profile_criteria.items() if value != "All"},
+                        }
+                        segment_name = st.text_input("Segment name", help="Letters, digits and '_'")
+                        if st.button("Save segment", disabled=not segment_name):
+                            try:
+                                segments.save_segment(SEGMENTS_FILE, segment_name, definition)
+                                st.success(f"Saved segment {segment_name}. Run `python segments.py build` to precompute it.")
+                            except ValueError as e:
+                                st.error(str(e))
                 else:
                     st.warning("No relevant columns available to display.")
             else:
@@ -1243,6 +1188,8 @@ def main():
     else:
         st.warning("Latitude and longitude columns not found in the data.")
 
+    show_saved_segments(warmer)
+
    
 if __name__ == "__main__":
     main()
@@ -0,0 +1,185 @@
+# Data backends the dashboard can run against.
+#
+# PostgresBackend queries the live database. DuckDBBackend runs the same SQL
+# from queries.py in-process against a Parquet snapshot written by
+# snapshot.py, so the app works offline and filtering needs no network round
+# trips.
+#
+# The backend is picked with DATA_BACKEND in secrets.toml ("postgres", the
+# default, or "duckdb"); the snapshot is read from SNAPSHOT_DIR (default
+# "snapshot").
+
+import json
+import os
+import re
+
+import pandas as pd
+import psycopg2
+import streamlit as st
+
+import queries
+import search
+import similar
+from db import connect_to_db, fetch_dataframe, fetch_rows, stream_arrow_batches
+
+# Optional, only needed for the snapshot backend
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+
+MANIFEST_FILE = "snapshot.json"
+
+# Rows per batch of DuckDBBackend.stream()
+STREAM_BATCH_ROWS = 100000
+
+
+# Both backends share this interface: fetch() returns one row or all rows as
+# tuples, dataframe() returns the whole result as a DataFrame, stream() yields
+# it as Arrow record batches of bounded size, search_profiles() one page of a
+# ranked full-text profile search (with rank and total_matches columns) and
+# website_index() the lookalike search index over the website embeddings
+# (None without embeddings). The app keeps the index in its pre-warmed results
+# (see warmup.py). unavailable_errors are the errors of a query that timed out
+# or could not reach its data, for which db.fetch_with_fallback shows the last
+# good result instead.
+class PostgresBackend:
+    name = "postgres"
+    # Live updates need LISTEN/NOTIFY or the table statistics of the database
+    supports_live = True
+    # QueryCanceledError (statement timeout) included
+    unavailable_errors = (psycopg2.OperationalError,)
+
+    def fetch(self, sql, params=None, many=False, timeout_ms=None):
+        return fetch_rows(sql, params, many=many, timeout_ms=timeout_ms)
+
+    def dataframe(self, sql, params=None):
+        conn = connect_to_db()
+        try:
+            return fetch_dataframe(conn, sql, params)
+        finally:
+            conn.close()
+
+    def stream(self, sql, params=None):
+        conn = connect_to_db()
+        try:
+            yield from stream_arrow_batches(conn, sql, params)
+        finally:
+            conn.close()
+
+    def search_profiles(self, query, company_ids=None, limit=20, offset=0):
+        return self.dataframe(queries.PROFILE_SEARCH, {"query": search.normalize_terms(query),
+                                                       "company_ids": company_ids,
+                                                       "limit": limit, "offset": offset})
+
+    # Built from the live embeddings on every call
+    def website_index(self):
+        conn = connect_to_db()
+        try:
+            company_ids, embeddings = similar.load_embeddings(conn)
+        finally:
+            conn.close()
+        return similar.EmbeddingIndex.build(company_ids, embeddings) if len(company_ids) else None
+
+    def describe(self):
+        return "Live PostgreSQL database"
+
+
+# psycopg2 placeholders to DuckDB ones: %(name)s -> $name, %s -> ?, %% -> %
+PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s|%%")
+
+
+def to_duckdb_sql(sql):
+    def replace(match):
+        if match.group(1):
+            return f"${match.group(1)}"
+        return "?" if match.group(0) == "%s" else "%"
+    return PLACEHOLDER.sub(replace, sql)
+
+
+def load_manifest(snapshot_dir):
+    path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No snapshot in {snapshot_dir}, create one with `python snapshot.py --dir {snapshot_dir}`")
+    with open(path) as f:
+        return json.load(f)
+
+
+class DuckDBBackend:
+    name = "duckdb"
+    # A snapshot does not change while the app runs
+    supports_live = False
+    # IOException (a snapshot file missing or locked) included
+    unavailable_errors = (duckdb.OperationalError,) if duckdb is not None else ()
+
+    def __init__(self, snapshot_dir):
+        if duckdb is None:
+            raise RuntimeError('DATA_BACKEND = "duckdb" needs the duckdb package (pip install duckdb)')
+        self.snapshot_dir = snapshot_dir
+        self.manifest = load_manifest(snapshot_dir)
+        self.conn = duckdb.connect()
+        # Timestamps were exported in UTC, keep casts to TIMESTAMP in UTC as well
+        self.conn.execute("SET TimeZone = 'UTC'")
+        # One view per snapshot table under its Postgres name, so queries.py runs unchanged
+        for table, info in self.manifest["tables"].items():
+            schema, _, _ = table.rpartition(".")
+            if schema:
+                self.conn.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+            path = os.path.join(snapshot_dir, info["file"]).replace("'", "''")
+            self.conn.execute(f"CREATE VIEW {table} AS SELECT * FROM read_parquet('{path}')")
+
+    def execute(self, sql, params=None):
+        # A cursor per query, the connection is shared by the sessions' threads
+        cur = self.conn.cursor()
+        cur.execute(to_duckdb_sql(sql), params)
+        return cur
+
+    def fetch(self, sql, params=None, many=False, timeout_ms=None):
+        cur = self.execute(sql, params)
+        return cur.fetchall() if many else cur.fetchone()
+
+    def dataframe(self, sql, params=None):
+        return self.execute(sql, params).fetch_arrow_table().to_pandas()
+
+    def stream(self, sql, params=None):
+        yield from self.execute(sql, params).fetch_record_batch(STREAM_BATCH_ROWS)
+
+    # Matches come from the snapshot's FTS index, their rows from the Parquet
+    # file the index row numbers refer to
+    def search_profiles(self, query, company_ids=None, limit=20, offset=0):
+        hits, total = search.search_index(os.path.join(self.snapshot_dir, search.INDEX_FILE), query,
+                                          company_ids, limit, offset)
+        path = os.path.join(self.snapshot_dir, self.manifest["tables"]["kenze_pli_profiles"]["file"])
+        rows = self.execute(
+            "SELECT * FROM read_parquet(?, file_row_number = true) WHERE file_row_number IN (SELECT UNNEST(?))",
+            [path, [rowid for rowid, _ in hits]],
+        ).fetch_arrow_table().to_pandas()
+
+        ranks = pd.DataFrame(hits, columns=["file_row_number", "rank"])
+        result = ranks.merge(rows, on="file_row_number").drop(columns="file_row_number")
+        # Same column order as queries.PROFILE_SEARCH
+        result = result[[col for col in rows.columns if col != "file_row_number"] + ["rank"]]
+        return result.assign(total_matches=total)
+
+    # Index built by snapshot.py
+    def website_index(self):
+        path = os.path.join(self.snapshot_dir, similar.INDEX_FILE)
+        return similar.EmbeddingIndex.load(path) if os.path.exists(path) else None
+
+    def describe(self):
+        return f"Snapshot {self.manifest['version']} ({self.snapshot_dir})"
+
+
+def open_backend(kind="postgres", snapshot_dir="snapshot"):
+    if kind == "postgres":
+        return PostgresBackend()
+    if kind == "duckdb":
+        return DuckDBBackend(snapshot_dir)
+    raise ValueError(f"Unknown DATA_BACKEND {kind!r}, use 'postgres' or 'duckdb'")
+
+
+# Backend configured in secrets.toml, shared by all sessions of this server process
+@st.cache_resource
+def get_backend():
+    return open_backend(st.secrets.get("DATA_BACKEND", "postgres"), st.secrets.get("SNAPSHOT_DIR", "snapshot"))
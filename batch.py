@@ -0,0 +1,125 @@
+# Headless batch run: Step metrics and segment exports without Streamlit.
+#
+# Computes every progress metric shown on the dashboard (Steps 1-7 and the
+# pipeline throughput) and evaluates saved segment definitions (see
+# segments.py) with the same queries and filters as the app. Segments are
+# evaluated in parallel in a process pool; each writes its company and profile
+# list to the output directory. Runs against the backend in secrets.toml
+# unless --backend is given.
+#
+# Example (weekly campaign lists from cron):
+#   python batch.py --segments segments.json --out exports/$(date +%F) --workers 8
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import streamlit as st
+
+import filters
+import queries
+import throughput
+from backend import open_backend
+from segments import evaluate_segment, load_population, load_segments
+
+
+# Query results as JSON-ready records (timestamps as ISO strings, numpy and
+# Decimal values as plain numbers)
+def to_records(df):
+    return json.loads(df.to_json(orient="records", date_format="iso"))
+
+
+def compute_metrics(backend, lookback_hours):
+    metrics = {name: to_records(backend.dataframe(sql)) for name, sql in queries.PROGRESS_QUERIES.items()}
+
+    buckets = throughput.to_frame(backend.fetch(queries.THROUGHPUT, {"lookback_hours": lookback_hours}, many=True))
+    if not buckets.empty:
+        summary = throughput.stage_summary(buckets, throughput.hourly_counts(buckets, lookback_hours))
+        slowest = throughput.bottleneck(summary)
+        metrics["throughput"] = {
+            "lookback_hours": lookback_hours,
+            "stages": to_records(summary.assign(eta=summary["eta_hours"].map(throughput.format_eta))),
+            "bottleneck": throughput.STAGE_LABELS[slowest] if slowest is not None else None,
+        }
+    return metrics
+
+
+# Data shared by the segment workers, set once per process by the pool initializer
+WORKER_DATA = {}
+
+
+def init_worker(companies, profiles):
+    WORKER_DATA["companies"] = companies
+    WORKER_DATA["profiles"] = profiles
+
+
+def export_segment(name, definition, out_dir, file_format):
+    start = time.perf_counter()
+    companies, profiles = evaluate_segment(definition, WORKER_DATA["companies"], WORKER_DATA["profiles"])
+    companies = companies[[col for col in filters.COMPANY_COLUMNS if col in companies.columns]]
+    profiles = profiles[filters.PROFILE_COLUMNS]
+
+    for kind, data in [("companies", companies), ("profiles", profiles)]:
+        path = os.path.join(out_dir, f"{name}_{kind}.{file_format}")
+        if file_format == "parquet":
+            data.to_parquet(path, index=False)
+        else:
+            data.to_csv(path, index=False)
+
+    return {"segment": name, "companies": len(companies), "profiles": len(profiles),
+            "elapsed_s": round(time.perf_counter() - start, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute the dashboard metrics and export saved segments")
+    parser.add_argument("--segments", default="segments.json", help="Segment definitions (JSON)")
+    parser.add_argument("--only", nargs="+", help="Export only these segments")
+    parser.add_argument("--out", default="exports", help="Output directory")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Segment worker processes")
+    parser.add_argument("--lookback-hours", type=int, default=168, help="Throughput lookback window")
+    parser.add_argument("--backend", choices=["postgres", "duckdb"], help="Default: DATA_BACKEND from secrets.toml")
+    parser.add_argument("--snapshot-dir", help="Default: SNAPSHOT_DIR from secrets.toml")
+    parser.add_argument("--skip-metrics", action="store_true", help="Only export the segments")
+    args = parser.parse_args()
+
+    segments = load_segments(args.segments)
+    if args.only:
+        missing = set(args.only) - set(segments)
+        if missing:
+            parser.error(f"unknown segment(s): {', '.join(sorted(missing))}")
+        segments = {name: segments[name] for name in args.only}
+
+    backend = open_backend(args.backend or st.secrets.get("DATA_BACKEND", "postgres"),
+                           args.snapshot_dir or st.secrets.get("SNAPSHOT_DIR", "snapshot"))
+    os.makedirs(args.out, exist_ok=True)
+    start = time.perf_counter()
+
+    if not args.skip_metrics:
+        metrics = compute_metrics(backend, args.lookback_hours)
+        with open(os.path.join(args.out, "metrics.json"), "w") as f:
+            json.dump(metrics, f, indent=2)
+        print(f"Metrics written to {os.path.join(args.out, 'metrics.json')}")
+
+    # Load once, every segment is a filter over the same companies and profiles
+    companies, profiles = load_population(backend)
+    print(f"Loaded {len(companies)} companies and {len(profiles)} profiles in {time.perf_counter() - start:.1f}s")
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(companies, profiles)) as pool:
+        futures = [pool.submit(export_segment, name, definition, args.out, args.format)
+                   for name, definition in segments.items()]
+        results = [future.result() for future in futures]
+
+    for result in results:
+        print(f"{result['segment']:<32} {result['companies']:>7} companies {result['profiles']:>8} profiles  {result['elapsed_s']}s")
+
+    summary = {"elapsed_s": round(time.perf_counter() - start, 2), "segments": results}
+    with open(os.path.join(args.out, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"{len(results)} segment(s) exported to {args.out} in {summary['elapsed_s']}s")
+
+
+if __name__ == "__main__":
+    main()
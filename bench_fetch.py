@@ -0,0 +1,144 @@
+# Benchmark of the bulk fetch path against cursor.fetchall().
+#
+# Loads the same result set with every available method and reports the
+# median wall time, rows per second and peak memory. Python heap memory is
+# measured with tracemalloc; Arrow buffers live outside the Python heap and are
+# reported from the Arrow memory pool.
+#
+# By default it benchmarks a synthetic profiles-like table of --rows rows,
+# created in the app database and dropped afterwards. --source companies or
+# --source profiles benchmarks the app's own loads instead.
+#
+# Example:
+#   python bench_fetch.py --rows 200000 --repeat 5 --output bench.json
+
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+
+import pyarrow as pa
+
+import db
+import queries
+from db import connect_to_db, fetch_dataframe
+
+
+BENCH_TABLE = "bench_fetch_profiles"
+
+# Column mix of the profiles load: mostly text, a few flags and numbers
+CREATE_BENCH_TABLE = """
+CREATE UNLOGGED TABLE {table} AS
+SELECT
+    (1000 + i % 5000)::VARCHAR AS companyid,
+    'Firstname' || i || ' Lastname' || i AS name,
+    (ARRAY['Senior .NET Developer', 'Software Engineer', 'IT Manager', 'Consultant'])[1 + i % 4] AS title,
+    repeat('Experienced developer working with C# and Azure. ', 1 + i % 5) AS summary,
+    'Lastname' || i AS lastname,
+    (ARRAY['Brussels', 'Antwerp', 'Ghent', 'Leuven'])[1 + i % 4] AS location,
+    'Firstname' || i AS firstname,
+    i % 7 = 0 AS ispremium,
+    (ARRAY['Senior', 'Specialist', 'Executive', 'Advisor'])[1 + i % 4] AS seniority,
+    (ARRAY['IT Engineering', 'Operations', 'Sales', 'Finance'])[1 + i % 4] AS department,
+    i % 11 = 0 AS isopenlink,
+    'Company ' || (i % 5000) || ' BV' AS companyname,
+    CASE WHEN i % 3 = 0 THEN NULL ELSE 'Building line-of-business applications' END AS titledescription,
+    (i % 240)::INTEGER AS months_in_company,
+    i % 4 = 0 AS net_profile,
+    (random() * 100000)::NUMERIC(12, 2) AS salary_estimate,
+    now() - (i % 1000) * INTERVAL '1 hour' AS employee_scrape_timestamp
+FROM generate_series(1, {rows}) AS i
+"""
+
+
+def source_query(conn, source, rows):
+    if source == "synthetic":
+        cur = conn.cursor()
+        cur.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        cur.execute(CREATE_BENCH_TABLE.format(table=BENCH_TABLE, rows=int(rows)))
+        conn.commit()
+        return f"SELECT * FROM {BENCH_TABLE}", None
+    if source == "companies":
+        return queries.COMPANIES, None
+    companies = fetch_dataframe(conn, queries.COMPANIES)
+    conn.rollback()
+    return queries.PROFILES_FOR_COMPANIES, (companies["kar_company_id"].dropna().unique().tolist(),)
+
+
+def run_method(conn, sql, params, method, repeat):
+    timings = []
+    python_peak = 0
+    arrow_peak = 0
+    shape = None
+    for _ in range(repeat):
+        tracemalloc.start()
+        arrow_start = pa.total_allocated_bytes()
+        start = time.perf_counter()
+        df = fetch_dataframe(conn, sql, params, method=method)
+        timings.append(time.perf_counter() - start)
+        python_peak = max(python_peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        arrow_peak = max(arrow_peak, pa.total_allocated_bytes() - arrow_start)
+        conn.rollback()
+        shape = df.shape
+        del df
+
+    median = statistics.median(timings)
+    return {
+        "rows": shape[0],
+        "columns": shape[1],
+        "median_s": round(median, 3),
+        "min_s": round(min(timings), 3),
+        "rows_per_s": round(shape[0] / median) if median else 0,
+        "python_peak_mb": round(python_peak / (1024 * 1024), 1),
+        "arrow_mb": round(arrow_peak / (1024 * 1024), 1),
+    }
+
+
+def print_results(results):
+    print(f"{'method':<10} {'rows':>9} {'median s':>9} {'rows/s':>11} {'python MiB':>11} {'arrow MiB':>10}")
+    for method, stats in results.items():
+        print(
+            f"{method:<10} {stats['rows']:>9} {stats['median_s']:>9} {stats['rows_per_s']:>11} "
+            f"{stats['python_peak_mb']:>11} {stats['arrow_mb']:>10}"
+        )
+    baseline = results.get("fetchall")
+    for method, stats in results.items():
+        if baseline and method != "fetchall" and stats["median_s"]:
+            print(f"{method}: {baseline['median_s'] / stats['median_s']:.1f}x faster than fetchall")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk DataFrame loads against cursor.fetchall()")
+    parser.add_argument("--source", choices=["synthetic", "companies", "profiles"], default="synthetic")
+    parser.add_argument("--rows", type=int, default=200000, help="Rows in the synthetic table")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per method, the median is reported")
+    parser.add_argument("--keep-table", action="store_true", help="Keep the synthetic table for later runs")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    methods = ["fetchall", "copy"] + (["adbc"] if db.adbc is not None else [])
+
+    conn = connect_to_db()
+    try:
+        sql, params = source_query(conn, args.source, args.rows)
+        results = {method: run_method(conn, sql, params, method, args.repeat) for method in methods}
+    finally:
+        if args.source == "synthetic" and not args.keep_table:
+            conn.rollback()
+            conn.cursor().execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+            conn.commit()
+        conn.close()
+
+    if db.adbc is None:
+        print("adbc-driver-postgresql is not installed, skipping the ADBC method")
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"source": args.source, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# Benchmark of the lookalike search index (similar.py).
+#
+# Builds the IVF index and reports, per n_probe, the median and p95 query time
+# and the recall@k against an exact search over all vectors (the share of the
+# true k nearest neighbours the index returns). The exact search is timed as
+# well, as the baseline.
+#
+# By default the vectors are --rows synthetic embeddings, drawn around
+# --clusters subtopics of broader topics like real website embeddings;
+# --source embeddings uses company_website_embeddings instead.
+#
+# Example:
+#   python bench_similar.py --rows 200000 --dim 768 --n-probe 8 16 32 --output bench_similar.json
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+import similar
+from db import connect_to_db
+
+
+def synthetic_embeddings(rows, dim, clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((max(1, clusters // 50), dim)).astype(np.float32)
+    subtopics = topics[rng.integers(0, len(topics), clusters)] + 0.7 * rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = subtopics[rng.integers(0, clusters, rows)] + rng.standard_normal((rows, dim)).astype(np.float32)
+    return np.arange(rows, dtype=np.int64), vectors
+
+
+def load_embeddings(args):
+    if args.source == "synthetic":
+        return synthetic_embeddings(args.rows, args.dim, args.clusters)
+    conn = connect_to_db()
+    try:
+        return similar.load_embeddings(conn)
+    finally:
+        conn.close()
+
+
+# Exact top k by cosine similarity over all vectors, without the query itself
+def exact_search(vectors, position, k):
+    scores = vectors @ vectors[position]
+    scores[position] = -np.inf
+    top = np.argpartition(-scores, k)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def percentile_ms(timings, q):
+    return round(float(np.percentile(timings, q)) * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the lookalike search index")
+    parser.add_argument("--source", choices=["synthetic", "embeddings"], default="synthetic")
+    parser.add_argument("--rows", type=int, default=100000, help="Synthetic embeddings")
+    parser.add_argument("--dim", type=int, default=768, help="Synthetic embedding dimension")
+    parser.add_argument("--clusters", type=int, default=5000, help="Subtopics of the synthetic embeddings")
+    parser.add_argument("--k", type=int, default=10, help="Lookalikes per query")
+    parser.add_argument("--queries", type=int, default=200, help="Random query companies")
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[2, 4, similar.N_PROBE, 16, 32])
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    company_ids, embeddings = load_embeddings(args)
+    print(f"{len(company_ids):,} embeddings of dimension {embeddings.shape[1]}")
+
+    start = time.perf_counter()
+    index = similar.EmbeddingIndex.build(company_ids, embeddings)
+    build_s = time.perf_counter() - start
+    print(f"index built in {build_s:.1f}s: {len(index.centroids)} lists, {index.vectors.nbytes / 1e6:,.0f} MB of vectors")
+
+    rng = np.random.default_rng(1)
+    queries = company_ids[rng.choice(len(company_ids), min(args.queries, len(company_ids)), replace=False)]
+
+    # Exact search on the same float16 vectors, so recall only measures the probing
+    vectors = index.vectors.astype(np.float32)
+    timings, truth = [], {}
+    for company_id in queries:
+        position = index.position(company_id)
+        start = time.perf_counter()
+        truth[company_id] = set(index.company_ids[exact_search(vectors, position, args.k)])
+        timings.append(time.perf_counter() - start)
+    results = {"exact": {"median_ms": percentile_ms(timings, 50), "p95_ms": percentile_ms(timings, 95), "recall": 1.0}}
+
+    for n_probe in args.n_probe:
+        timings, found = [], 0
+        for company_id in queries:
+            start = time.perf_counter()
+            similar_ids, _ = index.similar(company_id, args.k, n_probe=n_probe)
+            timings.append(time.perf_counter() - start)
+            found += len(truth[company_id] & set(similar_ids))
+        results[f"n_probe={n_probe}"] = {"median_ms": percentile_ms(timings, 50), "p95_ms": percentile_ms(timings, 95),
+                                         "recall": round(found / (len(queries) * args.k), 3)}
+
+    print(f"{'search':<12} {'median ms':>10} {'p95 ms':>8} {'recall@' + str(args.k):>10}")
+    for name, stats in results.items():
+        print(f"{name:<12} {stats['median_ms']:>10} {stats['p95_ms']:>8} {stats['recall']:>10}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"source": args.source, "rows": len(company_ids), "build_s": round(build_s, 1),
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# Benchmark of the tenure parser (tenure.py).
+#
+# Parses the same duration column three ways and reports the median wall time
+# and rows per second:
+#   per_row     parse every row, no cache (the old row-by-row conversion)
+#   cached      parse every row through the parse_duration cache
+#   vectorized  months_in_company: parse each distinct string once, map back
+#
+# By default the column is --rows synthetic LinkedIn durations in English,
+# Dutch and French; --source profiles uses the duration column of
+# kenze_pli_profiles instead.
+#
+# Example:
+#   python bench_tenure.py --rows 5000000 --repeat 3 --output bench_tenure.json
+
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+import tenure
+from db import connect_to_db, fetch_dataframe
+
+
+# Duration formats per language, {y} years and {m} months
+FORMATS = [
+    "{y} yrs {m} mos", "{y} yr {m} mo", "{m} mos", "{y} yrs",
+    "{y} jaar {m} maanden", "{y} jaar {m} maand", "{m} maanden", "{y} jaar",
+    "{y} ans {m} mois", "{y} an {m} mois", "{m} mois", "{y} ans",
+    "Jan 2015 - Present · {y} yrs {m} mos",
+]
+
+
+def synthetic_durations(rows, seed=0):
+    vocabulary = [fmt.format(y=y, m=m) for fmt in FORMATS for y in range(1, 41) for m in range(1, 12)]
+    vocabulary += tenure.NO_MONTH_COUNT
+    rng = np.random.default_rng(seed)
+    return pd.Series(np.array(vocabulary, dtype=object)[rng.integers(0, len(vocabulary), rows)])
+
+
+def load_durations(source, rows):
+    if source == "synthetic":
+        return synthetic_durations(rows)
+    conn = connect_to_db()
+    try:
+        return fetch_dataframe(conn, "SELECT duration FROM kenze_pli_profiles")["duration"]
+    finally:
+        conn.close()
+
+
+METHODS = {
+    "per_row": lambda durations: durations.map(lambda text: tenure.parse_duration.__wrapped__(text)
+                                                if isinstance(text, str) else None).astype("Int64"),
+    "cached": lambda durations: durations.map(lambda text: tenure.parse_duration(text)
+                                               if isinstance(text, str) else None).astype("Int64"),
+    "vectorized": tenure.months_in_company,
+}
+
+
+def run_method(durations, method, repeat):
+    timings = []
+    for _ in range(repeat):
+        # Every run starts cold
+        tenure.parse_duration.cache_clear()
+        start = time.perf_counter()
+        months = METHODS[method](durations)
+        timings.append(time.perf_counter() - start)
+
+    median = statistics.median(timings)
+    stats = {
+        "rows": len(durations),
+        "median_s": round(median, 3),
+        "min_s": round(min(timings), 3),
+        "rows_per_s": round(len(durations) / median) if median else 0,
+    }
+    return stats, months
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tenure parser")
+    parser.add_argument("--source", choices=["synthetic", "profiles"], default="synthetic")
+    parser.add_argument("--rows", type=int, default=2000000, help="Rows of synthetic durations")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per method, the median is reported")
+    parser.add_argument("--methods", nargs="+", choices=list(METHODS), default=list(METHODS))
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    durations = load_durations(args.source, args.rows)
+    print(f"{len(durations):,} durations, {durations.nunique():,} distinct")
+
+    results = {}
+    outputs = {}
+    for method in args.methods:
+        results[method], outputs[method] = run_method(durations, method, args.repeat)
+
+    # All methods must agree
+    reference = next(iter(outputs.values()))
+    for method, months in outputs.items():
+        if not months.equals(reference):
+            raise SystemExit(f"{method} parsed {int((months != reference).sum())} durations differently")
+
+    print(f"{'method':<11} {'rows':>10} {'median s':>9} {'rows/s':>12}")
+    for method, stats in results.items():
+        print(f"{method:<11} {stats['rows']:>10} {stats['median_s']:>9} {stats['rows_per_s']:>12}")
+    baseline = results.get("per_row")
+    for method, stats in results.items():
+        if baseline and method != "per_row" and stats["median_s"]:
+            print(f"{method}: {baseline['median_s'] / stats['median_s']:.1f}x faster than per_row")
+    print(f"{int(reference.isna().sum()):,} durations not understood")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"source": args.source, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# Plotly figures of the progress sections.
+#
+# Each figure is built from a few metric values, and those rarely change
+# between reruns. The builders are memoised on their inputs, so a rerun with
+# the same numbers reuses the figure instead of building and validating a new
+# one. An unchanged figure also serialises to the same bytes, which Streamlit
+# then sends as a reference to what the browser already has (see
+# minCachedMessageSize in .streamlit/config.toml).
+#
+# Figures use TEMPLATE instead of the full Streamlit theme template, which
+# would add ~3.4 KB to every figure sent: the browser applies the theme's fonts
+# and backgrounds itself, only the colorway has to come from the server.
+
+import functools
+
+import plotly.graph_objects as go
+import plotly.io as pio
+import streamlit  # noqa: F401 (registers the "streamlit" Plotly template)
+
+
+TEMPLATE = go.layout.Template(layout=go.Layout(colorway=pio.templates["streamlit"].layout.colorway))
+
+# Memoised figures per builder, a handful of metric combinations is plenty
+CACHE_SIZE = 16
+
+PROGRESS_COLORS = ['#66b3ff', '#ff9999']
+
+
+# Centered section title, shared by the large charts
+def title(text, size=24):
+    return dict(text=text, y=0.95, x=0.5, xanchor='center', yanchor='top', font=dict(size=size))
+
+
+def figure(data, **layout):
+    return go.Figure(data=data, layout=go.Layout(template=TEMPLATE, **layout))
+
+
+# Step 1: total profiles, .NET profiles and the companies employing them
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def profile_stats(total_profiles, net_profiles, distinct_companies):
+    return figure(
+        go.Sunburst(
+            ids=["Total", "NET", "Companies"],
+            labels=["Total Profiles", ".NET Profiles", "Unique Companies"],
+            parents=["", "Total", "NET"],
+            values=[total_profiles, net_profiles, distinct_companies],
+            marker=dict(
+                colors=['#FFFFFF', '#66b3ff', '#ffcc99'],
+                line=dict(color=['#000000', '#FFFFFF', '#FFFFFF'], width=[2, 0, 0])  # Border around Total Profiles
+            ),
+            textinfo="label+value",
+            hoverinfo="label+value+percent parent+percent root",
+            textfont=dict(size=16, color="black"),
+        ),
+        title=title("Profile Statistics"),
+        width=1000,
+        height=800,
+    )
+
+
+# Step 3: companies found vs. enriched, with the found count as target line
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def company_enrichment(companies_found, companies_enriched, percentage_complete):
+    bars = [
+        go.Bar(x=['Companies'], y=[value], name=name, marker_color=color, text=[value], textposition='outside',
+               hoverinfo='y+name')
+        for name, value, color in [('Companies Found', companies_found, 'royalblue'),
+                                   ('Companies Enriched', companies_enriched, 'lightgreen')]
+    ]
+    fig = figure(
+        bars,
+        title=title('Company Data Enrichment Progress'),
+        xaxis=dict(title='', showgrid=False),
+        yaxis=dict(title='Number of Companies', showgrid=True, gridwidth=1, gridcolor='lightgray'),
+        barmode='group',
+        bargap=0.3,
+        bargroupgap=0.1,
+        legend=dict(x=0.5, y=-0.15, xanchor='center', yanchor='top', orientation='h'),
+        plot_bgcolor='rgba(0,0,0,0)',
+        annotations=[dict(x=0.5, y=max(companies_found, companies_enriched) * 1.1, xref="paper", yref="y",
+                          text=f"Completion: {percentage_complete}%", showarrow=False,
+                          font=dict(size=20, color='green'))],
+    )
+    fig.add_shape(type="line", x0=-0.5, y0=companies_found, x1=0.5, y1=companies_found,
+                  line=dict(color="red", width=3, dash="dash"))
+    return fig
+
+
+# Steps 4-7: done vs. to do as a donut with the total in the middle
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def progress_donut(chart_title, labels, values, total):
+    return figure(
+        [go.Pie(labels=list(labels), values=list(values), hole=.3, marker_colors=PROGRESS_COLORS)],
+        title=chart_title,
+        annotations=[dict(text=f'Total: {total}', x=0.5, y=0.5, font_size=20, showarrow=False)],
+    )
+
+
+# Step 4: profiles collected, on a gauge running to 1.5 times the count
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def profiles_gauge(profiles_collected):
+    return figure(
+        go.Indicator(
+            mode="gauge+number",
+            value=profiles_collected,
+            domain={'x': [0, 1], 'y': [0, 1]},
+            title={'text': "Profiles Collected", 'font': {'size': 24}},
+            gauge={
+                'axis': {'range': [None, profiles_collected * 1.5], 'tickwidth': 1, 'tickcolor': "darkblue"},
+                'bar': {'color': "darkblue"},
+                'bgcolor': "white",
+                'borderwidth': 2,
+                'bordercolor': "gray",
+                'steps': [
+                    {'range': [0, profiles_collected], 'color': 'cyan'},
+                    {'range': [profiles_collected, profiles_collected * 1.5], 'color': 'royalblue'}],
+                'threshold': {
+                    'line': {'color': "red", 'width': 4},
+                    'thickness': 0.75,
+                    'value': profiles_collected}},
+        ),
+        font={'color': "darkblue", 'family': "Arial"},
+    )
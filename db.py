@@ -0,0 +1,237 @@
+import io
+import tempfile
+import time
+from urllib.parse import quote, urlencode
+
+import streamlit as st
+import pandas as pd
+import psycopg2
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+# Optional Arrow-native driver, streams binary COPY straight into Arrow buffers
+try:
+    import adbc_driver_postgresql.dbapi as adbc
+except ImportError:
+    adbc = None
+
+
+# Function to connect to the database, credentials come from .streamlit/secrets.toml
+# (st.secrets also works outside `streamlit run`, so scripts can share this)
+def connect_to_db():
+    conn = psycopg2.connect(
+        dbname=st.secrets["DB_NAME"],
+        user=st.secrets["DB_USER"],
+        password=st.secrets["DB_PASSWORD"],
+        host=st.secrets["DB_HOST"],
+        port=st.secrets["DB_PORT"],
+        connect_timeout=st.secrets.get("DB_CONNECT_TIMEOUT", 10)
+    )
+    return conn
+
+
+# Execute a query with a time budget. The budget is a server-side statement
+# timeout, so Postgres cancels the query itself and psycopg2 raises
+# QueryCanceledError instead of the script blocking.
+def execute_with_timeout(cur, sql, params=None, timeout_ms=None):
+    timeout_ms = timeout_ms or st.secrets.get("STATEMENT_TIMEOUT_MS", 5000)
+    # SET LOCAL only lasts until the end of the current transaction
+    cur.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms),))
+    cur.execute(sql, params)
+
+
+# Last good result per query key, shared by all sessions of this server process
+@st.cache_resource
+def last_good_results():
+    return {}
+
+
+# Run a query within its time budget on a fresh connection, returns one row or
+# all rows
+def fetch_rows(sql, params=None, many=False, timeout_ms=None):
+    conn = connect_to_db()
+    try:
+        cur = conn.cursor()
+        execute_with_timeout(cur, sql, params, timeout_ms)
+        return cur.fetchall() if many else cur.fetchone()
+    finally:
+        conn.close()
+
+
+# Run a query within its time budget. When it times out or the database is
+# unreachable, fall back to the last good result for the same key. Returns a
+# dict with the result, when it was fetched, the error (None on success) and
+# whether that error was the statement timeout.
+# Runs against Postgres unless another backend (see backend.py) is passed.
+def fetch_with_fallback(key, sql, params=None, many=False, timeout_ms=None, backend=None):
+    fetch = backend.fetch if backend is not None else fetch_rows
+    errors = backend.unavailable_errors if backend is not None else (psycopg2.OperationalError,)
+    try:
+        result = fetch(sql, params, many=many, timeout_ms=timeout_ms)
+    except errors as e:
+        # QueryCanceledError (statement timeout) is an OperationalError, like
+        # a refused or dropped connection
+        failure = {"error": str(e).strip(), "timed_out": isinstance(e, psycopg2.extensions.QueryCanceledError)}
+        cached = last_good_results().get(key)
+        if cached is None:
+            return {"result": None, "fetched_at": None, **failure}
+        return {**cached, **failure}
+
+    outcome = {"result": result, "fetched_at": time.time(), "error": None, "timed_out": False}
+    last_good_results()[key] = outcome
+    return outcome
+
+
+# Arrow type per Postgres type OID for the bulk fetch path. Anything not listed
+# (text, varchar, json, arrays, ...) is read as a string. This is not what
+# cursor.fetchall() returns: numeric comes back as float64 instead of Decimal
+# (exact to about 15 significant digits), json, jsonb and arrays as their text
+# form instead of dict and list, and timestamptz in UTC instead of the session
+# time zone. Cast in the query where a caller needs the fetchall() form.
+ARROW_TYPES = {
+    16: pa.bool_(),                       # bool
+    20: pa.int64(),                       # int8
+    21: pa.int64(),                       # int2
+    23: pa.int64(),                       # int4
+    700: pa.float32(),                    # float4
+    701: pa.float64(),                    # float8
+    1700: pa.float64(),                   # numeric
+    1082: pa.date32(),                    # date
+    1114: pa.timestamp("us"),             # timestamp
+    1184: pa.timestamp("us", tz="UTC"),   # timestamptz
+}
+
+
+# Same credentials as connect_to_db, as a libpq URI for the ADBC driver
+def adbc_uri():
+    options = urlencode({"host": st.secrets["DB_HOST"], "port": st.secrets["DB_PORT"]})
+    user = quote(st.secrets["DB_USER"], safe="")
+    password = quote(st.secrets["DB_PASSWORD"], safe="")
+    return f"postgresql://{user}:{password}@/{quote(st.secrets['DB_NAME'], safe='')}?{options}"
+
+
+# COPY the result as CSV into f
+def copy_csv(cur, query, f):
+    cur.execute("SET LOCAL DateStyle = 'ISO'")
+    cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, NULL '\\N')", f)
+    f.seek(0)
+
+
+# How Arrow parses the CSV written by copy_csv
+def csv_convert_options(schema):
+    return pa_csv.ConvertOptions(
+        column_types=schema,
+        null_values=["\\N"],
+        strings_can_be_null=True,
+        quoted_strings_can_be_null=False,
+        true_values=["t"],
+        false_values=["f"],
+        timestamp_parsers=[pa_csv.ISO8601],
+    )
+
+
+# COPY the result to CSV on the client and parse it column by column with Arrow
+def copy_to_arrow(cur, query, schema):
+    buffer = io.BytesIO()
+    copy_csv(cur, query, buffer)
+    return pa_csv.read_csv(buffer, read_options=pa_csv.ReadOptions(column_names=schema.names),
+                           convert_options=csv_convert_options(schema))
+
+
+def adbc_to_arrow(query):
+    with adbc.connect(adbc_uri()) as conn:
+        with conn.cursor() as cur:
+            cur.execute(query)
+            return cur.fetch_arrow_table()
+
+
+# The query with its parameters inlined (COPY and the ADBC connection take no
+# bind parameters), its column names and the Arrow schema of its result, with
+# positional column names as the result may repeat a name
+def describe_result(cur, sql, params=None):
+    query = (cur.mogrify(sql, params).decode() if params is not None else sql).strip().rstrip(";")
+    cur.execute(f"SELECT * FROM ({query}) AS bulk_fetch LIMIT 0")
+    names = [desc[0] for desc in cur.description]
+    schema = pa.schema([(f"c{i}", ARROW_TYPES.get(desc.type_code, pa.string())) for i, desc in enumerate(cur.description)])
+    return query, names, schema
+
+
+# Whether reads on conn belong to a transaction or a REPEATABLE READ /
+# SERIALIZABLE snapshot, which a read on another connection would not see
+def in_transaction(conn):
+    return (conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+            or conn.isolation_level in (psycopg2.extensions.ISOLATION_LEVEL_REPEATABLE_READ,
+                                        psycopg2.extensions.ISOLATION_LEVEL_SERIALIZABLE))
+
+
+# Load a large result set into an Arrow table without building a Python tuple
+# per row. Uses the ADBC driver when it is installed and COPY otherwise; both
+# give the same column types, taken from the result description (see
+# ARROW_TYPES for how they differ from fetchall()). The ADBC driver reads on a
+# connection of its own, so inside a transaction or snapshot on conn the
+# result is always read with COPY, on conn itself.
+def fetch_arrow_table(conn, sql, params=None, method=None):
+    if in_transaction(conn):
+        if method == "adbc":
+            raise ValueError("method='adbc' reads outside the transaction of conn, use method='copy'")
+        method = "copy"
+    cur = conn.cursor()
+    query, names, schema = describe_result(cur, sql, params)
+
+    method = method or ("adbc" if adbc is not None else "copy")
+    if method == "adbc":
+        table = adbc_to_arrow(query).rename_columns(schema.names).cast(schema)
+    else:
+        table = copy_to_arrow(cur, query, schema)
+    return table.rename_columns(names)
+
+
+# CSV bytes per batch of stream_arrow_batches
+STREAM_BLOCK_BYTES = 16 << 20
+
+
+# Stream a large result set as Arrow record batches, so memory does not grow
+# with the result: COPY spools it as CSV to a temporary file (in spool_dir,
+# default the system one), which Arrow parses one block of block_bytes at a
+# time. Same column types as fetch_arrow_table.
+def stream_arrow_batches(conn, sql, params=None, block_bytes=STREAM_BLOCK_BYTES, spool_dir=None):
+    cur = conn.cursor()
+    query, names, schema = describe_result(cur, sql, params)
+    with tempfile.TemporaryFile(dir=spool_dir) as spool:
+        copy_csv(cur, query, spool)
+        reader = pa_csv.open_csv(spool, read_options=pa_csv.ReadOptions(column_names=schema.names, block_size=block_bytes),
+                                 convert_options=csv_convert_options(schema))
+        for batch in reader:
+            yield batch.rename_columns(names)
+
+
+# Load a large result set into a DataFrame through fetch_arrow_table. Pass
+# method="fetchall" for the plain cursor path.
+def fetch_dataframe(conn, sql, params=None, method=None):
+    if method == "fetchall":
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        return pd.DataFrame(cur.fetchall(), columns=[desc[0] for desc in cur.description])
+    return fetch_arrow_table(conn, sql, params, method).to_pandas()
+
+
+# Write new column values back to a table in bulk: COPY them into a temporary
+# table and update the target from it in one statement. rows has a ctid column
+# read in the same REPEATABLE READ transaction (a row updated by someone else
+# in the meantime then fails the update instead of being missed) and one column
+# per entry of column_types (name -> SQL type). Returns the rows updated.
+def update_by_ctid(cur, table, rows, column_types):
+    columns = list(column_types)
+    definitions = ", ".join(f"{name} {sql_type}" for name, sql_type in column_types.items())
+    cur.execute(f"CREATE TEMPORARY TABLE bulk_update (row_ctid TID, {definitions}) ON COMMIT DROP")
+
+    buffer = io.StringIO()
+    rows[["ctid"] + columns].to_csv(buffer, index=False, header=False, na_rep="\\N")
+    buffer.seek(0)
+    cur.copy_expert("COPY bulk_update FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+
+    assignments = ", ".join(f"{name} = u.{name}" for name in columns)
+    cur.execute(f"UPDATE {table} AS t SET {assignments} FROM bulk_update AS u WHERE t.ctid = u.row_ctid")
+    updated = cur.rowcount
+    cur.execute("DROP TABLE bulk_update")
+    return updated
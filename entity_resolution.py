@@ -0,0 +1,352 @@
+# Entity resolution of companies across sources.
+#
+# The companies in cli (LinkedIn company data, with the website, phone and VAT
+# number found on the company website) are matched with the records of the
+# other sources:
+#   gmb  google_my_business_locations
+#   kbo  enterprises from a KBO Open Data extract (--kbo-dir, the
+#        denomination.csv, address.csv and contact.csv files)
+#
+# Records are standardised (legal forms and accents stripped from names,
+# phone numbers to their national number, websites to their domain, VAT
+# numbers to 10 digits) and only compared within blocks that share a key:
+# VAT number, domain, phone, normalised name, or postal code plus the first
+# word of the name. Oversized blocks are skipped, so the number of candidate
+# pairs grows with the number of records, not its square. Candidate pairs are
+# scored in one vectorised pass: exact agreement on VAT, domain, phone and
+# postal code, and MinHash similarity of names and streets. The log-odds
+# weights of the fields add up to a match confidence between 0 and 1.
+#
+# Each record keeps its best match above --min-confidence. The matches
+# replace the source's rows in company_matches (migrations/0009):
+#
+#   python entity_resolution.py --dry-run
+#   python entity_resolution.py --sources gmb kbo --kbo-dir data/kbo
+
+import argparse
+import io
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from db import connect_to_db, fetch_dataframe
+
+
+COMPANIES = """
+    SELECT
+        company_id::TEXT AS record_id,
+        company_name AS name,
+        hq_line1 AS street,
+        hq_postalcode AS postal_code,
+        phone,
+        website,
+        vat_number AS vat
+    FROM
+        cli
+    WHERE
+        hq_country = 'BE'
+    """
+
+# GMB locations have no id of their own, a hash of their fields stands in. A
+# listing linked to several companies comes back once per company, with the
+# same record_id.
+GMB_RECORDS = """
+    SELECT
+        md5(concat_ws('|', title, address, phone_number, website)) AS record_id,
+        title AS name,
+        address,
+        phone_number AS phone,
+        website,
+        company_id::TEXT AS linked_company_id
+    FROM
+        google_my_business_locations
+    """
+
+SOURCES = ["gmb", "kbo"]
+
+LEGAL_FORMS = (
+    r"\b(?:b ?v ?b ?a|b ?v|n ?v|s ?a|s ?r ?l|s ?p ?r ?l|v ?z ?w|a ?s ?b ?l|c ?v ?b ?a|c ?v|s ?c ?r ?l|comm ?v|"
+    r"g ?c ?v|v ?o ?f|s ?n ?c|scs|sc|ltd|llc|gmbh|inc|belgium|belgie|belgique)\b"
+)
+
+MINHASH_PERMUTATIONS = 64
+# Texts per chunk, a chunk holds trigrams x permutations 32-bit hashes
+MINHASH_CHUNK = 10000
+
+# Records per side above which a block is too generic to compare
+MAX_BLOCK_SIZE = 50
+
+# Log-odds weight of each field when both records have it: (agree, disagree)
+FIELD_WEIGHTS = {
+    "vat": (9.0, -6.0),
+    "domain": (6.0, -2.0),
+    "phone": (5.0, -1.0),
+    "postal_code": (1.5, -2.5),
+}
+# Name and street similarity s (0-1) weigh in as weight * s - offset
+SIMILARITY_WEIGHTS = {
+    "name": (8.0, 4.0),
+    "street": (3.0, 1.5),
+}
+# Log-odds of a candidate pair being a match before looking at the fields
+PRIOR = -5.0
+# Similarity from which a name or street counts as matching in matched_on
+SIMILAR = 0.8
+
+
+# Lowercase ASCII words, None when nothing is left
+def normalize_text(values):
+    text = (values.fillna("").str.lower().str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+            .str.replace(r"[^a-z0-9]+", " ", regex=True).str.strip())
+    return text.where(text != "")
+
+
+def normalize_name(values):
+    return normalize_text(normalize_text(values).str.replace(LEGAL_FORMS, " ", regex=True))
+
+
+# National number without the +32 country code or trunk 0
+def normalize_phone(values):
+    digits = values.fillna("").str.replace(r"^\s*(?:\+|00)32", "", regex=True).str.replace(r"\D", "", regex=True)
+    digits = digits.str.replace(r"^0", "", regex=True)
+    return digits.where(digits.str.len().between(7, 9))
+
+
+def normalize_domain(values):
+    domains = (values.fillna("").str.lower().str.strip()
+               .str.replace(r"^[a-z]+://", "", regex=True)
+               .str.replace(r"^www\.", "", regex=True)
+               .str.replace(r"[/:?#].*$", "", regex=True))
+    return domains.where(domains.str.contains(".", regex=False))
+
+
+# Enterprise number as 10 digits, from "BE 0123.456.789" or "123456789"
+def normalize_vat(values):
+    digits = values.fillna("").str.replace(r"\D", "", regex=True)
+    digits = digits.where(digits.str.len() != 9, "0" + digits)
+    return digits.where(digits.str.len() == 10)
+
+
+def normalize_postal_code(values):
+    return values.fillna("").str.extract(r"\b([1-9]\d{3})\b", expand=False)
+
+
+# Records with the standardised match fields. Takes record_id, name, phone,
+# website and either street and postal_code or a one-line address
+# ("Street 1, 1000 Brussel").
+def standardize(records):
+    if "address" in records:
+        # The postal code is in the part after the street, which has the house number
+        parts = records["address"].fillna("").str.partition(",")
+        records = records.assign(street=parts[0], postal_code=parts[2])
+    return pd.DataFrame({
+        "record_id": records["record_id"].astype(str),
+        "name": normalize_name(records["name"]),
+        "street": normalize_text(records["street"]),
+        "postal_code": normalize_postal_code(records["postal_code"]),
+        "phone": normalize_phone(records["phone"]),
+        "domain": normalize_domain(records["website"]),
+        "vat": normalize_vat(records["vat"]) if "vat" in records else None,
+    })
+
+
+# MinHash signatures of the character trigrams of each text, an array of
+# len(texts) x MINHASH_PERMUTATIONS. The share of equal positions in two
+# signatures estimates the Jaccard similarity of their trigram sets. Texts are
+# the ASCII output of normalize_text; each distinct text is hashed once.
+def minhash(texts, seed=0):
+    codes, uniques = pd.factorize(pd.Series(texts, dtype=object))
+    rng = np.random.default_rng(seed)
+    # Permutations x -> a * x + b (mod 2^32), a odd, as a column per permutation
+    a = (rng.integers(0, 1 << 31, MINHASH_PERMUTATIONS, dtype=np.uint32) * np.uint32(2) + np.uint32(1))[:, None]
+    b = rng.integers(0, 1 << 32, MINHASH_PERMUTATIONS, dtype=np.uint64).astype(np.uint32)[:, None]
+    signatures = np.full((len(uniques) + 1, MINHASH_PERMUTATIONS), np.iinfo(np.uint32).max, dtype=np.uint32)
+
+    for start in range(0, len(uniques), MINHASH_CHUNK):
+        padded = [f"  {text} " for text in uniques[start:start + MINHASH_CHUNK]]
+        chars = np.frombuffer("".join(padded).encode("ascii", "replace"), dtype=np.uint8).astype(np.uint32)
+        lengths = np.fromiter(map(len, padded), dtype=np.int64, count=len(padded))
+        # Trigram starting at every character, as a 24-bit number
+        grams = chars[:-2] << np.uint32(16) | chars[1:-1] << np.uint32(8) | chars[2:]
+        # Drop the trigrams running into the next text
+        keep = np.ones(len(chars), dtype=bool)
+        ends = np.cumsum(lengths)
+        keep[ends - 1] = keep[ends - 2] = False
+        grams = grams[keep[:-2]]
+        # Spread the trigram bits over the word before the linear permutations
+        grams *= np.uint32(0x9E3779B1)
+        grams ^= grams >> np.uint32(15)
+
+        permuted = a * grams + b
+        # Each text's trigrams are a run of columns, reduce each run to its minimum
+        starts = np.r_[0, np.cumsum(lengths - 2)[:-1]]
+        signatures[start:start + len(padded)] = np.minimum.reduceat(permuted, starts, axis=1).T
+    # Code -1 (missing) takes the trailing empty signature
+    return signatures[codes]
+
+
+# Blocking keys per record, None where a record has no value for a key
+def blocking_keys(records):
+    first_word = records["name"].str.split().str[0]
+    return {
+        "vat": records["vat"],
+        "domain": records["domain"],
+        "phone": records["phone"],
+        "name": records["name"],
+        "postal_name": (records["postal_code"] + " " + first_word).where(first_word.notna()),
+    }
+
+
+# Pairs of (company row, record row) positions sharing at least one blocking
+# key, skipping keys shared by more than MAX_BLOCK_SIZE records on either side
+def candidate_pairs(companies, records):
+    company_keys, record_keys = blocking_keys(companies), blocking_keys(records)
+    pairs = []
+    for key in company_keys:
+        left = pd.DataFrame({"key": company_keys[key], "company_pos": np.arange(len(companies))}).dropna()
+        right = pd.DataFrame({"key": record_keys[key], "record_pos": np.arange(len(records))}).dropna()
+        left = left[left.groupby("key")["key"].transform("size") <= MAX_BLOCK_SIZE]
+        right = right[right.groupby("key")["key"].transform("size") <= MAX_BLOCK_SIZE]
+        pairs.append(left.merge(right, on="key")[["company_pos", "record_pos"]])
+    return pd.concat(pairs, ignore_index=True).drop_duplicates(ignore_index=True)
+
+
+# Field agreement, similarities, confidence and the fields that matched per
+# candidate pair
+def score_pairs(companies, records, pairs, company_signatures, record_signatures):
+    left, right = pairs["company_pos"].to_numpy(), pairs["record_pos"].to_numpy()
+    log_odds = np.full(len(pairs), PRIOR)
+    matched = {}
+
+    for field, (agree, disagree) in FIELD_WEIGHTS.items():
+        a = companies[field].to_numpy(dtype=object)[left]
+        b = records[field].to_numpy(dtype=object)[right]
+        both = pd.notna(a) & pd.notna(b)
+        equal = both & (a == b)
+        log_odds += np.where(equal, agree, np.where(both, disagree, 0.0))
+        matched[field] = equal
+
+    similarities = {}
+    for field, (weight, offset) in SIMILARITY_WEIGHTS.items():
+        both = companies[field].notna().to_numpy()[left] & records[field].notna().to_numpy()[right]
+        similarity = (company_signatures[field][left] == record_signatures[field][right]).mean(axis=1)
+        similarity = np.where(both, similarity, np.nan)
+        log_odds += np.where(both, weight * np.nan_to_num(similarity) - offset, 0.0)
+        similarities[field] = similarity
+        matched[field] = similarity >= SIMILAR
+
+    flags = np.column_stack([matched[field] for field in matched])
+    fields = np.array(list(matched))
+    return pd.DataFrame({
+        "company_id": companies["record_id"].to_numpy()[left],
+        "source_record_id": records["record_id"].to_numpy()[right],
+        "name_similarity": similarities["name"].round(3),
+        "street_similarity": similarities["street"].round(3),
+        "confidence": 1 / (1 + np.exp(-log_odds)),
+        "matched_on": [",".join(fields[row]) for row in flags],
+    })
+
+
+# Best cli company per record of another source, with its confidence
+def resolve(companies, records, min_confidence):
+    companies, records = standardize(companies), standardize(records)
+    signatures = [{field: minhash(frame[field].to_numpy(dtype=object)) for field in SIMILARITY_WEIGHTS}
+                  for frame in (companies, records)]
+    pairs = candidate_pairs(companies, records)
+    scored = score_pairs(companies, records, pairs, *signatures)
+    best = (scored[scored["confidence"] >= min_confidence]
+            .sort_values(["source_record_id", "confidence"], ascending=[True, False])
+            .drop_duplicates("source_record_id"))
+    return best.reset_index(drop=True), len(pairs)
+
+
+def load_gmb(conn):
+    return fetch_dataframe(conn, GMB_RECORDS)
+
+
+# Enterprises of a KBO Open Data extract with their main denomination,
+# registered seat and phone and website contacts
+def load_kbo(directory):
+    read = lambda name, columns: pd.read_csv(os.path.join(directory, name), usecols=columns, dtype=str)
+    names = read("denomination.csv", ["EntityNumber", "TypeOfDenomination", "Denomination"])
+    names = names[names["TypeOfDenomination"] == "001"].drop_duplicates("EntityNumber")
+    addresses = read("address.csv", ["EntityNumber", "TypeOfAddress", "Zipcode", "StreetNL", "StreetFR", "HouseNumber"])
+    addresses = addresses[addresses["TypeOfAddress"] == "REGO"].drop_duplicates("EntityNumber")
+    contacts = read("contact.csv", ["EntityNumber", "ContactType", "Value"])
+    contacts = (contacts[contacts["ContactType"].isin(["TEL", "WEB"])]
+                .drop_duplicates(["EntityNumber", "ContactType"])
+                .pivot(index="EntityNumber", columns="ContactType", values="Value")
+                .reindex(columns=["TEL", "WEB"]))
+
+    kbo = names.merge(addresses, on="EntityNumber", how="left").merge(contacts, on="EntityNumber", how="left")
+    return pd.DataFrame({
+        "record_id": kbo["EntityNumber"],
+        "name": kbo["Denomination"],
+        "street": kbo["StreetNL"].fillna(kbo["StreetFR"]).fillna("") + " " + kbo["HouseNumber"].fillna(""),
+        "postal_code": kbo["Zipcode"],
+        "phone": kbo["TEL"],
+        "website": kbo["WEB"],
+        "vat": kbo["EntityNumber"],
+    })
+
+
+def write_matches(conn, source, matches):
+    cur = conn.cursor()
+    cur.execute("DELETE FROM company_matches WHERE source = %s", (source,))
+    buffer = io.StringIO()
+    matches.assign(source=source)[["source", "source_record_id", "company_id", "confidence", "matched_on"]].to_csv(
+        buffer, index=False, header=False)
+    buffer.seek(0)
+    cur.copy_expert("COPY company_matches (source, source_record_id, company_id, confidence, matched_on) "
+                    "FROM STDIN WITH (FORMAT csv)", buffer)
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Match the companies of other sources with the cli companies")
+    parser.add_argument("--sources", nargs="+", choices=SOURCES, default=["gmb"])
+    parser.add_argument("--kbo-dir", help="KBO Open Data extract (for --sources kbo)")
+    parser.add_argument("--min-confidence", type=float, default=0.5, help="Lowest confidence kept as a match")
+    parser.add_argument("--dry-run", action="store_true", help="Report the matches without writing them")
+    parser.add_argument("--dsn", help="Connection string (default: app secrets)")
+    args = parser.parse_args()
+    if "kbo" in args.sources and not args.kbo_dir:
+        parser.error("--sources kbo needs --kbo-dir")
+
+    conn = psycopg2.connect(args.dsn) if args.dsn else connect_to_db()
+    companies = fetch_dataframe(conn, COMPANIES)
+    conn.rollback()
+
+    for source in args.sources:
+        start = time.perf_counter()
+        records = load_gmb(conn) if source == "gmb" else load_kbo(args.kbo_dir)
+        conn.rollback()
+        linked = None
+        if "linked_company_id" in records:
+            # The (record, company) pairs the source was pre-matched with
+            linked = set(zip(records["record_id"].astype(str), records["linked_company_id"]))
+        records = records.drop_duplicates("record_id")
+        matches, candidates = resolve(companies, records, args.min_confidence)
+        elapsed = time.perf_counter() - start
+
+        print(f"{source}: {len(records):,} records, {candidates:,} candidate pairs "
+              f"({candidates / max(len(records), 1):.1f} per record), {len(matches):,} matched in {elapsed:.1f}s")
+        bands = pd.cut(matches["confidence"], [0, 0.8, 0.95, 0.99, 1], right=False,
+                       labels=["<0.8", "0.8-0.95", "0.95-0.99", ">=0.99"]).value_counts(sort=False)
+        print("  confidence " + ", ".join(f"{band}: {count:,}" for band, count in bands.items()))
+        if linked is not None:
+            agree = (sum(pair in linked for pair in zip(matches["source_record_id"], matches["company_id"]))
+                     / max(len(matches), 1))
+            print(f"  {agree:.1%} of the matches agree with the pre-matched company id")
+
+        if not args.dry_run:
+            write_matches(conn, source, matches)
+            print("  written to company_matches")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
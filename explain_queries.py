@@ -0,0 +1,181 @@
+# Query plan regression harness for the dashboard SQL.
+#
+# Runs EXPLAIN (ANALYZE, BUFFERS) for every named query in queries.py against
+# the benchmark database and stores the JSON plans under query_plans/<run>/.
+# Each run is compared with the previous one and the report flags:
+#   - sequential scans over more than --min-seq-rows rows
+#   - casts on join keys (e.g. a.companyid = b.company_id::VARCHAR)
+#   - plan shape changes (node types and relations) since the previous run
+#
+# Example:
+#   python explain_queries.py
+#   python explain_queries.py --dsn "dbname=bench host=localhost" --strict
+
+import argparse
+import json
+import os
+import re
+import sys
+from datetime import datetime
+
+import psycopg2
+
+import queries
+from db import connect_to_db
+
+
+PLANS_DIR = "query_plans"
+
+# Sample parameters for the parameterised queries
+QUERY_PARAMS = {
+    "profiles_for_companies": "SELECT ARRAY(SELECT DISTINCT kar_company_id FROM public_dbt.a_final_kenze_companies WHERE kar_company_id IS NOT NULL LIMIT 100)",
+}
+
+# Fixed parameters for queries with named parameters
+FIXED_PARAMS = {
+    "profile_search": {"query": "senior .net developer", "company_ids": None, "limit": 20, "offset": 0},
+}
+
+JOIN_NODES = {"Hash Join", "Merge Join", "Nested Loop"}
+JOIN_CONDITIONS = ["Hash Cond", "Merge Cond", "Join Filter", "Index Cond"]
+# A cast shows up in plan conditions as "(expression)::type", varchar columns are
+# always shown as ::text which is binary compatible and harmless
+CAST_PATTERN = re.compile(r"\)::(?!text\b)[a-z]")
+
+
+def named_queries():
+    named = dict(queries.PROGRESS_QUERIES)
+    named["companies"] = queries.COMPANIES
+    named["profiles_for_companies"] = queries.PROFILES_FOR_COMPANIES
+    named["profile_rollup"] = queries.PROFILE_ROLLUP
+    named["profile_search"] = queries.PROFILE_SEARCH
+    return named
+
+
+def explain(cur, sql, params=None):
+    cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql.strip().rstrip(";"), params)
+    return cur.fetchone()[0][0]
+
+
+# Walk the plan tree depth first
+def walk(node, depth=0):
+    yield node, depth
+    for child in node.get("Plans", []):
+        yield from walk(child, depth + 1)
+
+
+# Node types and relations, used to detect plan shape changes
+def plan_shape(plan):
+    return [
+        f"{'  ' * depth}{node['Node Type']}" + (f" on {node['Relation Name']}" if "Relation Name" in node else "")
+        for node, depth in walk(plan["Plan"])
+    ]
+
+
+def find_issues(plan, min_seq_rows):
+    issues = []
+    for node, _ in walk(plan["Plan"]):
+        if node["Node Type"] == "Seq Scan":
+            rows = node.get("Actual Rows", 0) * node.get("Actual Loops", 1) + node.get("Rows Removed by Filter", 0)
+            if rows >= min_seq_rows:
+                issues.append(f"sequential scan on {node['Relation Name']} ({rows:,} rows)")
+        if node["Node Type"] in JOIN_NODES or node["Node Type"].startswith("Index"):
+            for condition in JOIN_CONDITIONS:
+                if condition in node and CAST_PATTERN.search(node[condition]):
+                    issues.append(f"cast on join key in {node['Node Type']}: {node[condition]}")
+    return issues
+
+
+def buffers(plan):
+    node = plan["Plan"]
+    return {
+        "shared_hit": node.get("Shared Hit Blocks", 0),
+        "shared_read": node.get("Shared Read Blocks", 0),
+        "temp_written": node.get("Temp Written Blocks", 0),
+    }
+
+
+def previous_run(plans_dir, current):
+    if not os.path.isdir(plans_dir):
+        return None
+    runs = sorted(run for run in os.listdir(plans_dir) if run < current and os.path.isdir(os.path.join(plans_dir, run)))
+    return os.path.join(plans_dir, runs[-1]) if runs else None
+
+
+def load_plan(run_dir, name):
+    path = os.path.join(run_dir, f"{name}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN (ANALYZE, BUFFERS) every dashboard query and compare with the previous run")
+    parser.add_argument("--dsn", help="Connection string of the benchmark database (default: app secrets)")
+    parser.add_argument("--plans-dir", default=PLANS_DIR)
+    parser.add_argument("--only", nargs="*", help="Only explain these named queries")
+    parser.add_argument("--min-seq-rows", type=int, default=1000, help="Ignore sequential scans over fewer rows")
+    parser.add_argument("--strict", action="store_true", help="Exit non-zero on any flagged issue or plan shape change")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.dsn) if args.dsn else connect_to_db()
+    cur = conn.cursor()
+
+    run_id = datetime.now().strftime("%Y%m%dT%H%M%S")
+    run_dir = os.path.join(args.plans_dir, run_id)
+    baseline_dir = previous_run(args.plans_dir, run_id)
+    os.makedirs(run_dir)
+
+    flagged = 0
+    for name, sql in named_queries().items():
+        if args.only and name not in args.only:
+            continue
+
+        params = FIXED_PARAMS.get(name)
+        if name in QUERY_PARAMS:
+            cur.execute(QUERY_PARAMS[name])
+            params = (cur.fetchone()[0],)
+
+        plan = explain(cur, sql, params)
+        # EXPLAIN ANALYZE executes the statement, never keep its side effects
+        conn.rollback()
+
+        issues = find_issues(plan, args.min_seq_rows)
+        shape = plan_shape(plan)
+        record = {
+            "name": name,
+            "run": run_id,
+            "execution_ms": plan["Execution Time"],
+            "planning_ms": plan["Planning Time"],
+            "buffers": buffers(plan),
+            "issues": issues,
+            "shape": shape,
+            "plan": plan,
+        }
+        with open(os.path.join(run_dir, f"{name}.json"), "w") as f:
+            json.dump(record, f, indent=2)
+
+        print(f"{name}: {plan['Execution Time']:.1f} ms, "
+              f"{record['buffers']['shared_hit']} hit / {record['buffers']['shared_read']} read buffers")
+
+        previous = load_plan(baseline_dir, name) if baseline_dir else None
+        if previous:
+            print(f"  previous run {previous['run']}: {previous['execution_ms']:.1f} ms")
+            if previous["shape"] != shape:
+                issues.append("plan shape changed since previous run:\n      "
+                              + "\n      ".join(shape))
+
+        for issue in issues:
+            print(f"  ! {issue}")
+        flagged += len(issues)
+
+    conn.close()
+    print(f"Plans stored in {run_dir}, {flagged} issue(s) flagged")
+
+    if args.strict and flagged:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
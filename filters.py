@@ -0,0 +1,126 @@
+# Company and profile filters shared by the dashboard and the batch CLI.
+#
+# The dashboard passes its widget values, the batch CLI the criteria of a saved
+# segment (see batch.py). A criterion left at None does not filter.
+
+import re
+
+import pandas as pd
+
+
+# Approximate bounding box of Belgium
+BELGIUM_LAT = (49.5, 51.5)
+BELGIUM_LON = (2.5, 6.4)
+
+# Company columns shown in the dashboard and written to the exports
+COMPANY_COLUMNS = [
+    'company_name', 'industry', 'employee_count', 'total', 'it_engineering', 'net_profile', 'net_profile_vs_total_ratio',
+    'it_team_percentage', 'it_executive_vs_it_specialist_ratio', 'specialist_vs_total_ratio',
+    'net_profile_vs_it_engineering_ratio', 'technical_executive', 'operations', 'customer_success', 'finance', 'sales',
+    'marketing', 'human_resources', 'specialist', 'senior', 'executive', 'advisor', 'cli_url', 'founded', 'hq_city',
+    'tagline', 'cli_website', 'vat_number', 'cover_image', 'description', 'followercount', 'universal_name',
+    'logo_resulution', 'employee_count_range', 'equity', 'fte_employees', 'profit_loss', 'gross_margin',
+    'equity_yoy_pct', 'fte_employees_yoy_pct', 'profit_loss_yoy_pct', 'gross_margin_yoy_pct', 'years_of_history',
+    'cid', 'gmb_title', 'rating', 'gmb_address', 'category', 'phone_number', 'rating_count', 'wc_description',
+    'wc_business_type', 'wc_hiring', 'wc_about_section', 'wc_pricing_mentioned', 'wc_trial_available', 'wc_keywords',
+    'wc_career_urls', 'wc_social_media', 'wc_open_positions', 'wc_ideal_customer_profile', 'wc_case_studies',
+    'wc_contact_info', 'kar_company_id', 'net_dev_count', 'technologies', 'tech_categories',
+]
+
+# Profile columns shown in the dashboard and written to the exports
+PROFILE_COLUMNS = [
+    'name', 'title', 'summary', 'lastname', 'location',
+    'firstname', 'ispremium', 'seniority', 'department',
+    'isopenlink', 'companyname', 'titledescription',
+    'months_in_company', 'net_profile'
+]
+
+
+# Split a comma-separated text input into keywords, removing any extra spaces
+def split_keywords(text):
+    return [keyword.strip() for keyword in text.split(',') if keyword.strip()]
+
+
+# Companies with coordinates inside Belgium, the population the company filters apply to
+def companies_in_belgium(df):
+    if 'latitude' not in df.columns or 'longitude' not in df.columns:
+        return df.iloc[0:0]
+
+    df = df.copy()
+    # Convert latitude and longitude to float if they're not already
+    df['latitude'] = pd.to_numeric(df['latitude'], errors='coerce')
+    df['longitude'] = pd.to_numeric(df['longitude'], errors='coerce')
+
+    # Remove rows with null values in latitude or longitude
+    df_map = df.dropna(subset=['latitude', 'longitude'])
+    return df_map[
+        (df_map['latitude'] >= BELGIUM_LAT[0]) &
+        (df_map['latitude'] <= BELGIUM_LAT[1]) &
+        (df_map['longitude'] >= BELGIUM_LON[0]) &
+        (df_map['longitude'] <= BELGIUM_LON[1])
+    ]
+
+
+# Technologies found on the company websites, for the technology filter
+def technology_options(df):
+    if 'technologies' not in df.columns:
+        return []
+    return sorted({name for technologies in df['technologies'].dropna().unique() if technologies
+                   for name in technologies.split(', ')})
+
+
+# Keep the companies matching every given criterion. Ranges are (low, high)
+# tuples, inclusive. technologies keeps the companies using any of them.
+def filter_companies(df, exclude_industries=None, exclude_categories=None, gmb_address_include=None,
+                     gmb_address_exclude=None, description_exclude=None, open_positions_include=None,
+                     open_positions_exclude=None, employee_count_range=None, min_net_devs=None,
+                     net_profile_ratio_range=None, it_executive_ratio_range=None, it_team_percentage_range=None,
+                     technologies=None):
+    mask = pd.Series(True, index=df.index)
+
+    if exclude_industries:
+        mask &= ~df['industry'].isin(exclude_industries)
+    if exclude_categories:
+        mask &= ~df['category'].isin(exclude_categories)
+    if gmb_address_include:
+        mask &= df['gmb_address'].str.lower().str.contains(gmb_address_include.lower())
+    if gmb_address_exclude:
+        mask &= df['gmb_address'].str.lower().str.contains(gmb_address_exclude.lower()) == False
+    if description_exclude:
+        mask &= ~df['description'].str.lower().str.contains('|'.join(description_exclude))
+    if open_positions_include:
+        mask &= df['wc_open_positions'].str.lower().str.contains('|'.join(open_positions_include))
+    if open_positions_exclude:
+        mask &= ~df['wc_open_positions'].str.lower().str.contains('|'.join(open_positions_exclude))
+    if min_net_devs is not None and 'net_dev_count' in df.columns:
+        mask &= df['net_dev_count'] >= min_net_devs
+    if technologies and 'technologies' in df.columns:
+        pattern = '(?:^|, )(?:' + '|'.join(re.escape(name) for name in technologies) + ')(?:,|$)'
+        mask &= df['technologies'].str.contains(pattern, na=False)
+
+    ranges = [
+        ('employee_count', employee_count_range),
+        ('net_profile_vs_total_ratio', net_profile_ratio_range),
+        ('it_executive_vs_it_specialist_ratio', it_executive_ratio_range),
+        ('it_team_percentage', it_team_percentage_range),
+    ]
+    for column, bounds in ranges:
+        if bounds is not None:
+            mask &= (df[column] >= bounds[0]) & (df[column] <= bounds[1])
+
+    return df[mask]
+
+
+# Keep the profiles matching every given criterion, months_in_company is a
+# (low, high) tuple, inclusive
+def filter_profiles(df, seniority=None, department=None, months_in_company=None, net_profile=None):
+    if seniority is not None:
+        df = df[df['seniority'] == seniority]
+    if department is not None:
+        df = df[df['department'] == department]
+    if months_in_company is not None:
+        df = df[(df['months_in_company'] >= months_in_company[0]) &
+                (df['months_in_company'] <= months_in_company[1])]
+    if net_profile is not None:
+        df = df[df['net_profile'] == net_profile]
+    return df
@@ -0,0 +1,151 @@
+# Live progress updates.
+#
+# One listener per server process follows changes to the ingest tables, either
+# through Postgres LISTEN/NOTIFY (the triggers from migration 0006) or, where
+# notifications are not delivered (e.g. behind a transaction pooler), by
+# polling the cheap per-table write counters in pg_stat_user_tables. Progress
+# sections in live mode are fragments that rerun on a timer but only hit the
+# database again once a table they read changed and the changes settled.
+
+import select
+import threading
+import time
+
+import streamlit as st
+
+from db import connect_to_db
+
+
+CHANNEL = "pipeline_progress"
+
+# Longest pause between attempts to follow the changes again after a failure
+RETRY_MAX_S = 300
+
+WATCHED_TABLES = [
+    "kenze_profile_search",
+    "cli",
+    "kenze_pli_profiles",
+    "google_my_business_locations",
+    "financial_data",
+]
+
+
+class ChangeListener:
+    def __init__(self, mode="notify", poll_interval=10):
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.versions = {table: 0 for table in WATCHED_TABLES}
+        self.changed_at = {table: 0.0 for table in WATCHED_TABLES}
+        # The error that stopped following the changes, None while it works
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def mark_changed(self, table):
+        with self.lock:
+            if table in self.versions:
+                self.versions[table] += 1
+                self.changed_at[table] = time.time()
+
+    def set_error(self, error):
+        with self.lock:
+            self.error = error
+
+    # Combined version and time of the last change for a set of tables
+    def state(self, tables):
+        with self.lock:
+            return tuple(self.versions[table] for table in tables), max(self.changed_at[table] for table in tables)
+
+    # Follow the changes until the process ends. After any failure (lost
+    # connection, unexpected error) start over after a pause that doubles up
+    # to RETRY_MAX_S while the failures go on; the error is shown by
+    # live_section meanwhile.
+    def run(self):
+        pause = self.poll_interval
+        while True:
+            started = time.time()
+            try:
+                if self.mode == "notify":
+                    self.listen()
+                else:
+                    self.poll()
+            except Exception as e:
+                self.set_error(e)
+                if time.time() - started > RETRY_MAX_S:
+                    pause = self.poll_interval
+                time.sleep(pause)
+                pause = min(pause * 2, RETRY_MAX_S)
+
+    def listen(self):
+        conn = connect_to_db()
+        conn.autocommit = True
+        try:
+            conn.cursor().execute(f"LISTEN {CHANNEL}")
+            self.set_error(None)
+            while True:
+                # Wake up regularly so a dead connection is noticed
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    conn.cursor().execute("SELECT 1")
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    self.mark_changed(conn.notifies.pop(0).payload)
+        finally:
+            conn.close()
+
+    def poll(self):
+        conn = connect_to_db()
+        conn.autocommit = True
+        try:
+            cur = conn.cursor()
+            writes = {}
+            while True:
+                cur.execute("""
+                SELECT relname, n_tup_ins + n_tup_upd + n_tup_del
+                FROM pg_stat_user_tables
+                WHERE relname = ANY(%s)
+                """, (WATCHED_TABLES,))
+                for table, count in cur.fetchall():
+                    if table in writes and writes[table] != count:
+                        self.mark_changed(table)
+                    writes[table] = count
+                self.set_error(None)
+                time.sleep(self.poll_interval)
+        finally:
+            conn.close()
+
+
+# Shared by all sessions of this server process
+@st.cache_resource
+def get_change_listener(mode, poll_interval):
+    return ChangeListener(mode, poll_interval)
+
+
+# Render a progress section as a fragment that reruns every `refresh` seconds.
+# The query only runs again once one of `tables` changed and no further change
+# came in for `debounce` seconds, or after `max_wait` seconds of continuous
+# changes, otherwise the last result is rendered again.
+def live_section(name, fetch, render, tables, mode="notify", refresh=5, debounce=10, max_wait=60, poll_interval=10):
+    @st.fragment(run_every=refresh)
+    def section():
+        listener = get_change_listener(mode, poll_interval)
+        version, changed_at = listener.state(tables)
+        now = time.time()
+
+        key = f"live_{name}"
+        cached = st.session_state.get(key)
+        if (
+            cached is None
+            or cached["version"] != version and (now - changed_at >= debounce or now - cached["fetched_at"] >= max_wait)
+        ):
+            cached = {"version": version, "fetched_at": now, "result": fetch()}
+            st.session_state[key] = cached
+
+        render(cached["result"])
+        st.caption(f"Live, updated {int(now - cached['fetched_at'])}s ago")
+        error = listener.error
+        if error is not None:
+            st.caption(f"Live updates paused, retrying: {str(error).strip() or type(error).__name__}")
+
+    section()
@@ -0,0 +1,310 @@
+# Headless load test for the Streamlit app.
+#
+# Simulates concurrent analyst sessions with Streamlit's app testing API and
+# reports rerun latency percentiles, database connections in use and memory
+# per worker process. Each worker process plays the role of one Streamlit
+# server instance hosting its share of the sessions, one at a time: AppTest
+# swaps process-wide state (the runtime instance, st.secrets) for the length
+# of a run, so sessions in the same process cannot overlap. Concurrency comes
+# from --workers.
+#
+# Database credentials are read from .streamlit/secrets.toml, the same file
+# the app itself uses (AppTest picks it up from the working directory).
+#
+# Example:
+#   python load_test.py --sessions 20 --workers 4 --steps 15 --output load.json
+
+import argparse
+import json
+import multiprocessing
+import random
+import resource
+import sys
+import threading
+import time
+
+import numpy as np
+from streamlit.testing.v1 import AppTest
+
+from db import connect_to_db
+
+
+# Look up a widget by its label, None if it is not on the page
+def find_widget(widgets, label):
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    return None
+
+
+# Filter changes an analyst typically makes, each returns the widget to rerun
+# (or None when the widget is not rendered for the current data)
+def exclude_industry(at, rng):
+    widget = find_widget(at.multiselect, "Exclude LinkedIn Industry")
+    if widget is None or not widget.options:
+        return None
+    return widget.set_value(rng.sample(widget.options, k=min(len(widget.options), rng.randint(0, 3))))
+
+
+def exclude_category(at, rng):
+    widget = find_widget(at.multiselect, "Exclude Google My Business Category")
+    if widget is None or not widget.options:
+        return None
+    return widget.set_value(rng.sample(widget.options, k=min(len(widget.options), rng.randint(0, 3))))
+
+
+def employee_count_range(at, rng):
+    widget = find_widget(at.slider, "Select Employee Count Range")
+    if widget is None:
+        return None
+    low = rng.randint(widget.min, widget.max)
+    return widget.set_range(low, rng.randint(low, widget.max))
+
+
+def min_net_devs(at, rng):
+    widget = find_widget(at.number_input, "Minimum .NET Developers")
+    if widget is None:
+        return None
+    return widget.set_value(rng.randint(0, 5))
+
+
+def net_profile_ratio(at, rng):
+    widget = find_widget(at.slider, "Select .NET Profile vs Total Ratio Range")
+    if widget is None:
+        return None
+    low = round(rng.uniform(0.0, 50.0), 1)
+    return widget.set_range(low, round(rng.uniform(low, 100.0), 1))
+
+
+def open_positions(at, rng):
+    widget = find_widget(at.text_area, "Filter Open Positions (comma-separated)")
+    if widget is None:
+        return None
+    return widget.input(rng.choice(["", ".net", "c#, azure", "developer"]))
+
+
+def seniority(at, rng):
+    widget = find_widget(at.selectbox, "Select Seniority")
+    if widget is None or not widget.options:
+        return None
+    return widget.select(rng.choice(widget.options))
+
+
+def department(at, rng):
+    widget = find_widget(at.selectbox, "Select Department")
+    if widget is None or not widget.options:
+        return None
+    return widget.select(rng.choice(widget.options))
+
+
+def months_in_company(at, rng):
+    widget = find_widget(at.slider, "Select Months in Company")
+    if widget is None or widget.min >= widget.max:
+        return None
+    low = rng.randint(widget.min, widget.max)
+    return widget.set_range(low, rng.randint(low, widget.max))
+
+
+def net_profile(at, rng):
+    widget = find_widget(at.selectbox, "Select Net Profile")
+    if widget is None:
+        return None
+    return widget.select(rng.choice(widget.options))
+
+
+# Map filters are changed more often than the profile filters below them
+SCENARIO_STEPS = [
+    (exclude_industry, 3),
+    (exclude_category, 2),
+    (employee_count_range, 3),
+    (min_net_devs, 2),
+    (net_profile_ratio, 2),
+    (open_positions, 1),
+    (seniority, 2),
+    (department, 2),
+    (months_in_company, 1),
+    (net_profile, 1),
+]
+
+
+# Run one analyst session and record the latency of every rerun
+def run_session(app_path, steps, seed, timeout, results):
+    rng = random.Random(seed)
+    actions = [step for step, _ in SCENARIO_STEPS]
+    weights = [weight for _, weight in SCENARIO_STEPS]
+
+    at = AppTest.from_file(app_path, default_timeout=timeout)
+    start = time.perf_counter()
+    try:
+        at.run()
+    except Exception:
+        results.append({"step": "initial", "latency": time.perf_counter() - start, "error": True})
+        return
+    results.append({"step": "initial", "latency": time.perf_counter() - start, "error": bool(at.exception)})
+
+    for _ in range(steps):
+        action = rng.choices(actions, weights=weights)[0]
+        widget = action(at, rng)
+        if widget is None:
+            continue
+        start = time.perf_counter()
+        try:
+            at = widget.run()
+            error = bool(at.exception)
+        except Exception:
+            error = True
+        results.append({"step": action.__name__, "latency": time.perf_counter() - start, "error": error})
+
+
+# Peak resident set size of the current process in MiB
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KiB on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# One worker process runs its share of the sessions one after another
+def run_worker(worker_id, sessions, app_path, steps, timeout, seed, queue):
+    results = []
+    for i in range(sessions):
+        run_session(app_path, steps, seed + worker_id * 1000 + i, timeout, results)
+    queue.put({"worker": worker_id, "sessions": sessions, "peak_rss_mb": peak_rss_mb(), "reruns": results})
+
+
+# Sample the number of open connections to the app database while the test runs
+def sample_connections(interval, stop, samples):
+    conn = connect_to_db()
+    conn.autocommit = True
+    cur = conn.cursor()
+    while not stop.is_set():
+        cur.execute("""
+        SELECT
+            COUNT(*) AS total,
+            COUNT(CASE WHEN state = 'active' THEN 1 END) AS active
+        FROM pg_stat_activity
+        WHERE datname = current_database()
+          AND pid != pg_backend_pid()
+        """)
+        samples.append(cur.fetchone())
+        stop.wait(interval)
+    conn.close()
+
+
+# Latency percentiles in ms of the reruns without errors, None when there are none
+def percentiles(reruns):
+    latencies = np.array([rerun["latency"] for rerun in reruns if not rerun["error"]]) * 1000
+    if not latencies.size:
+        return None
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {"count": int(latencies.size), "p50": round(p50, 1), "p95": round(p95, 1), "p99": round(p99, 1),
+            "max": round(latencies.max(), 1)}
+
+
+# The full-page load of a session ("initial") is reported on its own, the
+# overall rerun latency covers the filter changes only
+def summarize(workers, samples, elapsed):
+    reruns = [rerun for worker in workers for rerun in worker["reruns"]]
+    changes = [rerun for rerun in reruns if rerun["step"] != "initial"]
+
+    summary = {
+        "sessions": sum(worker["sessions"] for worker in workers),
+        "workers": len(workers),
+        "elapsed_s": round(elapsed, 2),
+        "reruns": len(reruns),
+        "errors": sum(1 for rerun in reruns if rerun["error"]),
+        "reruns_per_s": round(len(reruns) / elapsed, 2) if elapsed else 0,
+        "initial_load_ms": percentiles([rerun for rerun in reruns if rerun["step"] == "initial"]) or {},
+        "latency_ms": percentiles(changes) or {},
+        "latency_ms_by_step": {},
+        "db_connections": {},
+        "peak_rss_mb_per_worker": {
+            worker["worker"]: round(worker["peak_rss_mb"], 1) for worker in sorted(workers, key=lambda w: w["worker"])
+        },
+    }
+
+    for step in sorted({rerun["step"] for rerun in changes}):
+        stats = percentiles([rerun for rerun in changes if rerun["step"] == step])
+        if stats:
+            summary["latency_ms_by_step"][step] = stats
+
+    if samples:
+        totals = [total for total, _ in samples]
+        actives = [active for _, active in samples]
+        summary["db_connections"] = {
+            "max": max(totals),
+            "mean": round(sum(totals) / len(totals), 1),
+            "max_active": max(actives),
+        }
+
+    return summary
+
+
+def print_summary(summary):
+    print(f"Sessions: {summary['sessions']} across {summary['workers']} worker(s) in {summary['elapsed_s']}s")
+    print(f"Reruns: {summary['reruns']} ({summary['reruns_per_s']}/s), errors: {summary['errors']}")
+    for label, key in [("Initial load", "initial_load_ms"), ("Filter change rerun", "latency_ms")]:
+        if summary[key]:
+            latency = summary[key]
+            print(f"{label} latency (ms): p50={latency['p50']} p95={latency['p95']} p99={latency['p99']} "
+                  f"max={latency['max']}")
+    for step, stats in summary["latency_ms_by_step"].items():
+        print(f"  {step:<22} n={stats['count']:<5} p50={stats['p50']:<10} p95={stats['p95']}")
+    if summary["db_connections"]:
+        connections = summary["db_connections"]
+        print(f"DB connections: max={connections['max']} mean={connections['mean']} max active={connections['max_active']}")
+    for worker, rss in summary["peak_rss_mb_per_worker"].items():
+        print(f"Worker {worker} peak RSS: {rss} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for the Streamlit app")
+    parser.add_argument("--app", default="app.py", help="Streamlit script to load test")
+    parser.add_argument("--sessions", type=int, default=10, help="Total number of simulated sessions")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes (concurrent sessions)")
+    parser.add_argument("--steps", type=int, default=10, help="Filter changes per session")
+    parser.add_argument("--timeout", type=float, default=120, help="Timeout per rerun in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="Seconds between DB connection samples")
+    parser.add_argument("--output", help="Write the summary as JSON to this path")
+    parser.add_argument("--max-p95", type=float,
+                        help="Exit non-zero when p95 filter change rerun latency (ms) exceeds this")
+    args = parser.parse_args()
+
+    # Spread the sessions as evenly as possible over the workers
+    per_worker = [args.sessions // args.workers + (1 if i < args.sessions % args.workers else 0) for i in range(args.workers)]
+
+    stop = threading.Event()
+    samples = []
+    sampler = threading.Thread(target=sample_connections, args=(args.sample_interval, stop, samples), daemon=True)
+    sampler.start()
+
+    queue = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(i, n, args.app, args.steps, args.timeout, args.seed, queue))
+        for i, n in enumerate(per_worker) if n
+    ]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    workers = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    sampler.join()
+
+    summary = summarize(workers, samples, elapsed)
+    print_summary(summary)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    if args.max_p95 is not None and summary["latency_ms"].get("p95", 0) > args.max_p95:
+        print(f"p95 latency above threshold of {args.max_p95} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# Versioned DDL migrations for the dashboard database.
+#
+# Migrations are the numbered .sql files in migrations/, each one is applied
+# once, in order and in its own transaction, and recorded in schema_migrations.
+# A file that starts with NO_TRANSACTION (for CREATE INDEX CONCURRENTLY) runs
+# outside a transaction instead, one statement at a time; its statements end
+# with a ; at the end of a line.
+#
+# Usage:
+#   python migrate.py            # apply pending migrations
+#   python migrate.py status     # list applied and pending migrations
+#   python migrate.py refresh    # refresh the materialized views and maintained tables
+
+import argparse
+import os
+import re
+
+import psycopg2
+
+from db import connect_to_db
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+NO_TRANSACTION = "-- migrate: no transaction"
+
+# Run in this order by `migrate.py refresh`
+REFRESH_COMMANDS = [
+    ("mv_net_companies", "REFRESH MATERIALIZED VIEW CONCURRENTLY mv_net_companies"),
+    ("mv_profile_rollup", "REFRESH MATERIALIZED VIEW CONCURRENTLY mv_profile_rollup"),
+    # Kept up to date by triggers, the rebuild only repairs drift
+    ("latest_financials", "SELECT refresh_latest_financials()"),
+]
+
+
+def list_migrations():
+    return sorted(name for name in os.listdir(MIGRATIONS_DIR) if name.endswith(".sql"))
+
+
+def applied_migrations(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version TEXT PRIMARY KEY,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """)
+    cur.execute("SELECT version, applied_at FROM schema_migrations ORDER BY version")
+    return dict(cur.fetchall())
+
+
+def upgrade(conn):
+    cur = conn.cursor()
+    applied = applied_migrations(cur)
+    conn.commit()
+
+    pending = [name for name in list_migrations() if name not in applied]
+    if not pending:
+        print("Database is up to date")
+        return
+
+    for name in pending:
+        with open(os.path.join(MIGRATIONS_DIR, name)) as f:
+            sql = f.read()
+        try:
+            if sql.startswith(NO_TRANSACTION):
+                # One statement per query, a multi-statement query is a transaction too
+                conn.autocommit = True
+                try:
+                    for statement in re.split(r";\s*$", sql, flags=re.MULTILINE):
+                        if re.sub(r"--.*", "", statement).strip():
+                            cur.execute(statement)
+                finally:
+                    conn.autocommit = False
+            else:
+                cur.execute(sql)
+            cur.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (name,))
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+            print(f"Failed to apply {name}")
+            raise
+        print(f"Applied {name}")
+
+
+def status(conn):
+    cur = conn.cursor()
+    applied = applied_migrations(cur)
+    conn.commit()
+    for name in list_migrations():
+        print(f"{name}: {'applied ' + str(applied[name]) if name in applied else 'pending'}")
+
+
+def refresh(conn):
+    # REFRESH ... CONCURRENTLY cannot run inside a transaction block
+    conn.autocommit = True
+    cur = conn.cursor()
+    for name, sql in REFRESH_COMMANDS:
+        cur.execute(sql)
+        print(f"Refreshed {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply DDL migrations and refresh derived tables")
+    parser.add_argument("command", nargs="?", default="upgrade", choices=["upgrade", "status", "refresh"])
+    parser.add_argument("--dsn", help="Connection string (default: app secrets)")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.dsn) if args.dsn else connect_to_db()
+    try:
+        {"upgrade": upgrade, "status": status, "refresh": refresh}[args.command](conn)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
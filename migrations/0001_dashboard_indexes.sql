@@ -0,0 +1,36 @@
+-- migrate: no transaction
+--
+-- Access paths for the dashboard progress queries.
+--
+-- The progress queries join kenze_profile_search.companyid (VARCHAR) against
+-- company_id::VARCHAR on cli and google_my_business_locations, so those get
+-- expression indexes on the cast the queries actually use.
+--
+-- The scrapers keep writing to these tables, so the indexes are built
+-- CONCURRENTLY, which does not block writes but cannot run in a transaction.
+-- A build that fails leaves an INVALID index behind: drop it before running
+-- the migration again.
+
+-- .NET companies (Step 1-7), INCLUDE makes the Step 4 lookup index-only
+CREATE INDEX CONCURRENTLY IF NOT EXISTS kenze_profile_search_net_companyid_idx
+    ON kenze_profile_search (companyid)
+    INCLUDE (employee_scrape_timestamp)
+    WHERE net_profile;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS cli_company_id_idx
+    ON cli (company_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS cli_company_id_varchar_idx
+    ON cli ((company_id::VARCHAR));
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS google_my_business_locations_company_id_varchar_idx
+    ON google_my_business_locations ((company_id::VARCHAR));
+
+-- Employee profiles per company (Step 4 and the profile grid)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS kenze_pli_profiles_companyid_idx
+    ON kenze_pli_profiles (companyid);
+
+-- Latest year per company (Step 7)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS financial_data_company_id_year_idx
+    ON financial_data (company_id, year DESC)
+    INCLUDE (equity, employees, profit_loss, gross_margin, update_timestamp);
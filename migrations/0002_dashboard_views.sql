@@ -0,0 +1,38 @@
+-- Materialized views backing the dashboard progress queries.
+-- Refresh with `python migrate.py refresh`, the unique indexes allow
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY so readers are never blocked.
+
+-- Distinct companies employing .NET developers (Step 2)
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_net_companies AS
+SELECT DISTINCT
+    companyid
+FROM
+    kenze_profile_search
+WHERE
+    companyid IS NOT NULL
+    AND companyid != ''
+    AND net_profile = TRUE;
+
+CREATE UNIQUE INDEX IF NOT EXISTS mv_net_companies_companyid_idx
+    ON mv_net_companies (companyid);
+
+-- Latest financial year per company (Step 7)
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_latest_financials AS
+SELECT DISTINCT ON (company_id)
+    company_id,
+    year,
+    ROUND(equity, 0) AS equity,
+    employees AS fte_employees,
+    ROUND(profit_loss, 0) AS profit_loss,
+    ROUND(gross_margin, 0) AS gross_margin,
+    update_timestamp
+FROM
+    financial_data
+ORDER BY
+    company_id, year DESC;
+
+CREATE UNIQUE INDEX IF NOT EXISTS mv_latest_financials_company_id_idx
+    ON mv_latest_financials (company_id);
+
+CREATE INDEX IF NOT EXISTS mv_latest_financials_company_id_varchar_idx
+    ON mv_latest_financials ((company_id::VARCHAR));
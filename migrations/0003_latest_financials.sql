@@ -0,0 +1,149 @@
+-- Latest financial year per company, maintained incrementally.
+--
+-- Replaces mv_latest_financials: instead of re-ranking all of financial_data,
+-- statement-level triggers recompute only the companies touched by an
+-- INSERT, UPDATE or DELETE. refresh_latest_financials() rebuilds the whole
+-- table and is run by `python migrate.py refresh` as a safety net.
+-- dbt models can select from latest_financials instead of repeating the
+-- ROW_NUMBER() logic.
+
+DROP MATERIALIZED VIEW IF EXISTS mv_latest_financials;
+
+-- Latest year per company with year-over-year growth against the previous
+-- reported year (NULL when that year is missing or the base is zero)
+CREATE OR REPLACE VIEW latest_financials_source AS
+SELECT
+    company_id,
+    year,
+    ROUND(equity, 0) AS equity,
+    employees AS fte_employees,
+    ROUND(profit_loss, 0) AS profit_loss,
+    ROUND(gross_margin, 0) AS gross_margin,
+    update_timestamp,
+    years_of_history,
+    CASE WHEN previous_year = year - 1 THEN
+        ROUND((equity - previous_equity) * 100.0 / NULLIF(ABS(previous_equity), 0), 1)
+    END AS equity_yoy_pct,
+    CASE WHEN previous_year = year - 1 THEN
+        ROUND((employees - previous_employees) * 100.0 / NULLIF(ABS(previous_employees), 0), 1)
+    END AS fte_employees_yoy_pct,
+    CASE WHEN previous_year = year - 1 THEN
+        ROUND((profit_loss - previous_profit_loss) * 100.0 / NULLIF(ABS(previous_profit_loss), 0), 1)
+    END AS profit_loss_yoy_pct,
+    CASE WHEN previous_year = year - 1 THEN
+        ROUND((gross_margin - previous_gross_margin) * 100.0 / NULLIF(ABS(previous_gross_margin), 0), 1)
+    END AS gross_margin_yoy_pct
+FROM (
+    SELECT
+        company_id,
+        year,
+        equity,
+        employees,
+        profit_loss,
+        gross_margin,
+        update_timestamp,
+        ROW_NUMBER() OVER w AS rn,
+        COUNT(*) OVER (PARTITION BY company_id) AS years_of_history,
+        LEAD(year) OVER w AS previous_year,
+        LEAD(equity) OVER w AS previous_equity,
+        LEAD(employees) OVER w AS previous_employees,
+        LEAD(profit_loss) OVER w AS previous_profit_loss,
+        LEAD(gross_margin) OVER w AS previous_gross_margin
+    FROM
+        financial_data
+    WHERE
+        company_id IS NOT NULL
+    WINDOW w AS (PARTITION BY company_id ORDER BY year DESC)
+) AS subquery
+WHERE rn = 1;
+
+-- Column types follow financial_data
+CREATE TABLE IF NOT EXISTS latest_financials AS
+SELECT * FROM latest_financials_source;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'latest_financials'::regclass AND contype = 'p'
+    ) THEN
+        ALTER TABLE latest_financials ADD PRIMARY KEY (company_id);
+    END IF;
+END;
+$$;
+
+CREATE INDEX IF NOT EXISTS latest_financials_company_id_varchar_idx
+    ON latest_financials ((company_id::VARCHAR));
+
+-- Recompute the companies in the trigger's transition tables: the inserted
+-- rows, the deleted rows, or for an UPDATE both, so a company that rows moved
+-- away from is recomputed too. The source view is read through LATERAL, one
+-- company at a time, so the company_id filter reaches financial_data below the
+-- window functions and only the rows of the changed companies are ranked
+-- (OFFSET 0 keeps the planner from flattening it into a join over the whole
+-- view).
+CREATE OR REPLACE FUNCTION latest_financials_sync() RETURNS trigger AS $$
+DECLARE
+    changed TEXT := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT company_id FROM new_rows'
+        WHEN 'DELETE' THEN 'SELECT company_id FROM old_rows'
+        ELSE 'SELECT company_id FROM old_rows UNION SELECT company_id FROM new_rows'
+    END;
+BEGIN
+    EXECUTE format($sql$
+        DELETE FROM latest_financials AS l
+        WHERE l.company_id IN (%s)
+          AND NOT EXISTS (SELECT 1 FROM financial_data AS f WHERE f.company_id = l.company_id)
+    $sql$, changed);
+
+    EXECUTE format($sql$
+        INSERT INTO latest_financials
+        SELECT s.*
+        FROM (SELECT DISTINCT company_id FROM (%s) AS rows WHERE company_id IS NOT NULL) AS c
+        CROSS JOIN LATERAL (
+            SELECT * FROM latest_financials_source AS s
+            WHERE s.company_id = c.company_id
+            OFFSET 0
+        ) AS s
+        ON CONFLICT (company_id) DO UPDATE SET
+            year = EXCLUDED.year,
+            equity = EXCLUDED.equity,
+            fte_employees = EXCLUDED.fte_employees,
+            profit_loss = EXCLUDED.profit_loss,
+            gross_margin = EXCLUDED.gross_margin,
+            update_timestamp = EXCLUDED.update_timestamp,
+            years_of_history = EXCLUDED.years_of_history,
+            equity_yoy_pct = EXCLUDED.equity_yoy_pct,
+            fte_employees_yoy_pct = EXCLUDED.fte_employees_yoy_pct,
+            profit_loss_yoy_pct = EXCLUDED.profit_loss_yoy_pct,
+            gross_margin_yoy_pct = EXCLUDED.gross_margin_yoy_pct
+    $sql$, changed);
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables need one trigger per event
+DROP TRIGGER IF EXISTS latest_financials_insert ON financial_data;
+CREATE TRIGGER latest_financials_insert
+    AFTER INSERT ON financial_data
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION latest_financials_sync();
+
+DROP TRIGGER IF EXISTS latest_financials_update ON financial_data;
+CREATE TRIGGER latest_financials_update
+    AFTER UPDATE ON financial_data
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION latest_financials_sync();
+
+DROP TRIGGER IF EXISTS latest_financials_delete ON financial_data;
+CREATE TRIGGER latest_financials_delete
+    AFTER DELETE ON financial_data
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION latest_financials_sync();
+
+-- Full rebuild, for scheduled refreshes or after bulk loads with triggers disabled
+CREATE OR REPLACE FUNCTION refresh_latest_financials() RETURNS void AS $$
+    DELETE FROM latest_financials;
+    INSERT INTO latest_financials SELECT * FROM latest_financials_source;
+$$ LANGUAGE sql;
@@ -0,0 +1,209 @@
+-- Pipeline progress counters maintained as rows land.
+--
+-- pipeline_progress_members records, once per stage, every company that
+-- reached that stage. pipeline_progress_counters holds, per stage, how many
+-- of the .NET companies (stage companies_found) reached it, so the dashboard
+-- reads the progress numbers in O(1). Statement-level triggers on the ingest
+-- tables mark new members and bump the counters.
+--
+-- Counters only grow: deletes on the ingest tables are not subtracted. The
+-- reconciliation job (`python reconcile_progress.py`) compares the counters
+-- with a full recount and repairs them with rebuild_pipeline_progress().
+
+CREATE TABLE IF NOT EXISTS pipeline_progress_counters (
+    stage TEXT PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO pipeline_progress_counters (stage) VALUES
+    ('companies_found'),
+    ('companies_enriched'),
+    ('profiles_scraped'),
+    ('gmb_matched'),
+    ('website_embedded'),
+    ('financially_enriched')
+ON CONFLICT DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS pipeline_progress_members (
+    stage TEXT NOT NULL REFERENCES pipeline_progress_counters (stage),
+    companyid VARCHAR NOT NULL,
+    reached_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (stage, companyid)
+);
+
+CREATE INDEX IF NOT EXISTS pipeline_progress_members_companyid_idx
+    ON pipeline_progress_members (companyid);
+
+-- Full recount from the base tables, same definitions as the counters
+CREATE OR REPLACE VIEW pipeline_progress_recount AS
+WITH found AS (
+    SELECT DISTINCT
+        companyid
+    FROM
+        kenze_profile_search
+    WHERE
+        companyid IS NOT NULL
+        AND companyid != ''
+        AND net_profile = TRUE
+),
+reached AS (
+    SELECT 'companies_enriched' AS stage, company_id::VARCHAR AS companyid FROM cli
+    UNION
+    SELECT 'website_embedded', company_id::VARCHAR FROM cli WHERE embed_website_timestamp IS NOT NULL
+    UNION
+    SELECT 'financially_enriched', company_id::VARCHAR FROM cli WHERE vat_scrape_timestamp IS NOT NULL
+    UNION
+    SELECT 'profiles_scraped', companyid FROM kenze_pli_profiles
+    UNION
+    SELECT 'gmb_matched', company_id::VARCHAR FROM google_my_business_locations
+)
+SELECT 'companies_found' AS stage, COUNT(*) AS value FROM found
+UNION ALL
+SELECT r.stage, COUNT(*) FROM reached AS r JOIN found AS f USING (companyid) GROUP BY r.stage;
+
+-- Record companies reaching a stage and bump the counters for the new ones
+CREATE OR REPLACE FUNCTION pipeline_progress_mark(p_stage TEXT, p_companyids TEXT[]) RETURNS void AS $$
+DECLARE
+    v_new TEXT[];
+BEGIN
+    WITH inserted AS (
+        INSERT INTO pipeline_progress_members (stage, companyid)
+        SELECT DISTINCT p_stage, id FROM unnest(p_companyids) AS id WHERE id IS NOT NULL AND id != ''
+        ON CONFLICT DO NOTHING
+        RETURNING companyid
+    )
+    SELECT array_agg(companyid) INTO v_new FROM inserted;
+
+    IF v_new IS NULL THEN
+        RETURN;
+    END IF;
+
+    -- Serialise counting so a company found in one transaction and reaching a
+    -- stage in a concurrent one is counted exactly once
+    PERFORM pg_advisory_xact_lock(hashtext('pipeline_progress'));
+
+    IF p_stage = 'companies_found' THEN
+        -- Newly found companies, plus every stage they had already reached
+        UPDATE pipeline_progress_counters AS c
+        SET value = c.value + n.cnt, updated_at = now()
+        FROM (
+            SELECT stage, COUNT(*) AS cnt
+            FROM pipeline_progress_members
+            WHERE companyid = ANY(v_new)
+            GROUP BY stage
+        ) AS n
+        WHERE c.stage = n.stage;
+    ELSE
+        UPDATE pipeline_progress_counters
+        SET value = value + (
+                SELECT COUNT(*)
+                FROM pipeline_progress_members
+                WHERE stage = 'companies_found' AND companyid = ANY(v_new)
+            ),
+            updated_at = now()
+        WHERE stage = p_stage;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION pipeline_progress_profile_search() RETURNS trigger AS $$
+BEGIN
+    PERFORM pipeline_progress_mark('companies_found', ARRAY(SELECT companyid FROM changed_rows WHERE net_profile));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION pipeline_progress_cli() RETURNS trigger AS $$
+BEGIN
+    PERFORM pipeline_progress_mark('companies_enriched', ARRAY(SELECT company_id::VARCHAR FROM changed_rows));
+    PERFORM pipeline_progress_mark('website_embedded', ARRAY(
+        SELECT company_id::VARCHAR FROM changed_rows WHERE embed_website_timestamp IS NOT NULL));
+    PERFORM pipeline_progress_mark('financially_enriched', ARRAY(
+        SELECT company_id::VARCHAR FROM changed_rows WHERE vat_scrape_timestamp IS NOT NULL));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION pipeline_progress_pli_profiles() RETURNS trigger AS $$
+BEGIN
+    PERFORM pipeline_progress_mark('profiles_scraped', ARRAY(SELECT companyid FROM changed_rows));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION pipeline_progress_gmb() RETURNS trigger AS $$
+BEGIN
+    PERFORM pipeline_progress_mark('gmb_matched', ARRAY(SELECT company_id::VARCHAR FROM changed_rows));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables need one trigger per event
+DROP TRIGGER IF EXISTS pipeline_progress_insert ON kenze_profile_search;
+CREATE TRIGGER pipeline_progress_insert AFTER INSERT ON kenze_profile_search
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION pipeline_progress_profile_search();
+DROP TRIGGER IF EXISTS pipeline_progress_update ON kenze_profile_search;
+CREATE TRIGGER pipeline_progress_update AFTER UPDATE ON kenze_profile_search
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION pipeline_progress_profile_search();
+
+DROP TRIGGER IF EXISTS pipeline_progress_insert ON cli;
+CREATE TRIGGER pipeline_progress_insert AFTER INSERT ON cli
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION pipeline_progress_cli();
+DROP TRIGGER IF EXISTS pipeline_progress_update ON cli;
+CREATE TRIGGER pipeline_progress_update AFTER UPDATE ON cli
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION pipeline_progress_cli();
+
+DROP TRIGGER IF EXISTS pipeline_progress_insert ON kenze_pli_profiles;
+CREATE TRIGGER pipeline_progress_insert AFTER INSERT ON kenze_pli_profiles
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION pipeline_progress_pli_profiles();
+DROP TRIGGER IF EXISTS pipeline_progress_update ON kenze_pli_profiles;
+CREATE TRIGGER pipeline_progress_update AFTER UPDATE ON kenze_pli_profiles
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION pipeline_progress_pli_profiles();
+
+DROP TRIGGER IF EXISTS pipeline_progress_insert ON google_my_business_locations;
+CREATE TRIGGER pipeline_progress_insert AFTER INSERT ON google_my_business_locations
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION pipeline_progress_gmb();
+DROP TRIGGER IF EXISTS pipeline_progress_update ON google_my_business_locations;
+CREATE TRIGGER pipeline_progress_update AFTER UPDATE ON google_my_business_locations
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION pipeline_progress_gmb();
+
+-- Rebuild members and counters from the base tables
+CREATE OR REPLACE FUNCTION rebuild_pipeline_progress() RETURNS void AS $$
+    SELECT pg_advisory_xact_lock(hashtext('pipeline_progress'));
+
+    DELETE FROM pipeline_progress_members;
+
+    INSERT INTO pipeline_progress_members (stage, companyid)
+    SELECT 'companies_found', companyid FROM kenze_profile_search
+    WHERE companyid IS NOT NULL AND companyid != '' AND net_profile = TRUE
+    UNION
+    SELECT 'companies_enriched', company_id::VARCHAR FROM cli WHERE company_id IS NOT NULL
+    UNION
+    SELECT 'website_embedded', company_id::VARCHAR FROM cli
+    WHERE company_id IS NOT NULL AND embed_website_timestamp IS NOT NULL
+    UNION
+    SELECT 'financially_enriched', company_id::VARCHAR FROM cli
+    WHERE company_id IS NOT NULL AND vat_scrape_timestamp IS NOT NULL
+    UNION
+    SELECT 'profiles_scraped', companyid FROM kenze_pli_profiles
+    WHERE companyid IS NOT NULL AND companyid != ''
+    UNION
+    SELECT 'gmb_matched', company_id::VARCHAR FROM google_my_business_locations WHERE company_id IS NOT NULL;
+
+    UPDATE pipeline_progress_counters AS c
+    SET value = COALESCE(r.value, 0), updated_at = now()
+    FROM pipeline_progress_counters AS s
+    LEFT JOIN pipeline_progress_recount AS r USING (stage)
+    WHERE c.stage = s.stage;
+$$ LANGUAGE sql;
+
+SELECT rebuild_pipeline_progress();
@@ -0,0 +1,35 @@
+-- Prioritised scrape work queue.
+--
+-- work_queue.py fills the queue with each stage's backlog, cut into
+-- fixed-size batches in priority order. Workers lease a whole batch with
+-- FOR UPDATE SKIP LOCKED, so two workers never get the same batch, and ack
+-- it with the lease token when done. Expired leases are handed out again.
+
+CREATE TABLE IF NOT EXISTS scrape_work_batches (
+    batch_id BIGSERIAL PRIMARY KEY,
+    stage TEXT NOT NULL,
+    priority_rank INT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'leased', 'done')),
+    lease_token UUID,
+    lease_owner TEXT,
+    leased_until TIMESTAMPTZ,
+    attempts INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    acked_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS scrape_work_batches_open_idx
+    ON scrape_work_batches (stage, priority_rank, batch_id)
+    WHERE status != 'done';
+
+CREATE TABLE IF NOT EXISTS scrape_work_items (
+    batch_id BIGINT NOT NULL REFERENCES scrape_work_batches (batch_id) ON DELETE CASCADE,
+    companyid VARCHAR NOT NULL,
+    net_profiles INT,
+    employee_count INT,
+    hq_in_belgium BOOLEAN,
+    PRIMARY KEY (batch_id, companyid)
+);
+
+CREATE INDEX IF NOT EXISTS scrape_work_items_companyid_idx
+    ON scrape_work_items (companyid);
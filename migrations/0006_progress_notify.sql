@@ -0,0 +1,35 @@
+-- Notify listeners when the ingest tables change, for the dashboard's live mode.
+-- One notification per statement, the payload is the table name. Postgres
+-- also folds identical notifications within a transaction into one.
+
+CREATE OR REPLACE FUNCTION notify_pipeline_progress() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('pipeline_progress', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS pipeline_progress_notify ON kenze_profile_search;
+CREATE TRIGGER pipeline_progress_notify
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON kenze_profile_search
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_pipeline_progress();
+
+DROP TRIGGER IF EXISTS pipeline_progress_notify ON cli;
+CREATE TRIGGER pipeline_progress_notify
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON cli
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_pipeline_progress();
+
+DROP TRIGGER IF EXISTS pipeline_progress_notify ON kenze_pli_profiles;
+CREATE TRIGGER pipeline_progress_notify
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON kenze_pli_profiles
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_pipeline_progress();
+
+DROP TRIGGER IF EXISTS pipeline_progress_notify ON google_my_business_locations;
+CREATE TRIGGER pipeline_progress_notify
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON google_my_business_locations
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_pipeline_progress();
+
+DROP TRIGGER IF EXISTS pipeline_progress_notify ON financial_data;
+CREATE TRIGGER pipeline_progress_notify
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON financial_data
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_pipeline_progress();
@@ -0,0 +1,29 @@
+-- Profile rollup cube: profiles per company, seniority, department, .NET flag
+-- and tenure bucket. This is the finest grain, counts for any slice are sums
+-- over it (see rollup.py), so the dashboard never scans profile rows for them.
+-- Refresh with `python migrate.py refresh`; the unique index allows
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY.
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_profile_rollup AS
+SELECT
+    companyid,
+    COALESCE(seniority, 'Unknown') AS seniority,
+    COALESCE(department, 'Unknown') AS department,
+    COALESCE(net_profile, FALSE) AS net_profile,
+    -- Keep in sync with rollup.TENURE_BUCKETS
+    CASE
+        WHEN months_in_company IS NULL THEN 'Unknown'
+        WHEN months_in_company < 12 THEN '<1y'
+        WHEN months_in_company < 24 THEN '1-2y'
+        WHEN months_in_company < 60 THEN '2-5y'
+        WHEN months_in_company < 120 THEN '5-10y'
+        ELSE '10y+'
+    END AS tenure_bucket,
+    COUNT(*) AS profiles
+FROM
+    kenze_pli_profiles
+WHERE
+    companyid IS NOT NULL
+GROUP BY 1, 2, 3, 4, 5;
+
+CREATE UNIQUE INDEX IF NOT EXISTS mv_profile_rollup_key_idx
+    ON mv_profile_rollup (companyid, seniority, department, net_profile, tenure_bucket);
@@ -0,0 +1,17 @@
+-- Full-text search over profile titles and summaries.
+--
+-- profile_search_vector() is the one definition of the searchable text, used
+-- by both the GIN index and queries.PROFILE_SEARCH so the planner can match
+-- them. The 'simple' configuration does not stem, profiles are written in
+-- English, Dutch and French and technology names must match as typed.
+-- Weights rank title matches above title description and summary matches.
+CREATE OR REPLACE FUNCTION profile_search_vector(title TEXT, titledescription TEXT, summary TEXT)
+RETURNS tsvector
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT setweight(to_tsvector('simple', COALESCE(title, '')), 'A')
+        || setweight(to_tsvector('simple', COALESCE(titledescription, '')), 'B')
+        || setweight(to_tsvector('simple', COALESCE(summary, '')), 'C')
+$$;
+
+CREATE INDEX IF NOT EXISTS kenze_pli_profiles_search_idx
+    ON kenze_pli_profiles USING GIN (profile_search_vector(title, titledescription, summary));
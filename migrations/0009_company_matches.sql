@@ -0,0 +1,15 @@
+-- Company matches found by entity_resolution.py: one row per record of another
+-- source (a GMB location, a KBO enterprise) with the cli company it belongs
+-- to, the match confidence (0-1) and the fields that agreed. Rewritten per
+-- source on every run.
+CREATE TABLE IF NOT EXISTS company_matches (
+    source TEXT NOT NULL,
+    source_record_id TEXT NOT NULL,
+    company_id BIGINT NOT NULL,
+    confidence REAL NOT NULL,
+    matched_on TEXT NOT NULL,
+    resolved_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (source, source_record_id)
+);
+
+CREATE INDEX IF NOT EXISTS company_matches_company_id_idx ON company_matches (company_id);
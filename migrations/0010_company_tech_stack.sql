@@ -0,0 +1,19 @@
+-- Website pages stored by the website scraper (Step 6): the homepage HTML and
+-- response headers of each company, scanned by tech_stack.py.
+CREATE TABLE IF NOT EXISTS company_website_pages (
+    company_id BIGINT PRIMARY KEY,
+    url TEXT NOT NULL,
+    html TEXT,
+    headers JSONB,
+    fetched_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Technologies found on each company's website, comma-separated in signature
+-- name order ('' when the page was scanned and nothing was found). Joined
+-- into the companies query, so the map can filter on them.
+CREATE TABLE IF NOT EXISTS company_tech_stack (
+    company_id BIGINT PRIMARY KEY,
+    technologies TEXT NOT NULL,
+    tech_categories TEXT NOT NULL,
+    detected_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
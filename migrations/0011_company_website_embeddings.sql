@@ -0,0 +1,8 @@
+-- Website embeddings stored by the website embedding step (Step 6), one vector
+-- per company, next to cli.embed_website_timestamp. All vectors have the same
+-- dimension. similar.py builds the lookalike search index from them.
+CREATE TABLE IF NOT EXISTS company_website_embeddings (
+    company_id BIGINT PRIMARY KEY,
+    embedding REAL[] NOT NULL,
+    embedded_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
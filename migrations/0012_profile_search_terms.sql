@@ -0,0 +1,26 @@
+-- Technology names in the profile search.
+--
+-- The default parser splits "C#" into "c" and reads ".NET" as "net", so a
+-- search for c# matched "C developer". The searchable text now gets the same
+-- rewrites as search.TECH_TERMS ("C#" -> "csharp", ".NET" -> "dotnet"), which
+-- the app also applies to the query. Keep the two lists in step.
+CREATE OR REPLACE FUNCTION profile_search_terms(text TEXT)
+RETURNS TEXT
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT regexp_replace(regexp_replace(regexp_replace(regexp_replace(COALESCE(text, ''),
+        '(?<![\w#+])([cf])#(?![\w#+])', '\1sharp', 'gi'),
+        '(?<![\w#+])c\+\+(?![\w#+])', 'cplusplus', 'gi'),
+        '(?<![\w.])(asp|ado|vb)\.net(?!\w)', '\1 dotnet', 'gi'),
+        '(?<![\w.])\.net(?!\w)', 'dotnet', 'gi')
+$$;
+
+CREATE OR REPLACE FUNCTION profile_search_vector(title TEXT, titledescription TEXT, summary TEXT)
+RETURNS tsvector
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT setweight(to_tsvector('simple', profile_search_terms(title)), 'A')
+        || setweight(to_tsvector('simple', profile_search_terms(titledescription)), 'B')
+        || setweight(to_tsvector('simple', profile_search_terms(summary)), 'C')
+$$;
+
+-- The index holds vectors of the old definition
+REINDEX INDEX kenze_pli_profiles_search_idx;
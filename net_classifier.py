@@ -0,0 +1,129 @@
+# .NET skill classifier for employee profiles.
+#
+# A profile is a .NET profile when its skills, title, title description or
+# summary mention one of NET_KEYWORDS. The keywords are compiled into a single
+# case-insensitive pattern, so each profile text is scanned once however long
+# the keyword list is, and identical texts are only matched once per chunk.
+#
+# `python net_classifier.py` re-scores all of kenze_pli_profiles: the profiles
+# are read with the bulk fetch path, classified in chunks by a process pool and
+# the flags that changed are written back in one bulk update. The
+# net_profile flag of kenze_profile_search comes from the search stage
+# upstream, which has no profile text to re-score.
+#
+# Examples:
+#   python net_classifier.py --dry-run             # report what would change
+#   python net_classifier.py --workers 8
+#   python net_classifier.py --keywords keywords.txt
+
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from db import connect_to_db, fetch_arrow_table, update_by_ctid
+
+
+NET_KEYWORDS = [
+    ".net", "dotnet", "asp.net", "vb.net", "c#", "csharp", "f#",
+    "blazor", "entity framework", "ef core", "linq", "signalr", "nuget",
+    "wpf", "winforms", "windows forms", "xamarin", ".net maui", "azure functions",
+]
+
+# Profile text the keywords are matched against
+PROFILES = """
+    SELECT
+        ctid::TEXT AS ctid,
+        net_profile,
+        concat_ws(E'\\n', skills, title, titledescription, summary) AS text
+    FROM
+        kenze_pli_profiles
+    """
+
+CHUNK_ROWS = 50000
+
+
+# One alternation for all keywords, longest first. A keyword must not be part
+# of a longer word: "c#" matches in "C#, SQL" but not in "abc#", ".net" not in
+# "asp.netcore".
+def compile_keywords(keywords):
+    alternation = "|".join(re.escape(k.lower()) for k in sorted(set(keywords), key=len, reverse=True))
+    return re.compile(rf"(?<![\w#+.])(?:{alternation})(?![\w#+])", re.IGNORECASE)
+
+
+def load_keywords(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+# Pattern shared by the workers, set once per process by the pool initializer
+WORKER_DATA = {}
+
+
+def init_worker(keywords):
+    WORKER_DATA["pattern"] = compile_keywords(keywords)
+
+
+# .NET flag per text, each distinct text matched once
+def classify_texts(texts, pattern):
+    codes, uniques = pd.factorize(pd.Series(texts).fillna(""))
+    matches = np.fromiter((pattern.search(text) is not None for text in uniques), dtype=bool, count=len(uniques))
+    return matches[codes]
+
+
+def classify_chunk(texts):
+    return classify_texts(texts, WORKER_DATA["pattern"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score the net_profile flag of all employee profiles")
+    parser.add_argument("--keywords", help="Keyword file, one per line (default: NET_KEYWORDS)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Classifier processes")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Profiles per work unit")
+    parser.add_argument("--dry-run", action="store_true", help="Report the changes without writing them")
+    parser.add_argument("--dsn", help="Connection string (default: app secrets)")
+    args = parser.parse_args()
+
+    keywords = load_keywords(args.keywords) if args.keywords else NET_KEYWORDS
+    conn = psycopg2.connect(args.dsn) if args.dsn else connect_to_db()
+    conn.set_session(isolation_level="REPEATABLE READ")
+    cur = conn.cursor()
+
+    start = time.perf_counter()
+    profiles = fetch_arrow_table(conn, PROFILES, method="copy").to_pandas()
+    read_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    texts = profiles["text"].to_numpy()
+    chunks = [texts[i:i + args.chunk_rows] for i in range(0, len(texts), args.chunk_rows)]
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(keywords,)) as pool:
+        flags = np.concatenate(list(pool.map(classify_chunk, chunks))) if chunks else np.array([], dtype=bool)
+    classify_s = time.perf_counter() - start
+
+    # NULL flags count as changed too
+    changed = profiles.assign(net_profile=flags)[profiles["net_profile"].ne(flags).to_numpy()]
+    print(f"{len(profiles):,} profiles, {int(flags.sum()):,} .NET profiles, {len(changed):,} changed "
+          f"({int(changed['net_profile'].sum()):,} to .NET, {int((~changed['net_profile']).sum()):,} to non-.NET)")
+
+    write_s = 0.0
+    if not args.dry_run and len(changed):
+        start = time.perf_counter()
+        updated = update_by_ctid(cur, "kenze_pli_profiles", changed, {"net_profile": "BOOLEAN"})
+        conn.commit()
+        write_s = time.perf_counter() - start
+        print(f"{updated:,} profiles updated. Run `python migrate.py refresh` to update mv_profile_rollup.")
+    conn.close()
+
+    for phase, seconds, rows in [("read", read_s, len(profiles)), ("classify", classify_s, len(profiles)),
+                                 ("write", write_s, len(changed))]:
+        rate = f"{rows / seconds:>12,.0f} profiles/s" if seconds else ""
+        print(f"{phase:<10} {seconds:>7.2f}s {rate}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# Profile selections within a memory budget.
+#
+# The profiles of the selected companies are read as a stream of Arrow
+# batches (see stream() in backend.py). While they fit in the memory budget
+# they are kept as one DataFrame. Past it, the batches go to a Parquet file on
+# disk instead, one row group per batch, and only the page on screen is read
+# back: row group by row group, the filter columns first and the full rows of
+# the matches only.
+#
+# The options, ranges and counts behind the profile filters come from a small
+# summary built batch by batch while loading: the number of profiles per
+# seniority, department, .NET flag and months in company. They never touch
+# the profile rows again.
+
+import os
+import tempfile
+import weakref
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import filters
+
+
+# Columns of filters.filter_profiles
+FILTER_COLUMNS = ['seniority', 'department', 'net_profile', 'months_in_company']
+
+DEFAULT_MEMORY_BUDGET_MB = 256
+
+
+# Profiles per combination of filter values, in order of first appearance
+def summarize(frame):
+    return frame.groupby(FILTER_COLUMNS, dropna=False, sort=False).size().rename("profiles").reset_index()
+
+
+class ProfileSelection:
+    def __init__(self, summary, frame=None, path=None):
+        self.summary = summary
+        # In memory: the profiles. Spilled: the Parquet file holding them,
+        # removed with the selection.
+        self.frame = frame
+        self.path = path
+        if path is not None:
+            weakref.finalize(self, os.remove, path)
+
+    # Read batches (with at least filters.PROFILE_COLUMNS) into a selection.
+    # Batches are kept in memory up to budget_bytes of Arrow data, then all
+    # of them are written to a Parquet file in spill_dir (default the system
+    # temporary directory).
+    @classmethod
+    def load(cls, batches, budget_bytes, spill_dir=None):
+        kept, kept_bytes, writer, path, summaries = [], 0, None, None, []
+        try:
+            for batch in batches:
+                batch = batch.select(filters.PROFILE_COLUMNS)
+                summaries.append(summarize(batch.select(FILTER_COLUMNS).to_pandas()))
+                if writer is None and kept_bytes + batch.nbytes <= budget_bytes:
+                    kept.append(batch)
+                    kept_bytes += batch.nbytes
+                    continue
+                if writer is None:
+                    fd, path = tempfile.mkstemp(prefix="profiles_", suffix=".parquet", dir=spill_dir)
+                    os.close(fd)
+                    writer = pq.ParquetWriter(path, batch.schema)
+                    for spilled in kept:
+                        writer.write_batch(spilled)
+                    kept = []
+                writer.write_batch(batch)
+        except BaseException:
+            if writer is not None:
+                writer.close()
+                os.remove(path)
+            raise
+
+        if summaries:
+            summary = (pd.concat(summaries, ignore_index=True)
+                       .groupby(FILTER_COLUMNS, dropna=False, sort=False)["profiles"].sum().reset_index())
+        else:
+            summary = pd.DataFrame(columns=FILTER_COLUMNS + ["profiles"])
+        if writer is not None:
+            writer.close()
+            return cls(summary, path=path)
+        frame = pa.Table.from_batches(kept).to_pandas() if kept else pd.DataFrame(columns=filters.PROFILE_COLUMNS)
+        return cls(summary, frame=frame)
+
+    @property
+    def spilled(self):
+        return self.path is not None
+
+    # Distinct values of a filter column among the profiles matching criteria
+    # (see filters.filter_profiles)
+    def values(self, column, **criteria):
+        return filters.filter_profiles(self.summary, **criteria)[column].unique().tolist()
+
+    # Smallest and largest value of a filter column among the matches
+    def bounds(self, column, **criteria):
+        values = filters.filter_profiles(self.summary, **criteria)[column]
+        return values.min(), values.max()
+
+    def count(self, **criteria):
+        return int(filters.filter_profiles(self.summary, **criteria)["profiles"].sum())
+
+    # The first n profiles matching criteria
+    def head(self, n, **criteria):
+        if not self.spilled:
+            return filters.filter_profiles(self.frame, **criteria).head(n)
+        found, rows = [], 0
+        for chunk in self.chunks(**criteria):
+            found.append(chunk.head(n - rows))
+            rows += len(found[-1])
+            if rows >= n:
+                break
+        return pd.concat(found, ignore_index=True) if found else pd.DataFrame(columns=filters.PROFILE_COLUMNS)
+
+    # The profiles matching criteria, in chunks of at most one row group
+    def chunks(self, **criteria):
+        if not self.spilled:
+            yield filters.filter_profiles(self.frame, **criteria)
+            return
+        file = pq.ParquetFile(self.path)
+        for i in range(file.num_row_groups):
+            keys = file.read_row_group(i, columns=FILTER_COLUMNS).to_pandas()
+            rows = filters.filter_profiles(keys, **criteria).index.to_numpy()
+            if len(rows):
+                yield file.read_row_group(i).take(rows).to_pandas()
+
+    # Write the profiles matching criteria as CSV to f, one chunk at a time
+    def to_csv(self, f, **criteria):
+        header = True
+        for chunk in self.chunks(**criteria):
+            chunk.to_csv(f, index=False, header=header)
+            header = False
+        if header:
+            pd.DataFrame(columns=filters.PROFILE_COLUMNS).to_csv(f, index=False)
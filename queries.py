@@ -0,0 +1,446 @@
+# Named SQL queries used by the dashboard.
+#
+# Kept in one place so the app and the tooling around it (query plan checks,
+# benchmarks) run exactly the same statements. The mv_* views and the indexes
+# these queries rely on are created by the migrations in migrations/.
+
+# Step 1: total profiles, .NET profiles and the companies employing them
+PROFILE_SEARCH_STATS = """
+    SELECT
+        COUNT(*) AS total_result,
+        COUNT(CASE WHEN net_profile = TRUE THEN 1 END) AS net_profile_true,
+        (SELECT COUNT(DISTINCT companyid)
+         FROM kenze_profile_search
+         WHERE net_profile = TRUE) AS distinct_companyid_count
+    FROM kenze_profile_search;
+    """
+
+# Step 3: companies found vs. enriched with LinkedIn company data
+COMPANY_ENRICHMENT = """
+    SELECT
+        companies_found,
+        companies_enriched,
+        CASE
+        WHEN companies_found > 0 THEN
+            ROUND((companies_enriched::DECIMAL / companies_found::DECIMAL) * 100, 1)
+        ELSE
+            0
+    END as percentage_complete
+    FROM (
+        SELECT
+            MAX(CASE WHEN stage = 'companies_found' THEN value END) AS companies_found,
+            MAX(CASE WHEN stage = 'companies_enriched' THEN value END) AS companies_enriched
+        FROM
+            pipeline_progress_counters
+    ) AS counters
+    """
+
+# Step 4: companies with employee profiles collected vs. still to collect
+EMPLOYEE_COLLECTION = """
+    WITH subquery1 AS (
+        SELECT
+            companyid,
+            min(vmid) as vmid,
+            min(employee_scrape_timestamp) as min_timestamp
+        FROM
+            kenze_profile_search
+        WHERE
+            companyid IS NOT NULL
+            AND companyid != ''
+            AND employee_scrape_timestamp IS NULL
+            AND net_profile = TRUE
+        GROUP BY companyid
+    ),
+    subquery2 AS (
+        SELECT
+            companyid,
+            COUNT(companyid) AS kenze_pli_employee_count
+        FROM
+            kenze_pli_profiles
+        WHERE
+            companyid IS NOT NULL
+        GROUP BY companyid
+    ),
+    cli_search AS (
+        SELECT
+            company_id AS companyid_c,
+            hq_country,
+            employee_count,
+            enrichment_timestamp
+        FROM
+            cli
+        WHERE
+            hq_country = 'BE'
+    )
+    SELECT
+        COUNT(DISTINCT subquery1.companyid) AS companies_found,
+        COUNT(DISTINCT CASE WHEN  subquery2.companyid IS NOT NULL THEN cli_search.companyid_c END) AS collected,
+        COUNT(DISTINCT CASE WHEN  subquery2.companyid IS NULL THEN cli_search.companyid_c END) AS to_collect,
+        SUM(subquery2.kenze_pli_employee_count) AS profiles_collected
+    FROM
+        subquery1
+        LEFT JOIN subquery2 ON subquery1.companyid = subquery2.companyid
+        FULL JOIN cli_search ON subquery1.companyid = cli_search.companyid_c::VARCHAR
+    WHERE
+        subquery1.companyid IS NOT NULL
+        AND subquery1.companyid != ''
+    """
+
+# Step 5: share of companies found on Google My Business
+GMB_COVERAGE = """
+    WITH kenze_profile_search AS (
+        SELECT
+            companyid
+        FROM
+            mv_net_companies
+    ),
+    cli_search AS (
+        SELECT
+            company_id,
+            enrichment_timestamp,
+            serper_addressscrape_timestamp,
+            website,
+            hq_line1,
+            hq_postalcode,
+            company_name
+        FROM
+            cli
+    ),
+    gmb_search AS (
+        SELECT
+            company_id AS gmb_company_id
+        FROM
+            google_my_business_locations
+    ),
+    joined_data AS (
+        SELECT
+            a.companyid,
+            b.company_id,
+            c.gmb_company_id
+        FROM
+            kenze_profile_search AS a
+            LEFT JOIN cli_search AS b ON a.companyid = b.company_id::VARCHAR
+            LEFT JOIN gmb_search AS c ON a.companyid = c.gmb_company_id::VARCHAR
+        WHERE
+            a.companyid IS NOT NULL
+            AND b.company_id IS NOT NULL
+            AND b.serper_addressscrape_timestamp IS NOT NULL
+    )
+    SELECT
+        COUNT(*) AS total_companies,
+        ROUND(
+            (COUNT(CASE WHEN gmb_company_id IS NULL THEN 1 END) * 100.0) / COUNT(*),
+            2
+        ) AS gmb_companies_not_found
+    FROM
+        joined_data
+    """
+
+# Step 6: share of company websites embedded
+WEBSITE_EMBEDDING = """
+    WITH kenze_profile_search AS (
+        SELECT
+            companyid
+        FROM
+            mv_net_companies
+    ),
+    cli_search AS (
+        SELECT
+            company_id,
+            enrichment_timestamp,
+            serper_addressscrape_timestamp,
+            website,
+            hq_line1,
+            hq_postalcode,
+            company_name,
+            embed_website_timestamp
+        FROM
+            cli
+        where website is not null and website != ''
+    ),
+    joined_data AS (
+        SELECT
+            a.companyid,
+            b.company_id,
+            b.embed_website_timestamp,b.website
+        FROM
+            kenze_profile_search AS a
+            LEFT JOIN cli_search AS b ON a.companyid = b.company_id::VARCHAR
+
+        WHERE
+            a.companyid IS NOT NULL
+            AND b.company_id IS NOT NULL
+    )
+    SELECT
+        COUNT(*) AS total_companies,
+        ROUND((COUNT(CASE WHEN embed_website_timestamp IS NULL THEN 1 END) * 100.0) / COUNT(*), 2 ) AS websites_to_embed
+    FROM
+        joined_data
+    """
+
+# Step 7: share of companies enriched with financial data
+FINANCIAL_ENRICHMENT = """
+    SELECT
+        companies_found AS total_companies,
+        CASE
+        WHEN companies_found > 0 THEN
+            ROUND(financially_enriched * 100.0 / companies_found, 2)
+        ELSE
+            0
+    END AS pct_financial_data_enrichment
+    FROM (
+        SELECT
+            MAX(CASE WHEN stage = 'companies_found' THEN value END) AS companies_found,
+            MAX(CASE WHEN stage = 'financially_enriched' THEN value END) AS financially_enriched
+        FROM
+            pipeline_progress_counters
+    ) AS counters
+    """
+
+# Pipeline progress counters maintained by the ingest triggers (Step 2)
+PROGRESS_COUNTERS = """
+    SELECT
+        stage,
+        value,
+        updated_at
+    FROM
+        pipeline_progress_counters
+    """
+
+# Counters next to a full recount from the base tables, used for reconciliation
+PROGRESS_COUNTER_DRIFT = """
+    SELECT
+        c.stage,
+        c.value AS counter,
+        COALESCE(r.value, 0) AS recount,
+        c.updated_at
+    FROM
+        pipeline_progress_counters AS c
+        LEFT JOIN pipeline_progress_recount AS r USING (stage)
+    ORDER BY
+        c.stage
+    """
+
+# Companies per pipeline stage, compressed into hourly buckets: rows in the
+# lookback window per completion hour, earlier completions and the pending
+# backlog as one row each. Takes lookback_hours.
+THROUGHPUT = """
+    WITH kenze_profile_search_companies AS (
+        SELECT
+            companyid,
+            CASE WHEN bool_and(employee_scrape_timestamp IS NOT NULL) THEN
+                MAX(employee_scrape_timestamp)
+            END AS employee_scrape_timestamp
+        FROM
+            kenze_profile_search
+        WHERE
+            companyid IS NOT NULL
+            AND companyid != ''
+            AND net_profile = TRUE
+        GROUP BY companyid
+    ),
+    company_data AS (
+        SELECT
+            a.companyid,
+            a.employee_scrape_timestamp,
+            b.enrichment_timestamp,
+            b.serper_addressscrape_timestamp,
+            b.embed_website_timestamp,
+            b.vat_scrape_timestamp,
+            d.update_timestamp
+        FROM
+            kenze_profile_search_companies AS a
+            LEFT JOIN cli AS b ON a.companyid = b.company_id::VARCHAR
+            LEFT JOIN latest_financials AS d ON a.companyid = d.company_id::VARCHAR
+    ),
+    stage_events AS (
+        SELECT 'company_enrichment' AS stage, enrichment_timestamp::TIMESTAMP AS ts FROM company_data
+        UNION ALL
+        SELECT 'employee_profiles', employee_scrape_timestamp::TIMESTAMP FROM company_data
+        UNION ALL
+        SELECT 'gmb_address', serper_addressscrape_timestamp::TIMESTAMP FROM company_data
+        UNION ALL
+        SELECT 'website_embedding', embed_website_timestamp::TIMESTAMP FROM company_data
+        UNION ALL
+        SELECT 'vat_scrape', vat_scrape_timestamp::TIMESTAMP FROM company_data
+        UNION ALL
+        SELECT 'financial_data', update_timestamp::TIMESTAMP FROM company_data
+    )
+    SELECT
+        stage,
+        CASE
+            WHEN ts IS NULL THEN 'pending'
+            WHEN ts < LOCALTIMESTAMP - %(lookback_hours)s * INTERVAL '1 hour' THEN 'earlier'
+            ELSE 'window'
+        END AS period,
+        CASE WHEN ts >= LOCALTIMESTAMP - %(lookback_hours)s * INTERVAL '1 hour' THEN
+            date_trunc('hour', ts)
+        END AS bucket,
+        COUNT(*) AS companies,
+        date_trunc('hour', LOCALTIMESTAMP) AS current_hour
+    FROM
+        stage_events
+    GROUP BY 1, 2, 3
+    """
+
+# Backlog of one scrape stage (employee_profiles, gmb_address, website_embedding
+# or vat_scrape) in priority order: HQ in Belgium first, then most .NET profiles,
+# then largest companies. Takes stage.
+SCRAPE_BACKLOG = """
+    WITH net_companies AS (
+        SELECT
+            companyid,
+            COUNT(*) AS net_profiles,
+            bool_or(employee_scrape_timestamp IS NULL) AS has_unscraped_profiles
+        FROM
+            kenze_profile_search
+        WHERE
+            companyid IS NOT NULL
+            AND companyid != ''
+            AND net_profile = TRUE
+        GROUP BY companyid
+    ),
+    backlog AS (
+        SELECT
+            a.companyid,
+            a.net_profiles,
+            b.employee_count,
+            COALESCE(b.hq_country = 'BE', FALSE) AS hq_in_belgium,
+            CASE %(stage)s
+                WHEN 'employee_profiles' THEN
+                    a.has_unscraped_profiles
+                    AND NOT EXISTS (SELECT 1 FROM kenze_pli_profiles AS p WHERE p.companyid = a.companyid)
+                WHEN 'gmb_address' THEN
+                    b.company_id IS NOT NULL AND b.serper_addressscrape_timestamp IS NULL
+                WHEN 'website_embedding' THEN
+                    b.website IS NOT NULL AND b.website != '' AND b.embed_website_timestamp IS NULL
+                WHEN 'vat_scrape' THEN
+                    b.company_id IS NOT NULL AND b.vat_scrape_timestamp IS NULL
+            END AS pending
+        FROM
+            net_companies AS a
+            LEFT JOIN cli AS b ON a.companyid = b.company_id::VARCHAR
+    )
+    SELECT
+        companyid,
+        net_profiles,
+        employee_count,
+        hq_in_belgium
+    FROM
+        backlog
+    WHERE
+        pending
+    ORDER BY
+        hq_in_belgium DESC,
+        net_profiles DESC,
+        employee_count DESC NULLS LAST,
+        companyid
+    """
+
+# Final dbt model with one row per company, plus the financial trends and the
+# website technologies (see tech_stack.py)
+COMPANIES = """
+    SELECT
+        c.*,
+        lf.years_of_history,
+        lf.equity_yoy_pct,
+        lf.fte_employees_yoy_pct,
+        lf.profit_loss_yoy_pct,
+        lf.gross_margin_yoy_pct,
+        ts.technologies,
+        ts.tech_categories
+    FROM
+        public_dbt.a_final_kenze_companies AS c
+        LEFT JOIN latest_financials AS lf ON c.kar_company_id = lf.company_id::VARCHAR
+        LEFT JOIN company_tech_stack AS ts ON c.kar_company_id = ts.company_id::VARCHAR
+    """
+
+# Website embeddings for the lookalike search index (see similar.py), as
+# array_send() bytes, which are decoded without parsing text
+WEBSITE_EMBEDDINGS = """
+    SELECT
+        company_id,
+        array_send(embedding) AS embedding
+    FROM
+        company_website_embeddings
+    ORDER BY
+        company_id
+    """
+
+# Employee profiles for a list of companies, takes a list of company ids
+PROFILES_FOR_COMPANIES = """
+    SELECT *
+    FROM kenze_pli_profiles
+    WHERE companyid = ANY(%s)
+    """
+
+# Profile rollup cube (see rollup.py), one row per company, seniority,
+# department, .NET flag and tenure bucket
+PROFILE_ROLLUP = """
+    SELECT
+        companyid,
+        seniority,
+        department,
+        net_profile,
+        tenure_bucket,
+        profiles
+    FROM
+        mv_profile_rollup
+    """
+
+# Ranked full-text search over profile titles, title descriptions and
+# summaries, one page at a time. Takes query (web search syntax: "quoted
+# phrases", or, -excluded), company_ids (NULL for all companies), limit and
+# offset. total_matches is the number of matches over all pages.
+PROFILE_SEARCH = """
+    WITH matches AS (
+        SELECT
+            p.*,
+            ts_rank_cd(profile_search_vector(p.title, p.titledescription, p.summary), query) AS rank
+        FROM
+            kenze_pli_profiles AS p,
+            websearch_to_tsquery('simple', %(query)s) AS query
+        WHERE
+            profile_search_vector(p.title, p.titledescription, p.summary) @@ query
+            AND (%(company_ids)s::TEXT[] IS NULL OR p.companyid = ANY(%(company_ids)s::TEXT[]))
+    )
+    SELECT
+        *,
+        COUNT(*) OVER () AS total_matches
+    FROM
+        matches
+    ORDER BY
+        rank DESC,
+        companyid,
+        name
+    LIMIT %(limit)s OFFSET %(offset)s
+    """
+
+# Progress queries in the order they appear on the dashboard
+PROGRESS_QUERIES = {
+    "profile_search_stats": PROFILE_SEARCH_STATS,
+    "progress_counters": PROGRESS_COUNTERS,
+    "company_enrichment": COMPANY_ENRICHMENT,
+    "employee_collection": EMPLOYEE_COLLECTION,
+    "gmb_coverage": GMB_COVERAGE,
+    "website_embedding": WEBSITE_EMBEDDING,
+    "financial_enrichment": FINANCIAL_ENRICHMENT,
+}
+
+# Tables each progress query reads, live mode reruns a query only after one of them changed
+PROGRESS_TABLES = {
+    "profile_search_stats": ["kenze_profile_search"],
+    "progress_counters": ["kenze_profile_search", "cli", "kenze_pli_profiles", "google_my_business_locations"],
+    "company_enrichment": ["kenze_profile_search", "cli"],
+    "employee_collection": ["kenze_profile_search", "kenze_pli_profiles", "cli"],
+    "gmb_coverage": ["kenze_profile_search", "cli", "google_my_business_locations"],
+    "website_embedding": ["kenze_profile_search", "cli"],
+    "financial_enrichment": ["kenze_profile_search", "cli", "financial_data"],
+}
+
+# Time budgets in milliseconds for the heavier queries, the others use
+# STATEMENT_TIMEOUT_MS from the secrets (default 5000)
+QUERY_TIMEOUTS_MS = {
+    "employee_collection": 10000,
+    "throughput": 15000,
+}
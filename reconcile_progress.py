@@ -0,0 +1,52 @@
+# Reconciliation job for the pipeline progress counters.
+#
+# Compares pipeline_progress_counters, which the ingest triggers maintain, with
+# a full recount from the base tables and reports the drift per stage. Run it
+# periodically (e.g. from cron); it exits non-zero when drift is found.
+#
+# Usage:
+#   python reconcile_progress.py          # report drift
+#   python reconcile_progress.py --fix    # report and rebuild the counters
+
+import argparse
+import sys
+
+import psycopg2
+
+import queries
+from db import connect_to_db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify the pipeline progress counters against a full recount")
+    parser.add_argument("--fix", action="store_true", help="Rebuild the counters when they drifted")
+    parser.add_argument("--dsn", help="Connection string (default: app secrets)")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.dsn) if args.dsn else connect_to_db()
+    cur = conn.cursor()
+
+    cur.execute(queries.PROGRESS_COUNTER_DRIFT)
+    rows = cur.fetchall()
+
+    drifted = 0
+    for stage, counter, recount, updated_at in rows:
+        drift = counter - recount
+        drifted += drift != 0
+        print(f"{stage:<22} counter={counter:<8} recount={recount:<8} drift={drift:+d}  (updated {updated_at:%Y-%m-%d %H:%M})")
+
+    if drifted and args.fix:
+        cur.execute("SELECT rebuild_pipeline_progress()")
+        conn.commit()
+        print("Counters rebuilt from the base tables")
+
+    conn.close()
+
+    if drifted:
+        print(f"{drifted} stage(s) drifted")
+        sys.exit(1)
+    print("Counters match the recount")
+
+
+if __name__ == "__main__":
+    main()
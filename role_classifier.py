@@ -0,0 +1,140 @@
+# Seniority and department classification of employee profiles (Step 4).
+#
+# Both are rule tables checked from the job title. Seniority takes the first
+# level whose keywords match, Specialist when none does. Department takes the
+# department whose keywords match, Operations when none or several do. Keywords
+# are whole words or phrases, in English, Dutch and French.
+#
+# Titles repeat a lot across profiles, so a batch is classified per distinct
+# normalised title (memoised across batches) and the labels are mapped back to
+# the rows with the factorize codes.
+#
+# `python role_classifier.py` reclassifies all of kenze_pli_profiles after a
+# rule change and writes the labels that changed back in one bulk update:
+#
+#   python role_classifier.py --dry-run
+#   python role_classifier.py
+
+import argparse
+import functools
+import time
+
+import pandas as pd
+import psycopg2
+
+from db import connect_to_db, fetch_arrow_table, update_by_ctid
+from net_classifier import compile_keywords
+
+
+SENIORITY_RULES = [
+    ("Advisor", ["board member", "board of directors", "member of the board", "advisory board", "advisor",
+                 "adviser", "shareholder", "chairman", "chairwoman", "chair", "investor", "business angel",
+                 "bestuurslid", "raad van bestuur", "aandeelhouder", "voorzitter", "investeerder",
+                 "conseil d'administration", "actionnaire", "investisseur"]),
+    # Before Executive, whose "president" would match them too
+    ("Senior", ["vice president", "vice-president", "vice président", "vice-président", "vp"]),
+    ("Executive", ["ceo", "cto", "cfo", "coo", "cio", "cmo", "cdo", "cso", "cpo", "cro", "chief",
+                   "founder", "co-founder", "cofounder", "managing partner", "founding partner", "equity partner", "business owner",
+                   "managing director", "general manager", "president", "président", "oprichter", "medeoprichter", "eigenaar",
+                   "zaakvoerder", "gedelegeerd bestuurder", "algemeen directeur", "fondateur", "cofondateur",
+                   "associé", "propriétaire", "gérant", "directeur général", "administrateur délégué"]),
+    ("Senior", ["senior", "sr", "lead", "team lead", "tech lead", "head", "head of", "director", "manager",
+                "principal", "teamleider", "hoofd", "directeur", "verantwoordelijke",
+                "diensthoofd", "chef", "responsable"]),
+]
+DEFAULT_SENIORITY = "Specialist"
+
+DEPARTMENT_RULES = [
+    ("Marketing", ["marketing", "brand", "content", "communication", "communications", "seo", "growth",
+                   "communicatie", "merk"]),
+    ("Sales", ["sales", "account manager", "account executive", "business development", "business developer",
+               "bdr", "sdr", "verkoop", "verkoper", "commercieel", "commercial", "commerciale", "vente", "ventes"]),
+    ("Customer Success", ["customer success", "customer support", "customer service", "customer care",
+                          "klantenservice", "klantendienst", "service client", "support client"]),
+    ("Finance", ["finance", "financial", "financieel", "financier", "financière", "accountant", "accounting",
+                 "controller", "controlling", "treasury", "cfo", "boekhouder", "boekhouding", "comptable",
+                 "comptabilité"]),
+    ("Human Resources", ["hr", "human resources", "recruiter", "recruitment", "talent acquisition", "people",
+                         "personeel", "personeelsdienst", "rh", "ressources humaines", "recruteur"]),
+    ("Legal", ["legal", "lawyer", "counsel", "jurist", "juriste", "juridisch", "juridique", "compliance",
+               "advocaat", "avocat"]),
+    ("IT/Engineering", ["it", "ict", "developer", "software", "engineer", "engineering", "cto", "cio",
+                        "architect", "devops", "data", "programmer", "programmeur", "ontwikkelaar", "développeur",
+                        "ingénieur", "ingenieur", "informatica", "informatique", ".net", "c#", "java", "cloud",
+                        "security", "sysadmin", "system administrator", "qa", "tester"]),
+]
+DEFAULT_DEPARTMENT = "Operations"
+
+SENIORITY_PATTERNS = [(label, compile_keywords(keywords)) for label, keywords in SENIORITY_RULES]
+DEPARTMENT_PATTERNS = [(label, compile_keywords(keywords)) for label, keywords in DEPARTMENT_RULES]
+
+PROFILES = """
+    SELECT
+        ctid::TEXT AS ctid,
+        title,
+        seniority,
+        department
+    FROM
+        kenze_pli_profiles
+    """
+
+
+# Seniority and department of one normalised title
+@functools.lru_cache(maxsize=None)
+def classify_title(title):
+    seniority = next((label for label, pattern in SENIORITY_PATTERNS if pattern.search(title)), DEFAULT_SENIORITY)
+    departments = [label for label, pattern in DEPARTMENT_PATTERNS if pattern.search(title)]
+    department = departments[0] if len(departments) == 1 else DEFAULT_DEPARTMENT
+    return seniority, department
+
+
+# Seniority and department per title as a DataFrame with the titles' index
+def classify_titles(titles):
+    codes, uniques = pd.factorize(titles.fillna("").str.strip().str.lower())
+    labels = pd.DataFrame([classify_title(title) for title in uniques], columns=["seniority", "department"])
+    return labels.take(codes).set_axis(titles.index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reclassify the seniority and department of all employee profiles")
+    parser.add_argument("--dry-run", action="store_true", help="Report the changes without writing them")
+    parser.add_argument("--dsn", help="Connection string (default: app secrets)")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.dsn) if args.dsn else connect_to_db()
+    conn.set_session(isolation_level="REPEATABLE READ")
+    cur = conn.cursor()
+
+    start = time.perf_counter()
+    profiles = fetch_arrow_table(conn, PROFILES, method="copy").to_pandas()
+    read_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    labels = classify_titles(profiles["title"])
+    classify_s = time.perf_counter() - start
+
+    changed_mask = (profiles["seniority"].ne(labels["seniority"]) | profiles["department"].ne(labels["department"]))
+    changed = profiles[["ctid"]].join(labels)[changed_mask]
+    print(f"{len(profiles):,} profiles, {profiles['title'].nunique():,} distinct titles, {len(changed):,} changed")
+    for column in ["seniority", "department"]:
+        moves = pd.crosstab(profiles.loc[changed_mask, column].fillna("(none)"), labels.loc[changed_mask, column])
+        if not moves.empty:
+            print(f"\n{column} changes (rows: current, columns: new)\n{moves.to_string()}\n")
+
+    write_s = 0.0
+    if not args.dry_run and len(changed):
+        start = time.perf_counter()
+        updated = update_by_ctid(cur, "kenze_pli_profiles", changed, {"seniority": "TEXT", "department": "TEXT"})
+        conn.commit()
+        write_s = time.perf_counter() - start
+        print(f"{updated:,} profiles updated. Run `python migrate.py refresh` to update mv_profile_rollup.")
+    conn.close()
+
+    for phase, seconds, rows in [("read", read_s, len(profiles)), ("classify", classify_s, len(profiles)),
+                                 ("write", write_s, len(changed))]:
+        rate = f"{rows / seconds:>12,.0f} profiles/s" if seconds else ""
+        print(f"{phase:<10} {seconds:>7.2f}s {rate}")
+
+
+if __name__ == "__main__":
+    main()
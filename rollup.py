@@ -0,0 +1,54 @@
+# Profile rollup cube.
+#
+# mv_profile_rollup (queries.PROFILE_ROLLUP) counts profiles per company,
+# seniority, department, .NET flag and tenure bucket. Any slice of the profile
+# population is a vectorised filter and groupby over that cube, a few rows per
+# company, never over the individual profile rows.
+
+import numpy as np
+import pandas as pd
+
+
+# Tenure buckets in display order, as computed by migrations/0007_profile_rollup.sql
+TENURE_BUCKETS = ["<1y", "1-2y", "2-5y", "5-10y", "10y+", "Unknown"]
+
+DIMENSIONS = ["companyid", "seniority", "department", "net_profile", "tenure_bucket"]
+
+
+# Cube rows as a compact frame: categorical dimensions make the masks and
+# groupbys below work on integer codes
+def to_frame(df):
+    cube = df.astype({"companyid": "category", "seniority": "category", "department": "category",
+                      "net_profile": bool, "profiles": np.int64})
+    cube["tenure_bucket"] = pd.Categorical(df["tenure_bucket"], categories=TENURE_BUCKETS, ordered=True)
+    return cube
+
+
+# Profile counts of one slice grouped by the given dimensions (a Series; the
+# total when by is empty). A criterion left at None does not filter;
+# tenure_buckets is a list of buckets.
+def slice_counts(cube, by=(), company_ids=None, seniority=None, department=None, net_profile=None,
+                 tenure_buckets=None):
+    mask = np.ones(len(cube), dtype=bool)
+    if company_ids is not None:
+        mask &= cube["companyid"].isin(company_ids).to_numpy()
+    if seniority is not None:
+        mask &= (cube["seniority"] == seniority).to_numpy()
+    if department is not None:
+        mask &= (cube["department"] == department).to_numpy()
+    if net_profile is not None:
+        mask &= (cube["net_profile"] == net_profile).to_numpy()
+    if tenure_buckets is not None:
+        mask &= cube["tenure_bucket"].isin(tenure_buckets).to_numpy()
+
+    selected = cube[mask]
+    if not by:
+        return int(selected["profiles"].sum())
+    return selected.groupby(list(by), observed=True)["profiles"].sum()
+
+
+# Two-dimensional slice as a table, rows by the first dimension and columns by
+# the second, 0 where there are no profiles
+def pivot(cube, rows, columns, **criteria):
+    counts = slice_counts(cube, by=[rows, columns], **criteria)
+    return counts.unstack(columns, fill_value=0)
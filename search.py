@@ -0,0 +1,164 @@
+# Full-text search over profile titles, title descriptions and summaries on a
+# snapshot.
+#
+# On Postgres, search runs on the GIN index from migrations/0008 (see
+# queries.PROFILE_SEARCH). A snapshot gets its own persistent index instead:
+# snapshot.py builds a SQLite FTS5 index next to kenze_pli_profiles.parquet,
+# with rowid = row number in that file, and the DuckDB backend reads the rows
+# of a result page back from the Parquet file.
+#
+# Queries use the same web search syntax on both: words must all match,
+# "quoted phrases" match as a phrase, `or` between two terms matches either
+# and a leading - excludes a term. A snapshot cannot search for exclusions
+# alone ("-sales"), FTS5 needs at least one term to match.
+#
+# Both tokenizers split words on punctuation, so "c#" would match "C developer"
+# and ".net" "net fisherman". The technology names in TECH_TERMS are rewritten
+# to plain words ("csharp", "dotnet") in the indexed text and in the query
+# before either is tokenized.
+
+import json
+import os
+import re
+import sqlite3
+
+
+INDEX_FILE = "profiles_fts.sqlite"
+
+# Relative weights of title, title description and summary matches, in line
+# with the A/B/C weights of the Postgres index
+BM25_WEIGHTS = (5.0, 2.0, 1.0)
+
+TOKEN = re.compile(r'(-?)"([^"]*)"|(-?)(\S+)')
+
+# (pattern, replacement) in the regex syntax shared by Python and Postgres,
+# applied in order and ignoring case. migrations/0012 applies the same
+# rewrites in profile_search_vector().
+TECH_TERMS = [
+    (r"(?<![\w#+])([cf])#(?![\w#+])", r"\1sharp"),
+    (r"(?<![\w#+])c\+\+(?![\w#+])", "cplusplus"),
+    (r"(?<![\w.])(asp|ado|vb)\.net(?!\w)", r"\1 dotnet"),
+    (r"(?<![\w.])\.net(?!\w)", "dotnet"),
+]
+TECH_TERM_PATTERNS = [(re.compile(pattern, re.IGNORECASE), replacement) for pattern, replacement in TECH_TERMS]
+
+BATCH_ROWS = 100000
+
+
+# Text with the technology names rewritten to single words (see TECH_TERMS)
+def normalize_terms(text):
+    for pattern, replacement in TECH_TERM_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+# Translate a web search query to an FTS5 query. Every term is quoted, so
+# FTS5 operators and syntax characters in it are taken as text. Exclusions
+# before the first term are moved after it, since FTS5 NOT needs something on
+# its left. Raises ValueError for a query of exclusions only.
+def to_fts5_query(text):
+    terms, leading = [], []
+    for match in TOKEN.finditer(normalize_terms(text)):
+        negate = match.group(1) or match.group(3)
+        term = match.group(2) if match.group(2) is not None else match.group(4)
+        if match.group(4) is not None and term.lower() == "or":
+            if terms and terms[-1] not in ("OR", "NOT"):
+                terms.append("OR")
+            continue
+        term = term.replace('"', '').strip()
+        if not term:
+            continue
+        if negate:
+            if not terms:
+                leading += ["NOT", f'"{term}"']
+                continue
+            if terms[-1] in ("OR", "NOT"):
+                continue
+            terms.append("NOT")
+        terms.append(f'"{term}"')
+        if leading:
+            terms += leading
+            leading = []
+    if terms and terms[-1] in ("OR", "NOT"):
+        terms.pop()
+    if leading:
+        raise ValueError("Add a term to search for, a snapshot cannot search for excluded terms only.")
+    return " ".join(terms)
+
+
+# Build the index from the profiles in Parquet file order. profiles is an
+# Arrow table with at least title, titledescription, summary and companyid.
+def build_index(profiles, path):
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    # Contentless: the text stays in Parquet, the index only keeps the terms
+    conn.execute("CREATE VIRTUAL TABLE profiles_fts USING fts5(title, titledescription, summary, content='')")
+    conn.execute("CREATE TABLE profile_companies (rowid INTEGER PRIMARY KEY, companyid TEXT)")
+
+    for start in range(0, profiles.num_rows, BATCH_ROWS):
+        batch = profiles.slice(start, BATCH_ROWS)
+        rowids = range(start, start + batch.num_rows)
+        columns = [[None if text is None else normalize_terms(text) for text in batch.column(name).to_pylist()]
+                   for name in ["title", "titledescription", "summary"]]
+        conn.executemany("INSERT INTO profiles_fts (rowid, title, titledescription, summary) VALUES (?, ?, ?, ?)",
+                         zip(rowids, *columns))
+        conn.executemany("INSERT INTO profile_companies (rowid, companyid) VALUES (?, ?)",
+                         zip(rowids, batch.column("companyid").to_pylist()))
+
+    conn.execute("CREATE INDEX profile_companies_companyid_idx ON profile_companies (companyid)")
+    conn.execute("INSERT INTO profiles_fts (profiles_fts) VALUES ('optimize')")
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, path)
+
+
+# One page of matches as (rowid, rank) pairs, best first, and the number of
+# matches over all pages. company_ids limits the search to those companies.
+def search_index(path, query, company_ids=None, limit=20, offset=0):
+    match = to_fts5_query(query)
+    if not match:
+        return [], 0
+
+    params = [match]
+    company_filter = ""
+    if company_ids is not None:
+        company_filter = "AND c.companyid IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps(list(company_ids)))
+
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        # bm25() only works in a plain query on the FTS table, rank first and
+        # filter and count the matches around it
+        rows = conn.execute(f"""
+            WITH matches AS (
+                SELECT
+                    rowid,
+                    -bm25(profiles_fts, {', '.join(map(str, BM25_WEIGHTS))}) AS rank
+                FROM
+                    profiles_fts
+                WHERE
+                    profiles_fts MATCH ?
+            )
+            SELECT
+                m.rowid,
+                m.rank,
+                COUNT(*) OVER () AS total_matches
+            FROM
+                matches AS m
+                JOIN profile_companies AS c ON c.rowid = m.rowid
+            WHERE
+                TRUE
+                {company_filter}
+            ORDER BY
+                m.rank DESC,
+                m.rowid
+            LIMIT ? OFFSET ?
+            """, params + [limit, offset]).fetchall()
+    finally:
+        conn.close()
+
+    total = rows[0][2] if rows else 0
+    return [(rowid, rank) for rowid, rank, _ in rows], total
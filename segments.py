@@ -0,0 +1,296 @@
+# Saved campaign segments.
+#
+# A segment is a named set of company filters and profile filters, the same
+# criteria as the "Granular Campaign Segmentation" widgets (see filters.py).
+# Definitions live in a JSON file keyed by segment name:
+#
+#   {
+#     "senior_net_developers": {
+#       "description": "Senior .NET developers at companies with 3+ of them",
+#       "companies": {"min_net_devs": 3, "employee_count_range": [10, 5000]},
+#       "profiles": {"seniority": "Senior", "net_profile": true}
+#     }
+#   }
+#
+# `python segments.py build` precomputes the company and profile membership of
+# every segment as compressed (Roaring) bitmaps over the current dataset. The
+# bitmaps are stored per dataset version, a hash of the companies and profiles
+# they index, next to those rows in bit order:
+#
+#   segment_store/
+#     LATEST                      # version of the last build
+#     <version>/
+#       manifest.json             # segments, their definition hash and counts
+#       companies.parquet         # bit i of a company bitmap is row i
+#       profiles.parquet
+#       <segment>.companies.roaring
+#       <segment>.profiles.roaring
+#
+# Segments are then combined with bitmap operations instead of pandas reruns:
+#
+#   python segments.py count "senior_net_developers & mid_size_net_teams"
+#   python segments.py export "long_tenure_net_profiles - senior_net_developers" --out list.csv
+
+import argparse
+import ast
+import datetime
+import hashlib
+import inspect
+import json
+import operator
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from pyroaring import FrozenBitMap
+
+import filters
+import queries
+from backend import open_backend
+
+
+COMPANY_CRITERIA = set(inspect.signature(filters.filter_companies).parameters) - {"df"}
+PROFILE_CRITERIA = set(inspect.signature(filters.filter_profiles).parameters) - {"df"}
+
+KINDS = ["companies", "profiles"]
+
+# Set operators allowed in segment expressions
+OPERATORS = {
+    ast.BitAnd: operator.and_,
+    ast.BitOr: operator.or_,
+    ast.Sub: operator.sub,
+    ast.BitXor: operator.xor,
+}
+
+
+# Load segment definitions, rejecting unknown criteria so a typo does not
+# silently widen a segment
+def load_segments(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        segments = json.load(f)
+
+    for name, definition in segments.items():
+        validate_segment(name, definition)
+    return segments
+
+
+def validate_segment(name, definition):
+    # Names end up in file names and segment expressions
+    if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", name):
+        raise ValueError(f"Segment name {name!r} may only contain letters, digits and '_', and not start with a digit")
+    unknown = set(definition.get("companies", {})) - COMPANY_CRITERIA
+    unknown |= set(definition.get("profiles", {})) - PROFILE_CRITERIA
+    if unknown:
+        raise ValueError(f"Segment {name!r} has unknown criteria: {', '.join(sorted(unknown))}")
+
+
+# Add or replace one segment definition in the definitions file
+def save_segment(path, name, definition):
+    validate_segment(name, definition)
+    segments = load_segments(path)
+    segments[name] = definition
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(segments, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# Companies in Belgium and their profiles, the rows every segment filters
+def load_population(backend):
+    companies = filters.companies_in_belgium(backend.dataframe(queries.COMPANIES))
+    company_ids = companies['kar_company_id'].dropna().unique().tolist()
+    profiles = backend.dataframe(queries.PROFILES_FOR_COMPANIES, (company_ids,))
+    return companies, profiles
+
+
+# Companies and profiles in a segment. companies are the companies in Belgium
+# (filters.companies_in_belgium), profiles the profiles of those companies.
+def evaluate_segment(definition, companies, profiles):
+    selected_companies = filters.filter_companies(companies, **definition.get("companies", {}))
+    company_ids = selected_companies['kar_company_id'].dropna().unique()
+    selected_profiles = filters.filter_profiles(profiles[profiles['companyid'].isin(company_ids)],
+                                                **definition.get("profiles", {}))
+    return selected_companies, selected_profiles
+
+
+# Rows in a canonical order (by row hash) so the same data always gets the same
+# bit positions, plus a hash of the rows as their version
+def canonical_rows(df):
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    order = np.argsort(row_hashes, kind="stable")
+    digest = hashlib.sha1(row_hashes[order].tobytes()).hexdigest()
+    return df.iloc[order].reset_index(drop=True), digest
+
+
+def definition_hash(definition):
+    criteria = {kind: definition.get(kind, {}) for kind in KINDS}
+    return hashlib.sha1(json.dumps(criteria, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def write_bitmap(path, bitmap):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(bitmap.serialize())
+    os.replace(tmp_path, path)
+
+
+# Precompute the membership bitmaps of all segments for the current data.
+# Segments whose definition did not change since the last build of the same
+# dataset version are kept as they are.
+def build_store(backend, segments, root):
+    companies, profiles = load_population(backend)
+    companies, company_digest = canonical_rows(companies[[c for c in filters.COMPANY_COLUMNS if c in companies.columns]])
+    profiles, profile_digest = canonical_rows(profiles[['companyid'] + filters.PROFILE_COLUMNS])
+    version = hashlib.sha1((company_digest + profile_digest).encode()).hexdigest()[:12]
+
+    store_dir = os.path.join(root, version)
+    manifest_path = os.path.join(store_dir, "manifest.json")
+    os.makedirs(store_dir, exist_ok=True)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    else:
+        companies.to_parquet(os.path.join(store_dir, "companies.parquet"), index=False)
+        profiles.to_parquet(os.path.join(store_dir, "profiles.parquet"), index=False)
+        manifest = {"version": version, "companies": len(companies), "profiles": len(profiles), "segments": {}}
+
+    built = []
+    for name, definition in segments.items():
+        entry = manifest["segments"].get(name)
+        if entry is not None and entry["definition_hash"] == definition_hash(definition):
+            continue
+        selected_companies, selected_profiles = evaluate_segment(definition, companies, profiles)
+        counts = {}
+        for kind, selected in [("companies", selected_companies), ("profiles", selected_profiles)]:
+            bitmap = FrozenBitMap(selected.index.to_numpy(dtype=np.uint32))
+            write_bitmap(os.path.join(store_dir, f"{name}.{kind}.roaring"), bitmap)
+            counts[kind] = len(bitmap)
+        manifest["segments"][name] = {"definition_hash": definition_hash(definition),
+                                      "description": definition.get("description", ""), **counts}
+        built.append(name)
+
+    # Segments no longer defined
+    for name in set(manifest["segments"]) - set(segments):
+        del manifest["segments"][name]
+        for kind in KINDS:
+            path = os.path.join(store_dir, f"{name}.{kind}.roaring")
+            if os.path.exists(path):
+                os.remove(path)
+
+    manifest["built_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+    with open(os.path.join(root, "LATEST"), "w") as f:
+        f.write(version)
+    return manifest, built
+
+
+# Read side of a built store: loads bitmaps and rows lazily and combines
+# segments with set operators
+class SegmentStore:
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        self.version = self.manifest["version"]
+        self.bitmaps = {}
+        self.frames = {}
+
+    @classmethod
+    def latest(cls, root):
+        with open(os.path.join(root, "LATEST")) as f:
+            return cls(os.path.join(root, f.read().strip()))
+
+    @property
+    def names(self):
+        return list(self.manifest["segments"])
+
+    def bitmap(self, name, kind="profiles"):
+        if name not in self.manifest["segments"]:
+            raise KeyError(f"Unknown segment {name!r}, known: {', '.join(self.names)}")
+        if (name, kind) not in self.bitmaps:
+            with open(os.path.join(self.store_dir, f"{name}.{kind}.roaring"), "rb") as f:
+                self.bitmaps[(name, kind)] = FrozenBitMap.deserialize(f.read())
+        return self.bitmaps[(name, kind)]
+
+    # Evaluate an expression over segment names with & (in both), | (in
+    # either), - (in the first but not the second), ^ and parentheses
+    def evaluate(self, expression, kind="profiles"):
+        def visit(node):
+            if isinstance(node, ast.Expression):
+                return visit(node.body)
+            if isinstance(node, ast.Name):
+                return self.bitmap(node.id, kind)
+            if isinstance(node, ast.BinOp) and type(node.op) in OPERATORS:
+                return OPERATORS[type(node.op)](visit(node.left), visit(node.right))
+            raise ValueError(f"Unsupported segment expression: {ast.unparse(node)}")
+        return visit(ast.parse(expression, mode="eval"))
+
+    def count(self, expression, kind="profiles"):
+        return len(self.evaluate(expression, kind))
+
+    # The rows of the members of a bitmap
+    def rows(self, bitmap, kind="profiles"):
+        if kind not in self.frames:
+            self.frames[kind] = pd.read_parquet(os.path.join(self.store_dir, f"{kind}.parquet"))
+        return self.frames[kind].take(np.asarray(bitmap.to_array(), dtype=np.int64))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the saved segment bitmaps")
+    parser.add_argument("--segments", default="segments.json", help="Segment definitions (JSON)")
+    parser.add_argument("--store", default="segment_store", help="Segment store directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Precompute the bitmaps for the current data")
+    build.add_argument("--backend", choices=["postgres", "duckdb"], help="Default: DATA_BACKEND from secrets.toml")
+    build.add_argument("--snapshot-dir", help="Default: SNAPSHOT_DIR from secrets.toml")
+
+    commands.add_parser("list", help="Segments in the latest build")
+
+    count = commands.add_parser("count", help="Count the members of a segment expression")
+    count.add_argument("expression", help='e.g. "senior_net_developers & mid_size_net_teams"')
+
+    export = commands.add_parser("export", help="Write the members of a segment expression")
+    export.add_argument("expression")
+    export.add_argument("--kind", choices=KINDS, default="profiles")
+    export.add_argument("--out", required=True, help="CSV file")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        backend = open_backend(args.backend or st.secrets.get("DATA_BACKEND", "postgres"),
+                               args.snapshot_dir or st.secrets.get("SNAPSHOT_DIR", "snapshot"))
+        start = time.perf_counter()
+        manifest, built = build_store(backend, load_segments(args.segments), args.store)
+        print(f"Dataset version {manifest['version']}: {manifest['companies']} companies, {manifest['profiles']} profiles")
+        print(f"Built {len(built)} segment(s), {len(manifest['segments']) - len(built)} unchanged, "
+              f"in {time.perf_counter() - start:.1f}s")
+        return
+
+    store = SegmentStore.latest(args.store)
+    if args.command == "list":
+        print(f"Dataset version {store.version}, built {store.manifest['built_at']}")
+        for name, entry in store.manifest["segments"].items():
+            print(f"{name:<32} {entry['companies']:>7} companies {entry['profiles']:>8} profiles  {entry['description']}")
+    elif args.command == "count":
+        for kind in KINDS:
+            # Load the bitmaps first so the timing covers the set operations only
+            store.evaluate(args.expression, kind)
+            start = time.perf_counter()
+            members = store.count(args.expression, kind)
+            print(f"{kind:<10} {members:>8}  ({(time.perf_counter() - start) * 1e6:.0f} µs)")
+    else:
+        rows = store.rows(store.evaluate(args.expression, args.kind), args.kind)
+        rows.to_csv(args.out, index=False)
+        print(f"{len(rows)} {args.kind} written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
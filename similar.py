@@ -0,0 +1,185 @@
+# Lookalike company search over the website embeddings.
+#
+# An in-process IVF (inverted file) index: the normalised embeddings are
+# clustered with k-means, and each vector is stored with the other vectors of
+# its cluster (its list). A query only scores the vectors in the n_probe lists
+# whose centroids are closest to it, a few percent of all companies, so it
+# answers in milliseconds over 100k+ companies. Vectors are kept as float16,
+# half the memory of float32, and similarity is the cosine similarity.
+#
+# On Postgres the index is built from company_website_embeddings when first
+# used and kept for the server process. snapshot.py builds it once and stores
+# it next to the Parquet files (INDEX_FILE), where the DuckDB backend loads it.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+import queries
+
+
+INDEX_FILE = "website_embeddings_ivf.npz"
+
+# Lists per index: LISTS_PER_SQRT_ROWS * sqrt(rows). More lists make queries
+# faster (fewer vectors per list) and the build slower.
+LISTS_PER_SQRT_ROWS = 2
+
+# Lists probed per query, higher finds more of the true nearest neighbours
+N_PROBE = 8
+
+# k-means: training rows per list and Lloyd iterations
+TRAINING_ROWS_PER_LIST = 32
+KMEANS_ITERATIONS = 10
+
+FETCH_ROWS = 5000
+
+# array_send() of a float4[]: a 20-byte header (dimensions, null flag, element
+# type, length, lower bound), then a length and a big-endian value per element
+ARRAY_HEADER_BYTES = 20
+ARRAY_ELEMENT = np.dtype([("length", ">i4"), ("value", ">f4")])
+
+
+# Company ids and the embedding matrix, streamed from the database with a
+# server-side cursor. Runs in the connection's current transaction.
+def load_embeddings(conn):
+    cur = conn.cursor(name="website_embeddings")
+    cur.itersize = FETCH_ROWS
+    cur.execute(queries.WEBSITE_EMBEDDINGS)
+    ids, chunks = [], []
+    while True:
+        rows = cur.fetchmany(FETCH_ROWS)
+        if not rows:
+            break
+        ids.extend(company_id for company_id, _ in rows)
+        elements = np.frombuffer(b"".join(bytes(blob)[ARRAY_HEADER_BYTES:] for _, blob in rows), dtype=ARRAY_ELEMENT)
+        chunks.append(elements["value"].astype(np.float32).reshape(len(rows), -1))
+    cur.close()
+    if not chunks:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+    return np.array(ids, dtype=np.int64), np.vstack(chunks)
+
+
+def normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+# Closest centroid per vector, in blocks to bound the score matrix
+def assign(vectors, centroids, block_rows=8192):
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block_rows):
+        labels[start:start + block_rows] = (vectors[start:start + block_rows] @ centroids.T).argmax(axis=1)
+    return labels
+
+
+# Spherical k-means (cosine) on a sample of the vectors
+def train_centroids(vectors, n_lists, iterations=KMEANS_ITERATIONS, seed=0):
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), min(len(vectors), n_lists * TRAINING_ROWS_PER_LIST), replace=False)]
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+    for _ in range(iterations):
+        labels = assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        # An empty list keeps its centroid
+        empty = np.bincount(labels, minlength=n_lists) == 0
+        sums[empty] = centroids[empty]
+        centroids = normalize(sums)
+    return centroids
+
+
+class EmbeddingIndex:
+    def __init__(self, company_ids, centroids, offsets, vectors):
+        # Vectors and their company ids are grouped by list; list i holds rows
+        # offsets[i] to offsets[i + 1]
+        self.company_ids = company_ids
+        self.centroids = centroids
+        self.offsets = offsets
+        self.vectors = vectors
+        self.id_order = np.argsort(company_ids)
+
+    @classmethod
+    def build(cls, company_ids, embeddings, n_lists=None, seed=0):
+        vectors = normalize(np.asarray(embeddings, dtype=np.float32))
+        n_lists = n_lists or max(1, int(LISTS_PER_SQRT_ROWS * np.sqrt(len(vectors))))
+        centroids = train_centroids(vectors, min(n_lists, len(vectors)), seed=seed)
+        labels = assign(vectors, centroids)
+        order = np.argsort(labels, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=len(centroids)))])
+        return cls(np.asarray(company_ids, dtype=np.int64)[order], centroids, offsets,
+                   vectors[order].astype(np.float16))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["company_ids"], data["centroids"], data["offsets"], data["vectors"])
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, company_ids=self.company_ids, centroids=self.centroids, offsets=self.offsets,
+                     vectors=self.vectors)
+        os.replace(tmp_path, path)
+
+    def __len__(self):
+        return len(self.company_ids)
+
+    def position(self, company_id):
+        i = np.searchsorted(self.company_ids, company_id, sorter=self.id_order)
+        if i < len(self) and self.company_ids[self.id_order[i]] == company_id:
+            return self.id_order[i]
+        return None
+
+    # The k companies whose websites are most similar to company_id's, best
+    # first, as (company_id, similarity) arrays. company_ids limits the results
+    # to those companies. Empty when company_id has no embedding.
+    def similar(self, company_id, k=10, company_ids=None, n_probe=N_PROBE):
+        position = self.position(company_id)
+        if position is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = self.vectors[position].astype(np.float32)
+
+        lists = np.argsort(-(self.centroids @ query))
+        allowed = None
+        if company_ids is not None:
+            allowed = np.isin(self.company_ids, np.asarray(company_ids, dtype=np.int64))
+
+        probe_rows = self.offsets[lists[:n_probe] + 1] - self.offsets[lists[:n_probe]]
+        if allowed is not None and allowed.sum() <= probe_rows.sum():
+            # No more vectors than a probe: score all allowed companies exactly
+            rows = np.flatnonzero(allowed)
+            vectors = self.vectors[rows]
+        else:
+            # Probe more lists while they hold fewer than k candidates besides
+            # the company itself
+            while True:
+                probed = lists[:n_probe]
+                rows = np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in probed])
+                candidates = allowed[rows].sum() if allowed is not None else len(rows)
+                if candidates > k or n_probe >= len(lists):
+                    break
+                n_probe *= 2
+            # A list is a contiguous block, copying the blocks beats gathering rows
+            vectors = np.concatenate([self.vectors[self.offsets[i]:self.offsets[i + 1]] for i in probed])
+
+        scores = vectors.astype(np.float32) @ query
+        keep = rows != position
+        if allowed is not None:
+            keep &= allowed[rows]
+        rows, scores = rows[keep], scores[keep]
+        top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return self.company_ids[rows[top]], scores[top]
+
+
+# Result of EmbeddingIndex.similar as a DataFrame with company_id (text, like
+# kar_company_id) and similarity columns. Ids that are not numbers have no
+# embedding.
+def similar_companies(index, company_id, k=10, company_ids=None):
+    similar_ids, scores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    if str(company_id).isdigit():
+        if company_ids is not None:
+            company_ids = [int(i) for i in company_ids if str(i).isdigit()]
+        similar_ids, scores = index.similar(int(company_id), k, company_ids)
+    return pd.DataFrame({"company_id": similar_ids.astype(str), "similarity": scores})
@@ -0,0 +1,97 @@
+# Export the tables the dashboard reads to a local Parquet snapshot.
+#
+# The snapshot is what DATA_BACKEND = "duckdb" runs against (see backend.py).
+# All tables are read in one repeatable-read transaction, so they are
+# consistent with each other. snapshot.json records the version, when it was
+# taken and the row count per table, and is written last: a directory without
+# it is not a usable snapshot. The profiles also get a full-text search index
+# (see search.py) and the website embeddings a lookalike search index (see
+# similar.py).
+#
+# Example:
+#   python snapshot.py --dir snapshot
+
+import argparse
+import datetime
+import json
+import os
+import time
+
+import pyarrow.parquet as pq
+
+import search
+import similar
+from backend import MANIFEST_FILE
+from db import connect_to_db, fetch_arrow_table
+
+
+# Every table or view queries.py reads for the progress steps, companies and profiles
+SNAPSHOT_TABLES = [
+    "kenze_profile_search",
+    "kenze_pli_profiles",
+    "cli",
+    "google_my_business_locations",
+    "mv_net_companies",
+    "mv_profile_rollup",
+    "latest_financials",
+    "company_tech_stack",
+    "pipeline_progress_counters",
+    "public_dbt.a_final_kenze_companies",
+]
+
+
+def write_snapshot(conn, snapshot_dir, tables):
+    os.makedirs(snapshot_dir, exist_ok=True)
+    taken_at = datetime.datetime.now(datetime.timezone.utc)
+    manifest = {
+        "version": taken_at.strftime("%Y%m%dT%H%M%SZ"),
+        "created_at": taken_at.isoformat(),
+        "tables": {},
+    }
+
+    for table in tables:
+        start = time.perf_counter()
+        # COPY runs inside the snapshot transaction, the ADBC driver would open its own
+        data = fetch_arrow_table(conn, f"SELECT * FROM {table}", method="copy")
+        file_name = f"{table}.parquet"
+        tmp_path = os.path.join(snapshot_dir, file_name + ".tmp")
+        pq.write_table(data, tmp_path, compression="zstd")
+        os.replace(tmp_path, os.path.join(snapshot_dir, file_name))
+        manifest["tables"][table] = {"file": file_name, "rows": data.num_rows}
+        print(f"{table:<40} {data.num_rows:>10} rows  {time.perf_counter() - start:.1f}s")
+
+        if table == "kenze_pli_profiles":
+            start = time.perf_counter()
+            search.build_index(data, os.path.join(snapshot_dir, search.INDEX_FILE))
+            print(f"{'  search index':<40} {'':>10}       {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    company_ids, embeddings = similar.load_embeddings(conn)
+    index_path = os.path.join(snapshot_dir, similar.INDEX_FILE)
+    if len(company_ids):
+        similar.EmbeddingIndex.build(company_ids, embeddings).save(index_path)
+    elif os.path.exists(index_path):
+        os.remove(index_path)
+    print(f"{'website embeddings index':<40} {len(company_ids):>10} rows  {time.perf_counter() - start:.1f}s")
+
+    with open(os.path.join(snapshot_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the dashboard tables to a Parquet snapshot")
+    parser.add_argument("--dir", default="snapshot", help="Snapshot directory")
+    args = parser.parse_args()
+
+    conn = connect_to_db()
+    conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+    try:
+        manifest = write_snapshot(conn, args.dir, SNAPSHOT_TABLES)
+    finally:
+        conn.close()
+    print(f"Snapshot {manifest['version']} written to {args.dir}")
+
+
+if __name__ == "__main__":
+    main()
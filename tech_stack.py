@@ -0,0 +1,209 @@
+# Tech-stack fingerprinting of company websites (Step 6).
+#
+# Scans the homepages in company_website_pages against the signature
+# database in tech_signatures.json. Per technology, a signature lists HTML
+# snippets, script URLs and response headers (name: value substring, "" for any
+# value), plus the technologies it implies (WooCommerce implies WordPress).
+# All snippets and script URLs are compiled into one prefix-tree pattern, so a
+# page is scanned once whatever the number of signatures. Pages are streamed
+# from the database and scanned in chunks by a process pool.
+#
+# The result replaces company_tech_stack (migrations/0010): the technologies
+# and their categories per company, which the companies query joins in for
+# the map's technology filter.
+#
+#   python tech_stack.py --dry-run
+#   python tech_stack.py --workers 8
+
+import argparse
+import io
+import json
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+import psycopg2
+
+from db import connect_to_db
+
+
+SIGNATURES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tech_signatures.json")
+
+PAGES = """
+    SELECT
+        company_id,
+        html,
+        headers
+    FROM
+        company_website_pages
+    """
+
+CHUNK_PAGES = 500
+
+
+def load_signatures(path=SIGNATURES_FILE):
+    with open(path) as f:
+        return json.load(f)
+
+
+# One pattern matching any of the snippets, nested by common prefix
+# ("wp-(?:content|includes)"), so the regex engine tries the snippets starting
+# at a position together instead of one by one. At each position it matches the
+# longest snippet starting there.
+def trie_pattern(snippets):
+    trie = {}
+    for snippet in snippets:
+        node = trie
+        for char in snippet:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")" + ("?" if "" in node else "")
+
+    return re.compile(build(trie))
+
+
+# Compiled form of the signatures: the snippet pattern, the technologies per
+# snippet and the header rules. A snippet also carries the technologies of the
+# snippets it starts with, which the pattern does not capture separately.
+def compile_signatures(signatures):
+    snippets = {}
+    for name, signature in signatures.items():
+        for snippet in signature.get("html", []) + signature.get("scripts", []):
+            snippets.setdefault(snippet.lower(), set()).add(name)
+    pattern = trie_pattern(snippets)
+    snippets = {snippet: set().union(*(snippets.get(snippet[:end], set()) for end in range(1, len(snippet) + 1)))
+                for snippet in snippets}
+    header_rules = [(header.lower(), value.lower(), name)
+                    for name, signature in signatures.items()
+                    for header, value in signature.get("headers", {}).items()]
+    return pattern, snippets, header_rules
+
+
+# Technologies on one page, with the ones they imply
+def detect(html, headers, signatures, matcher):
+    pattern, snippets, header_rules = matcher
+    found = set()
+    # Resume the search one character after each match instead of at its end,
+    # so snippets inside a longer match are found too (".azureedge.net" in
+    # "mktdplp102cdn.azureedge.net")
+    html = html.lower() if html else ""
+    match = pattern.search(html)
+    while match:
+        found |= snippets[match.group(0)]
+        match = pattern.search(html, match.start() + 1)
+    headers = {name.lower(): str(value).lower() for name, value in (headers or {}).items()}
+    for header, value, name in header_rules:
+        if header in headers and value in headers[header]:
+            found.add(name)
+
+    implied = list(found)
+    while implied:
+        for name in signatures[implied.pop()].get("implies", []):
+            if name not in found:
+                found.add(name)
+                implied.append(name)
+    return found
+
+
+# Signatures shared by the workers, set once per process by the pool initializer
+WORKER_DATA = {}
+
+
+def init_worker(signatures):
+    WORKER_DATA["signatures"] = signatures
+    WORKER_DATA["matcher"] = compile_signatures(signatures)
+
+
+# (company_id, technologies, categories) per page, in signature order
+def scan_pages(pages):
+    signatures = WORKER_DATA["signatures"]
+    results = []
+    for company_id, html, headers in pages:
+        found = detect(html, headers, signatures, WORKER_DATA["matcher"])
+        technologies = [name for name in signatures if name in found]
+        categories = list(dict.fromkeys(signatures[name]["category"] for name in technologies))
+        results.append((company_id, ", ".join(technologies), ", ".join(categories)))
+    return results
+
+
+# Stream the pages with a server-side cursor and keep at most two chunks per
+# worker in flight, so memory does not grow with the number of pages
+def scan_all(conn, signatures, workers, chunk_pages):
+    cur = conn.cursor(name="website_pages")
+    cur.itersize = chunk_pages
+    cur.execute(PAGES)
+
+    results, pages, page_bytes = [], 0, 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(signatures,)) as pool:
+        pending = set()
+        while True:
+            chunk = cur.fetchmany(chunk_pages)
+            if chunk:
+                pages += len(chunk)
+                page_bytes += sum(len(html or "") for _, html, _ in chunk)
+                pending.add(pool.submit(scan_pages, chunk))
+            if len(pending) >= 2 * workers or (not chunk and pending):
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results.extend(future.result())
+            if not chunk and not pending:
+                break
+    cur.close()
+    return pd.DataFrame(results, columns=["company_id", "technologies", "tech_categories"]), pages, page_bytes
+
+
+def write_tech_stack(conn, stacks):
+    cur = conn.cursor()
+    cur.execute("DELETE FROM company_tech_stack")
+    buffer = io.StringIO()
+    stacks.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    # '' is a scanned page without technologies, not a missing value
+    cur.copy_expert("COPY company_tech_stack (company_id, technologies, tech_categories) FROM STDIN "
+                    "WITH (FORMAT csv, FORCE_NOT_NULL (technologies, tech_categories))", buffer)
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect the technologies on the stored company websites")
+    parser.add_argument("--signatures", default=SIGNATURES_FILE, help="Signature database (JSON)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Scanner processes")
+    parser.add_argument("--chunk-pages", type=int, default=CHUNK_PAGES, help="Pages per work unit")
+    parser.add_argument("--dry-run", action="store_true", help="Report the technologies without writing them")
+    parser.add_argument("--dsn", help="Connection string (default: app secrets)")
+    args = parser.parse_args()
+
+    signatures = load_signatures(args.signatures)
+    conn = psycopg2.connect(args.dsn) if args.dsn else connect_to_db()
+
+    start = time.perf_counter()
+    stacks, pages, page_bytes = scan_all(conn, signatures, args.workers, args.chunk_pages)
+    elapsed = time.perf_counter() - start
+    print(f"{pages:,} pages ({page_bytes / 1e6:,.0f} MB) scanned against {len(signatures)} signatures in "
+          f"{elapsed:.1f}s: {pages / elapsed:,.0f} pages/s, {page_bytes / 1e6 / elapsed:,.1f} MB/s")
+
+    counts = Counter(name for technologies in stacks["technologies"] if technologies
+                     for name in technologies.split(", "))
+    print(f"{(stacks['technologies'] != '').sum():,} companies with at least one technology")
+    for name, count in counts.most_common(15):
+        print(f"  {name:<24} {count:>8,}")
+
+    if not args.dry_run:
+        conn.rollback()
+        write_tech_stack(conn, stacks)
+        print(f"{len(stacks):,} companies written to company_tech_stack")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Tenure parsing for months_in_company (Step 4).
+#
+# LinkedIn shows the time at a company as duration text in the profile's
+# language: "2 yrs 3 mos", "1 jaar 2 maanden", "3 ans 1 mois", sometimes after
+# the date range ("Jan 2020 - Present · 4 yrs 2 mos"). parse_duration turns one
+# such string into months and caches the result; months_in_company parses each
+# distinct string of a column once and maps the months back to the rows.
+#
+# `python tenure.py` recomputes months_in_company from the duration column of
+# kenze_pli_profiles and writes the values that changed back in one bulk
+# update. Strings the parser does not understand are listed and left alone:
+#
+#   python tenure.py --dry-run
+#   python tenure.py
+#
+# bench_tenure.py benchmarks the parser over millions of rows.
+
+import argparse
+import functools
+import re
+import time
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from db import connect_to_db, fetch_arrow_table, update_by_ctid
+
+
+# Duration units in English, Dutch and French, as LinkedIn abbreviates them
+YEAR_UNITS = ["yr", "yrs", "year", "years", "jr", "jaar", "jaren", "an", "ans", "année", "années"]
+MONTH_UNITS = ["mo", "mos", "month", "months", "mnd", "maand", "maanden", "mois"]
+
+# Durations LinkedIn shows without a month count, counted as 0 months
+NO_MONTH_COUNT = [
+    "less than a month", "minder dan een maand", "moins d'un mois", "moins d’un mois",
+    "less than a year", "minder dan een jaar", "moins d'un an", "moins d’un an",
+]
+
+PART = re.compile(
+    rf"(\d+)\s*(?:({'|'.join(sorted(YEAR_UNITS, key=len, reverse=True))})"
+    rf"|({'|'.join(sorted(MONTH_UNITS, key=len, reverse=True))}))\.?(?!\w)"
+)
+
+
+# Months in one duration string, None when it is not a duration
+@functools.lru_cache(maxsize=None)
+def parse_duration(text):
+    text = text.strip().lower()
+    # The duration follows the date range
+    text = text.rpartition("·")[2].strip()
+    if text in NO_MONTH_COUNT:
+        return 0
+
+    parts = PART.findall(text)
+    # Anything besides the number-unit pairs means this is not a duration
+    if not parts or PART.sub("", text).strip(" ,") != "":
+        return None
+    return sum(int(number) * (12 if years else 1) for number, years, _ in parts)
+
+
+# Months per duration string as a nullable integer Series with the index of
+# durations, each distinct string parsed once
+def months_in_company(durations):
+    codes, uniques = pd.factorize(durations)
+    months = np.array([parse_duration(text) if isinstance(text, str) else None for text in uniques] + [None],
+                      dtype=object)
+    # Code -1 (missing) takes the trailing None
+    return pd.Series(months[codes], index=durations.index, dtype="Int64")
+
+
+PROFILES = """
+    SELECT
+        ctid::TEXT AS ctid,
+        duration,
+        months_in_company
+    FROM
+        kenze_pli_profiles
+    """
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute months_in_company from the LinkedIn duration text")
+    parser.add_argument("--dry-run", action="store_true", help="Report the changes without writing them")
+    parser.add_argument("--dsn", help="Connection string (default: app secrets)")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.dsn) if args.dsn else connect_to_db()
+    conn.set_session(isolation_level="REPEATABLE READ")
+    cur = conn.cursor()
+
+    start = time.perf_counter()
+    profiles = fetch_arrow_table(conn, PROFILES, method="copy").to_pandas()
+    read_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    months = months_in_company(profiles["duration"])
+    parse_s = time.perf_counter() - start
+
+    unparsed = profiles["duration"][months.isna() & profiles["duration"].notna()]
+    changed = profiles.assign(months_in_company=months)[months.notna() & months.ne(profiles["months_in_company"]).fillna(True)]
+    print(f"{len(profiles):,} profiles, {profiles['duration'].nunique():,} distinct durations, "
+          f"{len(changed):,} changed, {len(unparsed):,} not understood")
+    if len(unparsed):
+        print("\nMost frequent durations not understood:")
+        print(unparsed.value_counts().head(20).to_string(), "\n")
+
+    write_s = 0.0
+    if not args.dry_run and len(changed):
+        start = time.perf_counter()
+        updated = update_by_ctid(cur, "kenze_pli_profiles", changed, {"months_in_company": "INTEGER"})
+        conn.commit()
+        write_s = time.perf_counter() - start
+        print(f"{updated:,} profiles updated. Run `python migrate.py refresh` to update mv_profile_rollup.")
+    conn.close()
+
+    for phase, seconds, rows in [("read", read_s, len(profiles)), ("parse", parse_s, len(profiles)),
+                                 ("write", write_s, len(changed))]:
+        rate = f"{rows / seconds:>12,.0f} profiles/s" if seconds else ""
+        print(f"{phase:<10} {seconds:>7.2f}s {rate}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import role_classifier
+
+
+def seniority(title):
+    return role_classifier.classify_title(title.lower())[0]
+
+
+def test_vice_president_is_senior():
+    assert seniority("Vice President Engineering") == "Senior"
+    assert seniority("Vice-président des ventes") == "Senior"
+    assert seniority("VP Sales") == "Senior"
+
+
+def test_president_is_executive():
+    assert seniority("President & CEO") == "Executive"
+    assert seniority("Président") == "Executive"
+
+
+def test_owner_roles_are_not_executive():
+    assert seniority("Product Owner") == "Specialist"
+    assert seniority("Process Owner Finance") == "Specialist"
+    assert seniority("Senior Product Owner") == "Senior"
+    assert seniority("Business Owner") == "Executive"
+    assert seniority("Eigenaar") == "Executive"
+    assert seniority("Propriétaire") == "Executive"
+
+
+def test_first_matching_level_wins():
+    assert seniority("Board member and former CEO") == "Advisor"
+    assert seniority("Senior .NET developer") == "Senior"
+    assert seniority(".NET developer") == "Specialist"
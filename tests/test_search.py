@@ -0,0 +1,38 @@
+import pytest
+
+import search
+
+
+def test_technology_names_are_single_words():
+    assert search.normalize_terms("Senior C# / .NET developer") == "Senior Csharp / dotnet developer"
+    assert search.normalize_terms("ASP.NET Core, C++") == "ASP dotnet Core, cplusplus"
+    assert search.normalize_terms("C developer, net fisherman, example.net") == "C developer, net fisherman, example.net"
+
+
+def test_technology_names_in_queries():
+    assert search.to_fts5_query('c# ".net core"') == '"csharp" "dotnet core"'
+
+
+def test_leading_exclusion_follows_the_first_term():
+    assert search.to_fts5_query("-sales dev") == '"dev" NOT "sales"'
+    assert search.to_fts5_query('blazor "azure functions" -sales') == '"blazor" "azure functions" NOT "sales"'
+
+
+def test_exclusions_only():
+    with pytest.raises(ValueError):
+        search.to_fts5_query("-sales -hr")
+
+
+def test_index_matches_technology_names(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    profiles = pa.table({
+        "title": ["C# developer", "C developer", ".NET engineer", "Net fisherman"],
+        "titledescription": [None] * 4,
+        "summary": [None] * 4,
+        "companyid": ["1", "2", "3", "4"],
+    })
+    path = str(tmp_path / search.INDEX_FILE)
+    search.build_index(profiles, path)
+    assert [rowid for rowid, _ in search.search_index(path, "c#")[0]] == [0]
+    assert [rowid for rowid, _ in search.search_index(path, ".net")[0]] == [2]
+    assert [rowid for rowid, _ in search.search_index(path, "-c# developer")[0]] == [1]
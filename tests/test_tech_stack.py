@@ -0,0 +1,27 @@
+import tech_stack
+
+
+SIGNATURES = tech_stack.load_signatures()
+MATCHER = tech_stack.compile_signatures(SIGNATURES)
+
+
+def detect(html, headers=None):
+    return tech_stack.detect(html, headers, SIGNATURES, MATCHER)
+
+
+def test_snippet_inside_a_longer_snippet():
+    html = '<script src="https://mktdplp102cdn.azureedge.net/public/latest/js/form-loader.js"></script>'
+    assert {"Microsoft Dynamics 365", "Azure"} <= detect(html)
+
+
+def test_snippet_that_starts_a_longer_snippet():
+    signatures = {
+        "Short": {"category": "Test", "html": ["wp-content"]},
+        "Long": {"category": "Test", "html": ["wp-content/plugins/shop"]},
+    }
+    matcher = tech_stack.compile_signatures(signatures)
+    assert tech_stack.detect("/wp-content/plugins/shop/x.js", None, signatures, matcher) == {"Short", "Long"}
+
+
+def test_implied_technologies():
+    assert "WordPress" in detect('<link href="/wp-content/plugins/woocommerce/style.css">')
@@ -0,0 +1,52 @@
+import sys
+import threading
+import time
+
+import warmup
+
+
+def test_concurrent_cold_reads_share_one_load():
+    loads = []
+
+    def load():
+        loads.append(1)
+        time.sleep(0.05)
+        return "value"
+
+    warmer = warmup.Warmer()
+    warmer.register("entry", load, None)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(warmer.get("entry"))) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["value"] * 10
+    assert len(loads) == 1
+
+
+def test_get_or_register_while_other_sessions_evict():
+    warmer = warmup.Warmer()
+    errors = []
+
+    def session(i):
+        try:
+            for j in range(200):
+                name = f"segments {(i + j) % 7}"
+                assert warmer.get_or_register(name, lambda name=name: name, 60, evict=("segments ", 1)) == name
+        except Exception as e:
+            errors.append(e)
+
+    # Switch threads often, so sessions interleave between registering and reading
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=session, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
+    assert len(warmer.status()) <= 2
@@ -0,0 +1,80 @@
+# Pipeline throughput and ETA analytics.
+#
+# Turns the hourly buckets from queries.THROUGHPUT into per-stage processing
+# rates (companies/hour over rolling windows), backlog, ETA to completion and
+# the bottleneck stage. Everything is vectorised over the compact bucket
+# frame, never over individual companies.
+
+import numpy as np
+import pandas as pd
+
+
+STAGE_LABELS = {
+    "company_enrichment": "Company Enrichment",
+    "employee_profiles": "Employee Profiles",
+    "gmb_address": "GMB Address",
+    "website_embedding": "Website Embedding",
+    "vat_scrape": "VAT Scrape",
+    "financial_data": "Financial Data",
+}
+
+# Rolling windows in hours, the last one drives the ETA
+ROLLING_WINDOWS = [6, 24]
+
+
+def to_frame(rows):
+    return pd.DataFrame(rows, columns=["stage", "period", "bucket", "companies", "current_hour"])
+
+
+# Companies completed per stage and hour over the lookback window, missing hours are 0
+def hourly_counts(buckets, lookback_hours):
+    current_hour = pd.Timestamp(buckets["current_hour"].iloc[0])
+    hours = pd.date_range(end=current_hour, periods=lookback_hours + 1, freq="h")
+
+    window = buckets[buckets["period"] == "window"]
+    counts = window.pivot_table(index="bucket", columns="stage", values="companies", aggfunc="sum")
+    return counts.reindex(index=hours, columns=list(STAGE_LABELS), fill_value=0).fillna(0)
+
+
+# Rolling processing rate in companies/hour for one window length
+def rolling_rates(counts, window):
+    return counts.rolling(window, min_periods=1).sum() / window
+
+
+def stage_summary(buckets, counts):
+    done = buckets[buckets["period"] != "pending"].groupby("stage")["companies"].sum()
+    backlog = buckets[buckets["period"] == "pending"].groupby("stage")["companies"].sum()
+
+    summary = pd.DataFrame(index=list(STAGE_LABELS))
+    summary["stage"] = summary.index.map(STAGE_LABELS)
+    summary["done"] = done.reindex(summary.index, fill_value=0)
+    summary["backlog"] = backlog.reindex(summary.index, fill_value=0)
+    summary["pct_complete"] = (100 * summary["done"] / (summary["done"] + summary["backlog"]).replace(0, np.nan)).round(1)
+
+    for window in ROLLING_WINDOWS:
+        summary[f"rate_{window}h"] = rolling_rates(counts, window).iloc[-1].round(2)
+
+    rate = summary[f"rate_{ROLLING_WINDOWS[-1]}h"]
+    # Stages with a backlog but no recent progress never finish at this rate
+    summary["eta_hours"] = np.where(summary["backlog"] == 0, 0.0, summary["backlog"] / rate.replace(0, np.nan))
+    summary["eta_hours"] = summary["eta_hours"].fillna(np.inf).round(1)
+    return summary
+
+
+# Stage with the longest ETA (largest backlog among stalled stages), None when
+# every stage is complete
+def bottleneck(summary):
+    pending = summary[summary["backlog"] > 0]
+    if pending.empty:
+        return None
+    return pending.sort_values(["eta_hours", "backlog"]).index[-1]
+
+
+def format_eta(hours):
+    if hours == 0:
+        return "done"
+    if not np.isfinite(hours):
+        return "stalled"
+    if hours < 48:
+        return f"{hours:.0f} h"
+    return f"{hours / 24:.1f} days"
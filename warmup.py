@@ -0,0 +1,189 @@
+# Pre-warmed results shared by all sessions.
+#
+# The results most sessions need (progress metrics, the company dataset, the
+# profile rollup and lookalike index, popular saved-segment combinations) are
+# entries of one cache per server process. A worker thread loads every entry
+# when the process serves its first session, then reloads each one on its own
+# schedule before it gets old. Sessions read the warm value instead of running
+# the query themselves.
+#
+# Loads are single-flight: while an entry is loading, every session that needs
+# it waits for that one load instead of starting its own, and a refresh keeps
+# serving the previous value until the new one is in. status() reports per
+# entry whether it is warm or cold, its age, the last load time and how often
+# sessions found it warm.
+
+import threading
+import time
+
+import pandas as pd
+
+
+# A value older than STALE_FACTOR refresh intervals (the worker fell behind or
+# the refresh failed) is reloaded by the session that reads it
+STALE_FACTOR = 2
+
+# Seconds before a failed background load is retried
+RETRY_S = 60
+
+
+class Entry:
+    def __init__(self, load, interval):
+        self.load = load
+        # Seconds between refreshes, None to load once
+        self.interval = interval
+        self.value = None
+        self.loaded_at = None
+        self.load_s = None
+        self.error = None
+        self.failed_at = None
+        # Set while a load is running, signalled when it is done
+        self.loading = None
+        self.hits = 0
+        self.misses = 0
+
+    def age(self, now):
+        return None if self.loaded_at is None else now - self.loaded_at
+
+    def due(self, now):
+        if self.loading is not None:
+            return False
+        if self.failed_at is not None and now - self.failed_at < RETRY_S:
+            return False
+        return self.loaded_at is None or self.interval is not None and now - self.loaded_at >= self.interval
+
+    def fresh(self, now):
+        return self.loaded_at is not None and (self.interval is None or now - self.loaded_at < STALE_FACTOR * self.interval)
+
+    def state(self, now):
+        if self.loaded_at is None:
+            return "warming" if self.loading is not None else "failed" if self.error is not None else "cold"
+        if self.loading is not None:
+            return "refreshing"
+        return "warm" if self.fresh(now) else "stale"
+
+
+class Warmer:
+    def __init__(self, tick=5):
+        self.tick = tick
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    # Add an entry, load() returns its value. Entries that exist are kept, so
+    # sessions can register the results they use on the fly.
+    def register(self, name, load, interval):
+        with self.lock:
+            if name not in self.entries:
+                self.entries[name] = Entry(load, interval)
+
+    # Keep the `keep` entries whose name starts with prefix that sessions read
+    # most, drop the others. Called with the lock held.
+    def drop_least_read(self, prefix, keep):
+        names = sorted((name for name in self.entries if name.startswith(prefix)),
+                       key=lambda name: self.entries[name].hits + self.entries[name].misses, reverse=True)
+        for name in names[keep:]:
+            del self.entries[name]
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    # The value of an entry: the warm one, or else the result of the load that
+    # is running or of a new one
+    def get(self, name):
+        with self.lock:
+            entry = self.entries[name]
+            if self.read(entry):
+                return entry.value
+        return self.refresh(entry)
+
+    # get() for an entry that sessions register on the fly: it is added first
+    # if it does not exist, after making room for it with
+    # drop_least_read(*evict). All under one lock, so another session's
+    # eviction cannot drop the entry between registering and reading it.
+    def get_or_register(self, name, load, interval, evict=None):
+        with self.lock:
+            if name not in self.entries:
+                if evict is not None:
+                    self.drop_least_read(*evict)
+                self.entries[name] = Entry(load, interval)
+            entry = self.entries[name]
+            if self.read(entry):
+                return entry.value
+        return self.refresh(entry)
+
+    # Count a session read of an entry, with the lock held. True when its
+    # value is fresh.
+    def read(self, entry):
+        if entry.fresh(time.time()):
+            entry.hits += 1
+            return True
+        entry.misses += 1
+        return False
+
+    # Load an entry unless a load is already running, then wait for that one.
+    # Takes the entry rather than its name, so a load still completes for
+    # the sessions waiting on it when the entry is evicted meanwhile.
+    def refresh(self, entry):
+        with self.lock:
+            done = entry.loading
+            if done is None:
+                entry.loading = done = threading.Event()
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            done.wait()
+            with self.lock:
+                if entry.loaded_at is None:
+                    raise entry.error
+                return entry.value
+
+        start = time.perf_counter()
+        try:
+            value = entry.load()
+        except Exception as e:
+            with self.lock:
+                entry.error, entry.failed_at, entry.loading = e, time.time(), None
+            done.set()
+            raise
+        with self.lock:
+            entry.value, entry.loaded_at, entry.load_s = value, time.time(), time.perf_counter() - start
+            entry.error = entry.failed_at = entry.loading = None
+        done.set()
+        return value
+
+    # Load the cold entries and refresh the due ones, one at a time and in
+    # registration order, so the top of the page is warm first
+    def run(self):
+        while True:
+            with self.lock:
+                now = time.time()
+                due = [entry for entry in self.entries.values() if entry.due(now)]
+            for entry in due:
+                try:
+                    self.refresh(entry)
+                except Exception:
+                    # Kept in the entry, shown by status() and retried after RETRY_S
+                    pass
+            time.sleep(self.tick)
+
+    # One row per entry: state (cold, warming, warm, refreshing, stale or
+    # failed), age and refresh interval in seconds, last load in ms, the
+    # reads served warm (hits) and cold (misses), and the last error
+    def status(self):
+        now = time.time()
+        with self.lock:
+            rows = [{
+                "entry": name,
+                "state": entry.state(now),
+                "age_s": None if entry.loaded_at is None else round(entry.age(now)),
+                "refresh_s": entry.interval,
+                "load_ms": None if entry.load_s is None else round(entry.load_s * 1000),
+                "hits": entry.hits,
+                "misses": entry.misses,
+                "error": None if entry.error is None else str(entry.error).strip(),
+            } for name, entry in self.entries.items()]
+        return pd.DataFrame(rows, columns=["entry", "state", "age_s", "refresh_s", "load_ms", "hits", "misses", "error"])
@@ -0,0 +1,229 @@
+# Prioritised scrape-backlog work queue for the n8n workers.
+#
+# The backlog of every scrape stage (queries.SCRAPE_BACKLOG) is cut into
+# fixed-size batches, most valuable companies first. Workers lease one batch
+# at a time and ack it with the lease token when done; a batch whose lease
+# expires goes back to the queue. All commands print JSON for n8n.
+#
+# Usage:
+#   python work_queue.py generate --stage all --batch-size 50
+#   python work_queue.py lease --stage employee_profiles --worker n8n-1 --lease-minutes 30
+#   python work_queue.py ack --batch-id 12 --token <lease_token>
+#   python work_queue.py release --batch-id 12 --token <lease_token>
+#   python work_queue.py export --stage gmb_address --output gmb_queue.csv
+#   python work_queue.py status
+
+import argparse
+import csv
+import json
+import sys
+
+import psycopg2
+
+import queries
+from db import connect_to_db
+
+
+STAGES = ["employee_profiles", "gmb_address", "website_embedding", "vat_scrape"]
+
+
+# Rebuild the queued batches of a stage from its current backlog. Leased
+# batches are left alone and their companies are not queued twice.
+def generate(conn, stage, batch_size):
+    cur = conn.cursor()
+    # One generator per stage at a time
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext('scrape_work_queue'), hashtext(%s))", (stage,))
+    cur.execute("DELETE FROM scrape_work_batches WHERE stage = %s AND status = 'queued'", (stage,))
+
+    cur.execute(f"""
+    CREATE TEMP TABLE backlog ON COMMIT DROP AS
+    SELECT
+        -- The ORDER BY of the backlog does not carry over to ROW_NUMBER()
+        (ROW_NUMBER() OVER (ORDER BY
+            backlog.hq_in_belgium DESC,
+            backlog.net_profiles DESC,
+            backlog.employee_count DESC NULLS LAST,
+            backlog.companyid
+        ) - 1) AS position,
+        backlog.*
+    FROM ({queries.SCRAPE_BACKLOG}) AS backlog
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM scrape_work_items AS i
+        JOIN scrape_work_batches AS b USING (batch_id)
+        WHERE b.stage = %(stage)s AND b.status = 'leased' AND i.companyid = backlog.companyid
+    )
+    """, {"stage": stage})
+
+    cur.execute("""
+    WITH batches AS (
+        INSERT INTO scrape_work_batches (stage, priority_rank)
+        SELECT %(stage)s, rank
+        FROM generate_series(0, (SELECT (COUNT(*) - 1) / %(batch_size)s FROM backlog)) AS rank
+        WHERE EXISTS (SELECT 1 FROM backlog)
+        RETURNING batch_id, priority_rank
+    )
+    INSERT INTO scrape_work_items (batch_id, companyid, net_profiles, employee_count, hq_in_belgium)
+    SELECT b.batch_id, l.companyid, l.net_profiles, l.employee_count, l.hq_in_belgium
+    FROM backlog AS l
+    JOIN batches AS b ON b.priority_rank = l.position / %(batch_size)s
+    """, {"stage": stage, "batch_size": batch_size})
+    companies = cur.rowcount
+    conn.commit()
+    return {"stage": stage, "companies": companies, "batches": -(-companies // batch_size)}
+
+
+# Lease the highest priority batch that is queued or whose lease expired
+def lease(conn, stage, worker, lease_minutes):
+    cur = conn.cursor()
+    cur.execute("""
+    UPDATE scrape_work_batches
+    SET status = 'leased',
+        lease_token = gen_random_uuid(),
+        lease_owner = %(worker)s,
+        leased_until = now() + %(lease_minutes)s * INTERVAL '1 minute',
+        attempts = attempts + 1
+    WHERE batch_id = (
+        SELECT batch_id
+        FROM scrape_work_batches
+        WHERE stage = %(stage)s
+          AND (status = 'queued' OR (status = 'leased' AND leased_until < now()))
+        ORDER BY priority_rank, batch_id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING batch_id, lease_token, leased_until, attempts
+    """, {"stage": stage, "worker": worker, "lease_minutes": lease_minutes})
+    batch = cur.fetchone()
+    if batch is None:
+        conn.commit()
+        return None
+
+    batch_id, token, leased_until, attempts = batch
+    cur.execute("""
+    SELECT companyid, net_profiles, employee_count, hq_in_belgium
+    FROM scrape_work_items
+    WHERE batch_id = %s
+    ORDER BY hq_in_belgium DESC, net_profiles DESC, employee_count DESC NULLS LAST, companyid
+    """, (batch_id,))
+    columns = [desc[0] for desc in cur.description]
+    companies = [dict(zip(columns, row)) for row in cur.fetchall()]
+    conn.commit()
+    return {
+        "stage": stage,
+        "batch_id": batch_id,
+        "lease_token": str(token),
+        "leased_until": leased_until.isoformat(),
+        "attempts": attempts,
+        "companies": companies,
+    }
+
+
+# Finish (ack) or give back (release) a batch, only with a lease that is still held
+def finish(conn, batch_id, token, status):
+    cur = conn.cursor()
+    cur.execute("""
+    UPDATE scrape_work_batches
+    SET status = %(status)s,
+        acked_at = CASE WHEN %(status)s = 'done' THEN now() END,
+        lease_token = NULL,
+        lease_owner = NULL,
+        leased_until = NULL
+    WHERE batch_id = %(batch_id)s
+      AND status = 'leased'
+      AND lease_token = %(token)s
+      AND leased_until >= now()
+    """, {"status": status, "batch_id": batch_id, "token": token})
+    ok = cur.rowcount == 1
+    conn.commit()
+    return {"batch_id": batch_id, "status": status if ok else "lease lost"}
+
+
+def export(conn, stage, output):
+    cur = conn.cursor()
+    cur.execute("""
+    SELECT b.batch_id, i.companyid, i.net_profiles, i.employee_count, i.hq_in_belgium
+    FROM scrape_work_batches AS b
+    JOIN scrape_work_items AS i USING (batch_id)
+    WHERE b.stage = %s AND b.status = 'queued'
+    ORDER BY b.priority_rank, b.batch_id,
+             i.hq_in_belgium DESC, i.net_profiles DESC, i.employee_count DESC NULLS LAST, i.companyid
+    """, (stage,))
+    with open(output, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([desc[0] for desc in cur.description])
+        writer.writerows(cur)
+    return {"stage": stage, "companies": cur.rowcount, "output": output}
+
+
+def status(conn):
+    cur = conn.cursor()
+    cur.execute("""
+    SELECT
+        b.stage,
+        b.status,
+        COUNT(DISTINCT b.batch_id) AS batches,
+        COUNT(i.companyid) AS companies,
+        COUNT(DISTINCT CASE WHEN b.status = 'leased' AND b.leased_until < now() THEN b.batch_id END) AS expired
+    FROM scrape_work_batches AS b
+    LEFT JOIN scrape_work_items AS i USING (batch_id)
+    GROUP BY b.stage, b.status
+    ORDER BY b.stage, b.status
+    """)
+    columns = [desc[0] for desc in cur.description]
+    return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prioritised scrape-backlog work queue")
+    parser.add_argument("--dsn", help="Connection string (default: app secrets)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = commands.add_parser("generate", help="Rebuild the queued batches from the backlog")
+    generate_parser.add_argument("--stage", default="all", choices=["all"] + STAGES)
+    generate_parser.add_argument("--batch-size", type=int, default=50)
+
+    lease_parser = commands.add_parser("lease", help="Lease the next batch")
+    lease_parser.add_argument("--stage", required=True, choices=STAGES)
+    lease_parser.add_argument("--worker", required=True)
+    lease_parser.add_argument("--lease-minutes", type=int, default=30)
+
+    for name, help_text in [("ack", "Mark a leased batch as done"), ("release", "Return a leased batch to the queue")]:
+        finish_parser = commands.add_parser(name, help=help_text)
+        finish_parser.add_argument("--batch-id", type=int, required=True)
+        finish_parser.add_argument("--token", required=True)
+
+    export_parser = commands.add_parser("export", help="Write the queued companies of a stage to CSV")
+    export_parser.add_argument("--stage", required=True, choices=STAGES)
+    export_parser.add_argument("--output", required=True)
+
+    commands.add_parser("status", help="Batches and companies per stage and status")
+
+    args = parser.parse_args()
+    conn = psycopg2.connect(args.dsn) if args.dsn else connect_to_db()
+
+    try:
+        if args.command == "generate":
+            stages = STAGES if args.stage == "all" else [args.stage]
+            result = [generate(conn, stage, args.batch_size) for stage in stages]
+        elif args.command == "lease":
+            result = lease(conn, args.stage, args.worker, args.lease_minutes)
+        elif args.command == "ack":
+            result = finish(conn, args.batch_id, args.token, "done")
+        elif args.command == "release":
+            result = finish(conn, args.batch_id, args.token, "queued")
+        elif args.command == "export":
+            result = export(conn, args.stage, args.output)
+        else:
+            result = status(conn)
+    finally:
+        conn.close()
+
+    print(json.dumps(result, indent=2, default=str))
+    # Nothing to lease or a lost lease, let the worker back off
+    if result is None or (isinstance(result, dict) and result.get("status") == "lease lost"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()